@@ -0,0 +1,334 @@
+"""
+Native async views for the hot read and loan endpoints.
+
+These are plain Django async views, not DRF views (DRF has no async
+support): under ASGI they run on the event loop, so a slow client holds a
+coroutine rather than a worker thread. They mirror the responses of their
+DRF counterparts in views.py and reuse the same serializers, permission
+classes and loan service:
+
+- reads use Django's async ORM (`aget`, `acount`, `async for`)
+- authentication is the stateless JWT token user, which needs no query
+- borrow/return call `loans` through `sync_to_async`: the async ORM has no
+  transactions, so the write transaction runs in the request's
+  thread-sensitive executor, like the async ORM queries themselves
+
+Django only starts that executor thread once the request body has arrived,
+so clients that are still sending do not hold a thread.
+
+The change feed (/api/changes/) and the live availability stream
+(/api/availability/stream/) live here too: a long-poll or an open stream
+waits on the event loop, so a waiting client costs no thread.
+
+Any sync-only middleware (e.g. the opt-in QueryInstrumentationMiddleware)
+makes Django run these views in a thread again.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from library.models import Book
+from . import broker, changes as change_feed, loans
+from .permissions import CanBorrowReturnBooks, IsLibrarian
+from .renderers import dumps
+from .serializers import BookSerializer
+
+
+def _api_request(request):
+    """
+    Wrap the Django request in a DRF Request for the serializers (query
+    params) and permission classes (lazy, stateless JWT authentication).
+    Wrapping does not parse the body.
+    """
+    return Request(request, authenticators=[JWTStatelessUserAuthentication()])
+
+
+def _check_permission(api_request, permission):
+    """
+    Return the error response DRF would send if the permission denies the
+    request, else None.
+    """
+    try:
+        if permission.has_permission(api_request, None):
+            return None
+        if api_request._authenticator:
+            raise exceptions.PermissionDenied(permission.message)
+        raise exceptions.NotAuthenticated()
+    except exceptions.APIException as e:
+        data = e.detail if isinstance(e.detail, (list, dict)) else {"detail": e.detail}
+        response = JsonResponse(data, status=e.status_code, safe=False)
+    if response.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+@require_GET
+async def book_list(request):
+    """
+    List Books (async) - Public
+
+    Async counterpart of GET /api/books/: page-number pagination (?page=N,
+    10 per page) in id order, with the same ?fields= / ?expand= handling.
+    Response format: {"count", "next", "previous", "results"}.
+    """
+    api_request = _api_request(request)
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+
+    queryset = BookSerializer.optimize_queryset(Book.objects.order_by('id'), api_request)
+    count = await queryset.acount()
+    pages = max(1, -(-count // page_size))
+    if not 1 <= page <= pages:
+        return JsonResponse({"detail": "Invalid page."}, status=status.HTTP_404_NOT_FOUND)
+
+    offset = (page - 1) * page_size
+    books = [book async for book in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page + 1) if page < pages else None
+    previous_url = None
+    if page == 2:
+        previous_url = remove_query_param(url, 'page')
+    elif page > 2:
+        previous_url = replace_query_param(url, 'page', page - 1)
+
+    serializer = BookSerializer(books, many=True, context={'request': api_request})
+    return JsonResponse({
+        "count": count,
+        "next": next_url,
+        "previous": previous_url,
+        "results": serializer.data,
+    })
+
+
+@require_GET
+async def book_detail(request, pk):
+    """
+    Retrieve a Book (async) - Public
+
+    Async counterpart of GET /api/books/{id}/.
+    """
+    api_request = _api_request(request)
+    queryset = BookSerializer.optimize_queryset(Book.objects.all(), api_request)
+    try:
+        book = await queryset.aget(pk=pk)
+    except Book.DoesNotExist:
+        return JsonResponse({"detail": "No Book matches the given query."}, status=status.HTTP_404_NOT_FOUND)
+    return JsonResponse(BookSerializer(book, context={'request': api_request}).data)
+
+
+async def _loan_view(request, operation, message):
+    api_request = _api_request(request)
+    denied = _check_permission(api_request, CanBorrowReturnBooks())
+    if denied is not None:
+        return denied
+
+    try:
+        data = json.loads(request.body)
+        book_id, member_id = data['book'], data['member']
+    except (ValueError, TypeError, KeyError) as e:
+        return JsonResponse({"error": f"Invalid request body: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        next_borrower = await sync_to_async(operation)(book_id, member_id)
+    except loans.LoanError as e:
+        return JsonResponse({"error": e.message}, status=e.status_code)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    data = {"message": message}
+    if next_borrower is not None:
+        data["next_borrower"] = next_borrower
+    return JsonResponse(data)
+
+
+@csrf_exempt
+@require_POST
+async def borrow_book(request):
+    """
+    Borrow a Book (async) - Authenticated Users Only
+
+    Async counterpart of POST /api/borrow/; same request body, responses
+    and business rules (see views.borrow_book).
+    """
+    return await _loan_view(request, loans.borrow_book, "Book borrowed successfully")
+
+
+@csrf_exempt
+@require_POST
+async def return_book(request):
+    """
+    Return a Book (async) - Authenticated Users Only
+
+    Async counterpart of POST /api/return/; same request body, responses
+    and business rules (see views.return_book).
+    """
+    return await _loan_view(request, loans.return_book, "Book returned successfully")
+
+
+def _int_param(request, name, default, minimum, maximum):
+    """Query parameter `name` as an int in [minimum, maximum]; ValueError otherwise."""
+    value = int(request.GET.get(name, default))
+    if not minimum <= value <= maximum:
+        raise ValueError(f"'{name}' must be between {minimum} and {maximum}")
+    return value
+
+
+@require_GET
+async def changes(request):
+    """
+    Change Feed - Librarian Only
+
+    Returns book and circulation events in the order they were committed,
+    for consumers that keep a copy of the catalogue or loan state in sync.
+    Every borrow, return and book create/update/delete appends an event in
+    the same transaction as the change itself.
+
+    Query Parameters:
+    - since: Return events after this sequence number (default: 0, the
+      start of the feed). `since=latest` starts from the current end of the
+      feed, returning no past events.
+    - limit: Maximum number of events (default: CHANGES_PAGE_SIZE, at most
+      CHANGES_MAX_PAGE_SIZE)
+    - wait: Seconds to wait for new events when there are none yet
+      (long-poll; default: 0, at most CHANGES_MAX_WAIT)
+
+    Event kinds: book_created, book_updated, book_deleted, borrowed,
+    returned. `member` is null for book events.
+
+    Pass the returned `next` as `since` in the following request. When
+    `has_more` is true, more events are already waiting.
+
+    Response format:
+    ```json
+    {
+        "events": [
+            {"seq": 41, "kind": "borrowed", "book": 12, "member": 3, "created_at": "2024-01-15T10:30:00Z"},
+            {"seq": 42, "kind": "book_updated", "book": 7, "member": null, "created_at": "2024-01-15T10:30:02Z"}
+        ],
+        "next": 42,
+        "has_more": false
+    }
+    ```
+    """
+    # is_staff falls back to the (cached) User row for tokens without role
+    # claims, which is a sync query
+    denied = await sync_to_async(_check_permission)(_api_request(request), IsLibrarian())
+    if denied is not None:
+        return denied
+
+    try:
+        if request.GET.get('since') == 'latest':
+            since = await change_feed.alatest_seq()
+        else:
+            since = _int_param(request, 'since', 0, 0, 2 ** 63 - 1)
+        limit = _int_param(
+            request, 'limit', getattr(settings, 'CHANGES_PAGE_SIZE', 100),
+            1, getattr(settings, 'CHANGES_MAX_PAGE_SIZE', 1000)
+        )
+        wait = _int_param(request, 'wait', 0, 0, getattr(settings, 'CHANGES_MAX_WAIT', 30))
+    except ValueError as e:
+        return JsonResponse({"error": f"Invalid query parameter: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    deadline = time.monotonic() + wait
+    interval = getattr(settings, 'CHANGES_POLL_INTERVAL', 0.5)
+    while True:
+        rows = [row async for row in change_feed.events_queryset(since, limit)]
+        remaining = deadline - time.monotonic()
+        if rows or remaining <= 0:
+            break
+        await asyncio.sleep(min(interval, remaining))
+    return HttpResponse(dumps(change_feed.page(rows, since, limit)), content_type='application/json')
+
+
+def _sse(name, data):
+    return f"event: {name}\ndata: {dumps(data).decode()}\n\n"
+
+
+async def _availability_events(book_ids, categories):
+    subscription = broker.subscribe(book_ids, categories)
+    heartbeat = getattr(settings, 'AVAILABILITY_STREAM_HEARTBEAT', 15)
+    try:
+        # Subscribed before reading the snapshot, so no change is missed
+        if book_ids:
+            queryset = broker.availability(Book.objects.filter(id__in=book_ids).order_by('id'))
+            async for row in queryset:
+                yield _sse('availability', broker.event(row))
+        while True:
+            events = await subscription.get(heartbeat)
+            if not events:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ': keepalive\n\n'
+            for item in events:
+                yield _sse('availability', item)
+    finally:
+        # Runs when the client disconnects (the ASGI handler cancels the stream)
+        broker.unsubscribe(subscription)
+
+
+@require_GET
+async def availability_stream(request):
+    """
+    Live Book Availability (Server-Sent Events) - Public
+
+    Streams availability changes of books as borrows, returns and book
+    edits commit, for displays that would otherwise poll /api/books/{id}/.
+    Needs the ASGI server: an open stream waits on the event loop, while
+    under WSGI it would hold a worker thread for as long as it is open, so
+    requests served over WSGI get 501 Not Implemented.
+
+    Query Parameters:
+    - books: Comma-separated book ids to follow (at most
+      AVAILABILITY_STREAM_MAX_BOOKS); their current availability is sent
+      first
+    - category: Follow every book in this category (repeatable)
+
+    Without either, the stream follows every book. A client that falls
+    behind receives only the latest state of each book.
+
+    Events (text/event-stream):
+    ```
+    event: availability
+    data: {"book": 12, "category": "Fiction", "available_copies": 0, "is_available": false}
+    ```
+    A `: keepalive` comment is sent after AVAILABILITY_STREAM_HEARTBEAT
+    seconds without events.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "The availability stream is only served by the ASGI server"},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    max_books = getattr(settings, 'AVAILABILITY_STREAM_MAX_BOOKS', 100)
+    try:
+        book_ids = sorted({int(value) for value in request.GET.get('books', '').split(',') if value.strip()})
+    except ValueError:
+        return JsonResponse(
+            {"error": "'books' must be a comma-separated list of book ids"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(book_ids) > max_books:
+        return JsonResponse(
+            {"error": f"At most {max_books} books can be followed per stream"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    categories = sorted({category for category in request.GET.getlist('category') if category})
+
+    response = StreamingHttpResponse(
+        _availability_events(book_ids, categories), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
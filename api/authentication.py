@@ -0,0 +1,127 @@
+"""
+JWT authentication for the library API.
+
+Access tokens carry `role`, `is_staff` and `username` claims (added by
+LibraryTokenObtainPairSerializer, and re-read from the User row on every
+refresh by LibraryTokenRefreshSerializer), so most requests authenticate
+with `JWTStatelessUserAuthentication` and a LibraryTokenUser built from the
+claims, without loading the User row. A role change therefore applies
+within ACCESS_TOKEN_LIFETIME. Views that need the real User use
+CachedJWTAuthentication, which keeps it in the cache for a short TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import LibraryRoleMixin, User
+
+
+def _user_cache_key(user_id):
+    return f'api:jwt-user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(_user_cache_key(user_id))
+
+
+def get_cached_user(user_id):
+    """
+    The User for user_id, from the cache when possible (JWT_USER_CACHE_TIMEOUT
+    seconds, 0 disables caching). Raises User.DoesNotExist.
+    """
+    timeout = getattr(settings, 'JWT_USER_CACHE_TIMEOUT', 60)
+    key = _user_cache_key(user_id)
+    user = cache.get(key) if timeout else None
+    if user is None:
+        user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        if timeout:
+            cache.set(key, user, timeout)
+    return user
+
+
+def _add_claims(token, user):
+    token['username'] = user.username
+    token['role'] = user.role
+    token['is_staff'] = user.is_staff
+
+
+class LibraryTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Adds the claims the stateless token user needs, so authenticated
+    requests do not have to load the user from the database
+    """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        _add_claims(token, user)
+        return token
+
+
+class LibraryTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-stamps the claims on each refreshed access token from the current
+    User row. RefreshToken.access_token copies the claims of the refresh
+    token, which would keep a changed role for the refresh token's whole
+    lifetime; this way it applies within ACCESS_TOKEN_LIFETIME.
+    """
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = User.objects.get(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]})
+        _add_claims(access, user)
+        data['access'] = str(access)
+        return data
+
+
+class LibraryTokenUser(LibraryRoleMixin, TokenUser):
+    """
+    Stateless request user backed by the access token claims.
+
+    Works with the permission classes (is_authenticated, is_staff) and the
+    role helpers of User. Tokens issued before the role claims existed fall
+    back to the (cached) User row.
+    """
+
+    def _claim(self, name):
+        if name in self.token:
+            return self.token[name]
+        return getattr(self.get_user(), name)
+
+    @cached_property
+    def role(self):
+        return self._claim('role')
+
+    @cached_property
+    def is_staff(self):
+        return self._claim('is_staff')
+
+    @cached_property
+    def username(self):
+        return self._claim('username')
+
+    def get_user(self):
+        """The full User model instance, from a short-TTL cache."""
+        return get_cached_user(self.id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the full User through a short-TTL cache,
+    for views that need the model instance (e.g. /api/users/me/).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+            user = get_cached_user(user_id)
+        except (KeyError, User.DoesNotExist):
+            # Let simplejwt produce the usual authentication errors
+            return super().get_user(validated_token)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            return super().get_user(validated_token)
+        return user
@@ -0,0 +1,66 @@
+"""
+Batch multi-get by id for the catalogue viewsets
+"""
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .serializers import BatchIdsSerializer
+
+
+class BatchRetrieveMixin:
+    """
+    Viewset mixin that fetches many objects by id in one query:
+
+    - GET ?ids=1,2,3 on the list endpoint
+    - POST {"ids": [...]} to `batch/`, for lists too long for a URL
+
+    Both respond with {"results": [...], "missing": [...]}: the objects in
+    the order their ids were requested (repeated ids once) and the ids that
+    do not exist. ?fields=/?expand= apply to the GET form, as on other
+    reads; the POST form rejects them (400), as it always returns full
+    objects.
+
+    Put it left-most in the bases, so `?ids=` is handled before the list
+    caching and pagination mixins. The POST is a read, so it is checked
+    against `batch_permission_classes` rather than the write permissions.
+    """
+    batch_ids_param = 'ids'
+    batch_permission_classes = None
+
+    def get_permissions(self):
+        if self.action == 'batch' and self.batch_permission_classes is not None:
+            return [permission() for permission in self.batch_permission_classes]
+        return super().get_permissions()
+
+    def list(self, request, *args, **kwargs):
+        if self.batch_ids_param not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        value = request.query_params[self.batch_ids_param]
+        return self.batch_response({'ids': [item for item in value.split(',') if item.strip()]})
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Batch Get by Ids
+
+        Request body: {"ids": [1, 2, 3]} (at most API_BATCH_MAX_IDS ids).
+        Response: {"results": [...], "missing": [...]}, results in the
+        requested order. ?fields=/?expand= are rejected; use the GET form
+        (?ids=) for them.
+        """
+        for param in ('fields', 'expand'):
+            if param in request.query_params:
+                raise ValidationError({param: "Only supported on GET ?ids=."})
+        return self.batch_response(request.data)
+
+    def batch_response(self, data):
+        serializer = BatchIdsSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+
+        objects = self.get_queryset().in_bulk(ids)
+        return Response({
+            "results": self.get_serializer([objects[pk] for pk in ids if pk in objects], many=True).data,
+            "missing": [pk for pk in ids if pk not in objects],
+        })
@@ -0,0 +1,254 @@
+"""
+Helpers for the load-testing and benchmark management commands
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.test import Client
+
+from api.instrumentation import percentile
+from api.models import User
+from api.serializers import BookSerializer, BorrowRecordSerializer, MemberSerializer
+from library.models import Author, Book, BorrowRecord, Member
+
+
+BENCH_PREFIX = 'bench'
+BENCH_PASSWORD = 'BenchPass123!'
+BENCH_USERS = {
+    'librarian': f'{BENCH_PREFIX}_librarian',
+    'member': f'{BENCH_PREFIX}_member',
+}
+
+
+def summarize(latencies, elapsed):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    values = sorted(latencies)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None  # noqa: E731
+    return {
+        'requests': len(values),
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed else None,
+        'mean_ms': ms(sum(values) / len(values)) if values else None,
+        'p50_ms': ms(percentile(values, 0.50)),
+        'p95_ms': ms(percentile(values, 0.95)),
+        'p99_ms': ms(percentile(values, 0.99)),
+        'max_ms': ms(values[-1]) if values else None,
+    }
+
+
+class LatencyRecorder:
+    """Thread-safe per-endpoint latency and status-code recorder."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)
+        self._statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, status, duration):
+        with self._lock:
+            self._latencies[endpoint].append(duration)
+            self._statuses[endpoint][str(status)] += 1
+
+    def report(self, elapsed):
+        with self._lock:
+            endpoints = {}
+            all_latencies = []
+            errors = 0
+            for endpoint in sorted(self._latencies):
+                latencies = self._latencies[endpoint]
+                statuses = dict(self._statuses[endpoint])
+                endpoint_errors = sum(
+                    count for status, count in statuses.items()
+                    if status == 'error' or status.startswith('5')
+                )
+                endpoints[endpoint] = {
+                    **summarize(latencies, elapsed),
+                    'errors': endpoint_errors,
+                    'statuses': statuses,
+                }
+                all_latencies.extend(latencies)
+                errors += endpoint_errors
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'total': {**summarize(all_latencies, elapsed), 'errors': errors},
+            'endpoints': endpoints,
+        }
+
+
+def seed_dataset(books, members, categories=20, authors=None, stdout=None):
+    """
+    Create a benchmark dataset of roughly the requested size, reusing rows
+    from an earlier run. All rows are marked with the `bench` prefix.
+    """
+    authors = authors or max(1, books // 20)
+    existing_authors = Author.objects.filter(name__startswith=f'{BENCH_PREFIX} author ').count()
+    Author.objects.bulk_create(
+        Author(name=f'{BENCH_PREFIX} author {i}') for i in range(existing_authors, authors)
+    )
+    author_ids = list(
+        Author.objects.filter(name__startswith=f'{BENCH_PREFIX} author ').values_list('id', flat=True)
+    )
+
+    existing_books = Book.objects.filter(ISBN__startswith=f'{BENCH_PREFIX}-').count()
+    for start in range(existing_books, books, 5000):
+        Book.objects.bulk_create(
+            Book(
+                title=f'{BENCH_PREFIX} book {i}',
+                ISBN=f'{BENCH_PREFIX}-{i}',
+                category=f'category {i % categories}',
+                author_id=author_ids[i % len(author_ids)],
+            )
+            for i in range(start, min(start + 5000, books))
+        )
+
+    existing_members = Member.objects.filter(email__endswith=f'@{BENCH_PREFIX}.example').count()
+    Member.objects.bulk_create(
+        Member(name=f'{BENCH_PREFIX} member {i}', email=f'member{i}@{BENCH_PREFIX}.example')
+        for i in range(existing_members, members)
+    )
+
+    for role, username in BENCH_USERS.items():
+        if not User.objects.filter(username=username).exists():
+            User.objects.create_user(username=username, password=BENCH_PASSWORD, role=role)
+
+    if stdout is not None:
+        stdout.write(
+            f'Dataset: {Book.objects.filter(ISBN__startswith=f"{BENCH_PREFIX}-").count()} books, '
+            f'{Member.objects.filter(email__endswith=f"@{BENCH_PREFIX}.example").count()} members'
+        )
+
+
+def benchmark_ids():
+    """Ids of the seeded books and members, in creation order."""
+    book_ids = list(
+        Book.objects.filter(ISBN__startswith=f'{BENCH_PREFIX}-').order_by('id').values_list('id', flat=True)
+    )
+    member_ids = list(
+        Member.objects.filter(email__endswith=f'@{BENCH_PREFIX}.example').order_by('id').values_list('id', flat=True)
+    )
+    return book_ids, member_ids
+
+
+class InProcessClient:
+    """Drives the WSGI application in this process, one instance per thread."""
+
+    def __init__(self):
+        self.client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        if method == 'GET':
+            response = self.client.get(path, **headers)
+        else:
+            response = self.client.post(
+                path, data=json.dumps(data or {}), content_type='application/json', **headers
+            )
+        body = response.content if not response.streaming else b''.join(response.streaming_content)
+        return response.status_code, body
+
+
+class HTTPClient:
+    """Drives a running server over HTTP."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=body, headers=headers, method=method
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def timed(recorder, endpoint, func, *args, **kwargs):
+    """Call func, record its latency under endpoint and return its result."""
+    started = time.perf_counter()
+    try:
+        status, body = func(*args, **kwargs)
+    except Exception:
+        recorder.record(endpoint, 'error', time.perf_counter() - started)
+        return None, b''
+    recorder.record(endpoint, status, time.perf_counter() - started)
+    return status, body
+
+
+def build_pages(size):
+    """
+    {name: page data} for API list pages of `size` items, built from
+    unsaved model instances (no database needed):
+
+    - books, members, borrow_records: serialized with the API serializers
+    - borrow_values: raw .values()-style rows with date/datetime objects
+    """
+
+    now = datetime(2026, 1, 15, 9, 30, 12, 345678, tzinfo=dt_timezone.utc)
+    authors = [Author(id=i, name=f'Author {i}') for i in range(1, 51)]
+    books = [
+        Book(
+            id=i, title=f'Book title {i} – édition', ISBN=f'978{i:010d}', category=f'category {i % 20}',
+            author=authors[i % len(authors)], total_copies=3, available_copies=i % 4 and 2,
+            is_available=bool(i % 4), updated_at=now,
+        )
+        for i in range(1, size + 1)
+    ]
+    members = [
+        Member(
+            id=i, name=f'Member {i}', email=f'member{i}@example.com',
+            membership_date=date(2024, 1, 1) + timedelta(days=i % 700), updated_at=now,
+        )
+        for i in range(1, size + 1)
+    ]
+    records = [
+        BorrowRecord(
+            id=i, book=books[i % size], member=members[i % size],
+            borrow_date=now - timedelta(days=i % 90, seconds=i),
+            return_date=now - timedelta(days=i % 30) if i % 3 else None,
+        )
+        for i in range(1, size + 1)
+    ]
+
+    def page(results):
+        return {
+            'count': size * 10,
+            'next': 'http://testserver/api/items/?page=2',
+            'previous': None,
+            'results': results,
+        }
+
+    return {
+        'books': page(BookSerializer(books, many=True).data),
+        'members': page(MemberSerializer(members, many=True).data),
+        'borrow_records': page(BorrowRecordSerializer(records, many=True).data),
+        'borrow_values': page([
+            {
+                'id': record.id, 'book_id': record.book.id, 'book__title': record.book.title,
+                'member_id': record.member.id, 'member__membership_date': record.member.membership_date,
+                'borrow_date': record.borrow_date, 'return_date': record.return_date,
+            }
+            for record in records
+        ]),
+    }
+
+
+def best_of(rounds, func):
+    """Fastest of `rounds` calls to func, in milliseconds"""
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 3)
@@ -0,0 +1,195 @@
+"""
+In-process fan-out of book availability changes to the live stream at
+/api/availability/stream/ (Server-Sent Events).
+
+Each open stream holds a Subscription on the ASGI server's event loop,
+following a set of book ids and/or categories (or every book). Borrow,
+return and book saves call publish_on_commit() inside their transactions;
+once the transaction commits, the new availability of the affected books is
+read with one query and handed to the matching subscriptions through one
+loop.call_soon_threadsafe() per event loop, since commits happen on worker
+threads.
+
+Subscriptions are indexed by book id and category, so a publish only
+touches the streams that follow the changed books, and nothing is queried
+or published while nobody is subscribed. An idle stream costs a suspended
+coroutine and an empty dict.
+
+The broker only sees changes made in its own process. Under a single ASGI
+process that includes the sync views, which run in its thread pool; with
+several processes, each stream only gets the changes made by the process
+serving it.
+"""
+import asyncio
+import threading
+
+from django.db import transaction
+
+from library.models import Book
+
+
+FIELDS = ('id', 'category', 'available_copies', 'is_available')
+
+
+def availability(queryset):
+    """The availability rows of a Book queryset, for event()."""
+    return queryset.values_list(*FIELDS)
+
+
+def event(row):
+    book_id, category, available_copies, is_available = row
+    return {
+        "book": book_id,
+        "category": category,
+        "available_copies": available_copies,
+        "is_available": is_available,
+    }
+
+
+class Subscription:
+    """
+    Pending events of one stream, keyed by book id: a stream that falls
+    behind only keeps the latest availability of each book, so it never
+    holds more than one event per book it follows.
+    """
+
+    def __init__(self, book_ids=frozenset(), categories=frozenset()):
+        self.book_ids = frozenset(book_ids)
+        self.categories = frozenset(categories)
+        self.loop = asyncio.get_running_loop()
+        self._pending = {}
+        self._waiter = None
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _put(self, events):
+        for item in events:
+            self._pending.pop(item['book'], None)
+            self._pending[item['book']] = item
+        self._wake()
+
+    async def get(self, timeout):
+        """
+        Wait up to `timeout` seconds for events; returns the pending events
+        in arrival order, or an empty list on timeout.
+        """
+        if not self._pending:
+            # A bare future and timer: cheaper than wait_for(), which wraps
+            # every wait in a task
+            self._waiter = self.loop.create_future()
+            timer = self.loop.call_later(timeout, self._wake)
+            try:
+                await self._waiter
+            finally:
+                timer.cancel()
+                self._waiter = None
+        events, self._pending = list(self._pending.values()), {}
+        return events
+
+
+def _deliver(deliveries):
+    for subscription, events in deliveries:
+        subscription._put(events)
+
+
+class Broker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._everything = set()
+        self._by_book = {}
+        self._by_category = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def _indexes(self, subscription):
+        if not subscription.book_ids and not subscription.categories:
+            return [(None, self._everything)]
+        return (
+            [(book_id, self._by_book) for book_id in subscription.book_ids]
+            + [(category, self._by_category) for category in subscription.categories]
+        )
+
+    def subscribe(self, book_ids=(), categories=()):
+        """
+        Subscribe the running event loop to changes of the given books and
+        categories (all books when both are empty).
+        """
+        subscription = Subscription(book_ids, categories)
+        with self._lock:
+            for key, index in self._indexes(subscription):
+                if key is None:
+                    index.add(subscription)
+                else:
+                    index.setdefault(key, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for key, index in self._indexes(subscription):
+                if key is None:
+                    index.discard(subscription)
+                    continue
+                subscribers = index.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del index[key]
+            self._count -= 1
+
+    def publish(self, events):
+        """Deliver each event to the subscriptions that follow its book or category."""
+        targets = {}
+        with self._lock:
+            for item in events:
+                for subscription in (
+                    self._everything
+                    | self._by_book.get(item['book'], set())
+                    | self._by_category.get(item['category'], set())
+                ):
+                    targets.setdefault(subscription, []).append(item)
+        # One wakeup per event loop, however many of its streams match
+        by_loop = {}
+        for subscription, matched in targets.items():
+            by_loop.setdefault(subscription.loop, []).append((subscription, matched))
+        for loop, deliveries in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(_deliver, deliveries)
+            except RuntimeError:
+                # The event loop has shut down along with its streams
+                pass
+
+
+_broker = Broker()
+
+
+def subscribe(book_ids=(), categories=()):
+    return _broker.subscribe(book_ids, categories)
+
+
+def unsubscribe(subscription):
+    _broker.unsubscribe(subscription)
+
+
+def subscriber_count():
+    return len(_broker)
+
+
+def publish(book_ids):
+    """Read the current availability of book_ids and publish it."""
+    if len(_broker):
+        _broker.publish([event(row) for row in availability(Book.objects.filter(id__in=book_ids))])
+
+
+def publish_on_commit(book_ids):
+    """
+    Publish the availability of book_ids once the current transaction
+    commits. A no-op (no query, no callback) while nobody is subscribed.
+    """
+    if len(_broker):
+        book_ids = list(book_ids)
+        transaction.on_commit(lambda: publish(book_ids))
@@ -0,0 +1,193 @@
+"""
+Read-through response cache for the public book endpoints.
+
+Cached entries hold the serialized response data, so a hit skips both the
+database and BookSerializer. Keys are versioned rather than deleted:
+
+- every list key embeds a global list version,
+- every detail key embeds the version of that one book,
+
+and invalidation simply replaces the version, which makes all old entries
+unreachable (they age out of the cache on their own). Versions are random
+tokens, not counters, so a culled version key can never bring an old entry
+back to life.
+"""
+import hashlib
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .conditional import not_modified_response
+
+
+LIST_VERSION_KEY = 'books:list:version'
+
+
+def _book_version_key(pk):
+    return f'books:version:{pk}'
+
+
+def get_cache():
+    return caches[getattr(settings, 'BOOK_CACHE_ALIAS', 'default')]
+
+
+def is_enabled():
+    return getattr(settings, 'BOOK_CACHE_ENABLED', False)
+
+
+class CacheStats:
+    """
+    Per-process hit/miss/invalidation counters, exposed at /api/cache/stats/
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, event, kind):
+        with self._lock:
+            self._counts[(event, kind)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        result = {}
+        for kind in ('list', 'detail'):
+            hits = counts.get(('hit', kind), 0)
+            misses = counts.get(('miss', kind), 0)
+            result[kind] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            }
+        result['invalidations'] = {
+            'lists': counts.get(('invalidate', 'list'), 0),
+            'books': counts.get(('invalidate', 'detail'), 0),
+        }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def _current_version(cache, key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def _request_digest(request):
+    """Digest of everything besides the resource that changes the response data."""
+    params = sorted(request.query_params.lists())
+    media_type = getattr(request, 'accepted_media_type', '')
+    raw = f'{request.get_host()}|{request.path}|{media_type}|{params}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def list_cache_key(request):
+    version = _current_version(get_cache(), LIST_VERSION_KEY)
+    return f'books:list:{version}:{_request_digest(request)}'
+
+
+def detail_cache_key(request, pk):
+    version = _current_version(get_cache(), _book_version_key(pk))
+    return f'books:detail:{pk}:{version}:{_request_digest(request)}'
+
+
+def invalidate_book_lists():
+    get_cache().set(LIST_VERSION_KEY, uuid.uuid4().hex, None)
+    stats.record('invalidate', 'list')
+
+
+def invalidate_books(book_ids):
+    """Drop the cached detail responses of these books and all list pages."""
+    cache = get_cache()
+    cache.set_many({_book_version_key(pk): uuid.uuid4().hex for pk in book_ids}, None)
+    for _ in book_ids:
+        stats.record('invalidate', 'detail')
+    invalidate_book_lists()
+
+
+def invalidate_books_on_commit(book_ids):
+    """
+    Invalidate once the current transaction commits, so a concurrent reader
+    cannot re-cache the old rows between invalidation and commit.
+    """
+    book_ids = list(book_ids)
+    if book_ids:
+        transaction.on_commit(lambda: invalidate_books(book_ids))
+
+
+class CachedResponseMixin:
+    """
+    Viewset mixin that serves `list` and `retrieve` from the response cache.
+
+    Responses carry an `X-Cache: HIT|MISS` header. Only 200 responses are
+    stored. Headers listed in `cached_response_headers` are stored with the
+    data and replayed on hits.
+    """
+    cached_response_headers = ()
+
+    def list(self, request, *args, **kwargs):
+        if not is_enabled():
+            return super().list(request, *args, **kwargs)
+        return self._cached_response(
+            'list', list_cache_key(request), super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not is_enabled():
+            return super().retrieve(request, *args, **kwargs)
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self._cached_response(
+            'detail', detail_cache_key(request, pk), super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, request, entry):
+        """
+        Build the response for a cache hit, answering with 304 when the
+        cached ETag/Last-Modified validators match the request.
+        """
+        headers = entry['headers']
+        if 'ETag' in headers:
+            not_modified = not_modified_response(
+                request, headers['ETag'], headers.get('Last-Modified')
+            )
+            if not_modified is not None:
+                return not_modified
+        return Response(entry['data'], headers=headers)
+
+    def _cached_response(self, kind, key, fetch, request, *args, **kwargs):
+        cache = get_cache()
+        entry = cache.get(key)
+        if entry is not None:
+            stats.record('hit', kind)
+            response = self.cached_response(request, entry)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        stats.record('miss', kind)
+        response = fetch(request, *args, **kwargs)
+        if response.status_code == 200:
+            headers = {
+                name: response[name]
+                for name in self.cached_response_headers
+                if name in response
+            }
+            cache.set(
+                key,
+                {'data': response.data, 'headers': headers},
+                getattr(settings, 'BOOK_CACHE_TIMEOUT', 300)
+            )
+        response['X-Cache'] = 'MISS'
+        return response
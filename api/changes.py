@@ -0,0 +1,69 @@
+"""
+Change feed: the ChangeEvent outbox behind /api/changes/
+
+Writers call the record_* helpers inside the transaction of the change, so
+an event is visible exactly when its change is. Consumers read events in
+sequence (id) order from a `since` cursor. Sequence numbers are assigned
+when the event is inserted; SQLite runs one write transaction at a time
+and commits them in that order, so a reader never sees seq N+1 before N.
+"""
+from library.models import ChangeEvent
+
+
+def record_book_changes(kind, book_ids):
+    """One event of `kind` (BOOK_CREATED/UPDATED/DELETED) per book id."""
+    ChangeEvent.objects.bulk_create([
+        ChangeEvent(kind=kind, book_id=book_id) for book_id in book_ids
+    ])
+
+
+def record_loans(loans=(), returns=()):
+    """
+    Events for (book_id, member_id) pairs of loans closed and opened, in
+    that order, so a copy handed to the next holder reads as a return
+    followed by a borrow.
+    """
+    ChangeEvent.objects.bulk_create(
+        [
+            ChangeEvent(kind=ChangeEvent.RETURNED, book_id=book_id, member_id=member_id)
+            for book_id, member_id in returns
+        ] + [
+            ChangeEvent(kind=ChangeEvent.BORROWED, book_id=book_id, member_id=member_id)
+            for book_id, member_id in loans
+        ]
+    )
+
+
+def _latest():
+    return ChangeEvent.objects.order_by('-id').values_list('id', flat=True)
+
+
+def latest_seq():
+    return _latest().first() or 0
+
+
+async def alatest_seq():
+    return await _latest().afirst() or 0
+
+
+def events_queryset(since, limit):
+    """Up to limit + 1 events after `since`, so callers can tell if there are more."""
+    return (
+        ChangeEvent.objects.filter(id__gt=since)
+        .order_by('id')
+        .values_list('id', 'kind', 'book_id', 'member_id', 'created_at')[:limit + 1]
+    )
+
+
+def page(rows, since, limit):
+    """The /api/changes/ response body for rows from events_queryset()."""
+    events = [
+        {"seq": seq, "kind": kind, "book": book_id, "member": member_id, "created_at": created_at}
+        for seq, kind, book_id, member_id, created_at in rows[:limit]
+    ]
+    return {
+        "events": events,
+        "next": events[-1]["seq"] if events else since,
+        "has_more": len(rows) > limit,
+    }
+
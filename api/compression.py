@@ -0,0 +1,129 @@
+"""
+Response compression codecs and Accept-Encoding negotiation, used by
+CompressionMiddleware (api/middleware.py)
+
+gzip is always available; brotli (`br`) when the brotli or brotlicffi
+package is installed.
+"""
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+# Content types worth compressing; anything else (images, archives, event
+# streams that must reach the client unbuffered) is sent as is. HTML is left
+# out on purpose: the browsable API pages embed a CSRF token, and compressing
+# them without Django's GZipMiddleware padding would expose it to BREACH.
+COMPRESSIBLE_TYPES = frozenset({
+    'application/json',
+    'application/x-ndjson',
+    'application/yaml',
+    'application/javascript',
+    'text/csv',
+    'text/plain',
+    'text/css',
+    'text/javascript',
+    'text/yaml',
+})
+
+
+class GzipCodec:
+    name = 'gzip'
+
+    def __init__(self):
+        self.level = getattr(settings, 'API_COMPRESSION_GZIP_LEVEL', 6)
+
+    def compressor(self):
+        # wbits 31: gzip container
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress, compressor.flush
+
+
+class BrotliCodec:
+    name = 'br'
+
+    def __init__(self):
+        self.quality = getattr(settings, 'API_COMPRESSION_BROTLI_QUALITY', 5)
+
+    def compressor(self):
+        compressor = brotli.Compressor(quality=self.quality)
+        return compressor.process, compressor.finish
+
+
+def available_codecs():
+    """{encoding name: codec}, in order of preference"""
+    codecs = {}
+    if brotli is not None:
+        codecs['br'] = BrotliCodec()
+    codecs['gzip'] = GzipCodec()
+    return codecs
+
+
+def is_compressible(content_type):
+    return content_type.split(';')[0].strip().lower() in COMPRESSIBLE_TYPES
+
+
+def negotiate(accept_encoding, codecs):
+    """
+    The codec to use for an Accept-Encoding header, or None. Honours q
+    values (q=0 refuses an encoding, `*` stands for any other); on a tie
+    the first codec in `codecs` wins.
+    """
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for name, codec in codecs.items():
+        weight = weights.get(name, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = codec, weight
+    return best
+
+
+def compress(codec, data):
+    compress_chunk, finish = codec.compressor()
+    return compress_chunk(data) + finish()
+
+
+def compress_sequence(codec, chunks):
+    """
+    Compress an iterable of bytes as one stream, yielding output as the
+    compressor produces it, so a streamed response is never buffered whole.
+    """
+    compress_chunk, finish = codec.compressor()
+    for chunk in chunks:
+        output = compress_chunk(chunk)
+        if output:
+            yield output
+    yield finish()
+
+
+async def acompress_sequence(codec, chunks):
+    """compress_sequence for an async iterable"""
+    compress_chunk, finish = codec.compressor()
+    async for chunk in chunks:
+        output = compress_chunk(chunk)
+        if output:
+            yield output
+    yield finish()
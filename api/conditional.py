@@ -0,0 +1,124 @@
+"""
+Conditional GET (ETag / Last-Modified) for the catalogue viewsets
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.response import Response
+
+
+def not_modified_response(request, etag, last_modified):
+    """
+    Return a 304 response if the request's If-None-Match/If-Modified-Since
+    validators still match, otherwise None. `last_modified` is an HTTP date.
+    """
+    timestamp = parse_http_date_safe(last_modified) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = last_modified
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Viewset mixin that emits ETag/Last-Modified on list and retrieve and
+    answers matching If-None-Match/If-Modified-Since requests with 304.
+
+    The validators are computed from `last_modified_field`:
+
+    - retrieve: one single-column lookup of the object's timestamp, so a
+      304 is returned before the full row is loaded,
+    - list: the ids and timestamps of the rows fetched for the page, so
+      lists cost the same queries as without validators; Last-Modified is
+      the newest timestamp on the page.
+
+    A 304 is returned before anything is serialized.
+    """
+    last_modified_field = 'updated_at'
+
+    def _etag(self, request, *parts):
+        raw = '|'.join([
+            self.queryset.model._meta.label,
+            getattr(request, 'accepted_media_type', '') or '',
+            str(sorted(request.query_params.lists())),
+            *map(str, parts),
+        ])
+        return f'W/"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+    @staticmethod
+    def _set_validators(response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = last_modified
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            updated_at = (
+                self.get_queryset()
+                .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                .values_list(self.last_modified_field, flat=True)
+                .first()
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Malformed lookup value (e.g. /books/abc/): get_object_or_404
+            # answers it with 404
+            updated_at = None
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = self._etag(request, kwargs[lookup_url_kwarg], updated_at.isoformat())
+        last_modified = http_date(updated_at.timestamp())
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().retrieve(request, *args, **kwargs)
+        return self._set_validators(response, etag, last_modified)
+
+    def _with_validator_fields(self, queryset, request):
+        """
+        Keep the timestamp and the cursor ordering loaded when ?fields=
+        restricted the columns with only(), so reading them does not cost a
+        query per row.
+        """
+        names, deferred = queryset.query.deferred_loading
+        if deferred:
+            return queryset
+        needed = {self.last_modified_field}
+        paginator = self.paginator
+        if paginator is not None and hasattr(paginator, 'get_ordering'):
+            needed.update(field.lstrip('-') for field in paginator.get_ordering(request, queryset, self))
+        if needed <= names:
+            return queryset
+        return queryset.only(*names, *needed)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self._with_validator_fields(self.filter_queryset(self.get_queryset()), request)
+        page = self.paginate_queryset(queryset)
+        objects = page if page is not None else list(queryset)
+
+        timestamps = [getattr(obj, self.last_modified_field) for obj in objects]
+        page_paginator = getattr(getattr(self.paginator, 'page', None), 'paginator', None)
+        etag = self._etag(
+            request,
+            [obj.pk for obj in objects],
+            [timestamp.isoformat() for timestamp in timestamps],
+            page_paginator.count if page_paginator is not None else '',
+        )
+        last_modified = http_date(max(timestamps).timestamp()) if timestamps else None
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(objects, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        return self._set_validators(response, etag, last_modified)
@@ -0,0 +1,100 @@
+"""
+Streaming export of the borrow history
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from library.models import BorrowRecord
+
+from .renderers import dumps
+
+
+EXPORT_FIELDS = (
+    'id', 'borrow_date', 'return_date',
+    'book_id', 'book__title', 'book__ISBN', 'book__category',
+    'member_id', 'member__name', 'member__email',
+)
+
+COLUMNS = (
+    'id', 'borrow_date', 'return_date',
+    'book_id', 'book_title', 'book_isbn', 'book_category',
+    'member_id', 'member_name', 'member_email',
+)
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def parse_bound(value, name, end=False):
+    """
+    Parse a date or datetime query value into an aware datetime.
+
+    A bare date means the start of that day, or the start of the next day
+    for an `end` bound, so `until=2026-01-31` includes all of January 31.
+    """
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'{name}: expected YYYY-MM-DD or an ISO 8601 datetime')
+        if end:
+            day += timedelta(days=1)
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def borrow_history_rows(since=None, until=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield borrow history rows as tuples in COLUMNS order, oldest first.
+
+    Book and member columns come from joins in the same query, and rows are
+    fetched `chunk_size` at a time, so memory stays bounded however many
+    records are exported.
+    """
+    queryset = BorrowRecord.objects.all()
+    if since is not None:
+        queryset = queryset.filter(borrow_date__gte=since)
+    if until is not None:
+        queryset = queryset.filter(borrow_date__lt=until)
+    queryset = queryset.order_by('id').values_list(*EXPORT_FIELDS)
+    yield from queryset.iterator(chunk_size=chunk_size)
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        record = dict(zip(COLUMNS, row))
+        record['borrow_date'] = _isoformat(record['borrow_date'])
+        record['return_date'] = _isoformat(record['return_date'])
+        yield dumps(record).decode() + '\n'
+
+
+class _Echo:
+    """File-like object whose write() returns the line instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(
+            _isoformat(value) if isinstance(value, datetime) else value
+            for value in row
+        )
+
+
+FORMATTERS = {
+    'ndjson': ndjson_lines,
+    'csv': csv_lines,
+}
@@ -0,0 +1,93 @@
+"""
+Per-request SQL and timing instrumentation with a rolling per-view store
+"""
+import math
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class QueryCollector:
+    """
+    Database execute wrapper that counts queries and SQL time.
+
+    Django passes the SQL with placeholders and the parameters separately,
+    so identical SQL strings are the same query shape run with different
+    parameters: the signature of an N+1 loop.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def most_repeated(self):
+        """(sql, count) of the most repeated statement, or (None, 0)."""
+        if not self.statements:
+            return None, 0
+        return self.statements.most_common(1)[0]
+
+
+class RequestMetrics:
+    """
+    Rolling per-view aggregates of the last `window` requests, per process
+    """
+    def __init__(self, window=500):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._repeated = {}
+
+    def record(self, view, duration, queries, sql_duration, repeated_sql, repeats, flagged):
+        with self._lock:
+            self._samples[view].append((duration, queries, sql_duration, flagged))
+            if flagged:
+                self._repeated[view] = (repeated_sql, repeats)
+
+    def snapshot(self):
+        with self._lock:
+            samples = {view: list(values) for view, values in self._samples.items()}
+            repeated = dict(self._repeated)
+
+        views = {}
+        for view, values in sorted(samples.items()):
+            durations = sorted(value[0] for value in values)
+            queries = [value[1] for value in values]
+            sql_durations = [value[2] for value in values]
+            views[view] = {
+                'requests': len(values),
+                'mean_ms': round(sum(durations) / len(durations) * 1000, 3),
+                'p95_ms': round(percentile(durations, 0.95) * 1000, 3),
+                'mean_queries': round(sum(queries) / len(queries), 2),
+                'max_queries': max(queries),
+                'mean_sql_ms': round(sum(sql_durations) / len(sql_durations) * 1000, 3),
+                'n_plus_one_requests': sum(1 for value in values if value[3]),
+            }
+            if view in repeated:
+                sql, count = repeated[view]
+                views[view]['last_repeated_query'] = {'sql': sql, 'count': count}
+        return {'window': self.window, 'views': views}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._repeated.clear()
+
+
+metrics = RequestMetrics()
@@ -0,0 +1,473 @@
+"""
+Borrow/return business rules shared by the loan endpoints
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from library import stats
+from library.models import Book, Member, BorrowRecord, Hold
+from . import broker, cache, changes
+
+
+BOOK_NOT_FOUND = "Book not found"
+MEMBER_NOT_FOUND = "Member not found"
+BOOK_NOT_AVAILABLE = "Book not available"
+NO_ACTIVE_RECORD = "No active borrow record found"
+DUPLICATE_BOOK = "Book listed more than once"
+BOOK_IS_AVAILABLE = "Book is available; borrow it instead"
+ALREADY_BORROWED = "Member already has this book"
+HOLD_EXISTS = "Member already has a hold on this book"
+HOLD_NOT_FOUND = "Hold not found"
+HOLD_NOT_WAITING = "Hold is no longer waiting"
+HOLDER_HAS_BOOK = "Next member in line already has this book"
+
+
+class LoanError(Exception):
+    """
+    A borrow/return request that violates a business rule
+    """
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class _BatchConflict(Exception):
+    """
+    Raised inside a bulk transaction when a concurrent request changed rows
+    between the SELECT and the UPDATE, so the batch must be rolled back.
+    """
+
+
+def _take_copy(queryset):
+    """
+    Take one copy of each book in the queryset, if one is left. Returns the
+    number of books updated.
+    """
+    return queryset.filter(available_copies__gt=0).update(
+        available_copies=F('available_copies') - 1,
+        # Right-hand sides see the row before the update
+        is_available=GreaterThan(F('available_copies'), 1),
+        updated_at=timezone.now()
+    )
+
+
+def _put_back_copy(queryset):
+    """Put one copy of each book in the queryset back on the shelf."""
+    return queryset.update(
+        available_copies=F('available_copies') + 1,
+        is_available=True,
+        updated_at=timezone.now()
+    )
+
+
+def _queued_for_others(member_id):
+    """Exists() of waiting holds on the outer Book by members other than member_id."""
+    return Exists(
+        Hold.objects.filter(book_id=OuterRef('pk'), status=Hold.WAITING).exclude(member_id=member_id)
+    )
+
+
+def _has_book():
+    """Exists() of an active loan of the outer Hold's book to its member."""
+    return Exists(BorrowRecord.objects.filter(
+        book_id=OuterRef('book_id'),
+        member_id=OuterRef('member_id'),
+        return_date__isnull=True
+    ))
+
+
+def _fulfil_satisfied_holds(book_ids):
+    """
+    Mark fulfilled the waiting holds of members who already have the book,
+    so the waiting line skips them instead of lending them a second copy.
+    """
+    Hold.objects.filter(
+        _has_book(), book_id__in=book_ids, status=Hold.WAITING
+    ).update(status=Hold.FULFILLED, resolved_at=timezone.now())
+
+
+def _next_holds(book_id, count=1):
+    """
+    The first `count` waiting holds of a book as (hold_id, member_id),
+    oldest first, skipping (and fulfilling) holds of members who already
+    have the book.
+    """
+    queue = (
+        Hold.objects.select_for_update()
+        .filter(book_id=book_id, status=Hold.WAITING)
+        .order_by('id')
+    )
+    heads = list(queue.annotate(has_book=_has_book()).values_list('id', 'member_id', 'has_book')[:count])
+    if any(has_book for _, _, has_book in heads):
+        _fulfil_satisfied_holds([book_id])
+        return list(queue.values_list('id', 'member_id')[:count])
+    return [(hold_id, member_id) for hold_id, member_id, _ in heads]
+
+
+def _record_events(loans=(), returns=()):
+    """
+    Add (book_id, member_id) pairs of loans opened and closed to the
+    circulation rollups and the change feed, in the current transaction,
+    and push the books' new availability to live streams once it commits.
+    """
+    stats.record(loans=loans, returns=returns)
+    changes.record_loans(loans=loans, returns=returns)
+    broker.publish_on_commit({book_id for book_id, _ in (*loans, *returns)})
+
+
+def borrow_book(book_id, member_id):
+    """
+    Borrow a copy of a book for a member.
+
+    A copy is taken with a single conditional UPDATE (only matches while a
+    copy is left) and the BorrowRecord is inserted in the same transaction,
+    so concurrent borrowers can never take more copies than exist. A waiting
+    hold of the member on the book is marked fulfilled. The circulation
+    rollups and the change feed are updated in the same transaction.
+
+    A copy left on the shelf while other members wait for the book is not
+    taken: it goes to the waiting line first (see serve_holds), and the
+    member only gets it through their own hold.
+    """
+    try:
+        with transaction.atomic():
+            claimed = _take_copy(Book.objects.filter(~_queued_for_others(member_id), id=book_id))
+            if claimed:
+                BorrowRecord.objects.create(book_id=book_id, member_id=member_id)
+                _record_events(loans=[(book_id, member_id)])
+                Hold.objects.filter(
+                    book_id=book_id,
+                    member_id=member_id,
+                    status=Hold.WAITING
+                ).update(status=Hold.FULFILLED, resolved_at=timezone.now())
+                cache.invalidate_books_on_commit([book_id])
+            else:
+                claimed = member_id in serve_holds(book_id)
+    except IntegrityError:
+        # Either the member does not exist (foreign key) or already has an
+        # active loan for this book (unique constraint).
+        if not Member.objects.filter(id=member_id).exists():
+            raise LoanError(MEMBER_NOT_FOUND, status_code=404)
+        raise LoanError(ALREADY_BORROWED)
+
+    if not claimed:
+        if not Book.objects.filter(id=book_id).exists():
+            raise LoanError(BOOK_NOT_FOUND, status_code=404)
+        raise LoanError(BOOK_NOT_AVAILABLE)
+
+
+def return_book(book_id, member_id):
+    """
+    Close the member's active loan for a book.
+
+    If members are waiting for the book, the copy is lent straight to the
+    first of them who does not already have the book, in the same
+    transaction; otherwise it goes back on the shelf. Returns the id of the
+    member the copy was passed on to, or None.
+    """
+    try:
+        return _return_book(book_id, member_id)
+    except IntegrityError:
+        # The hand-off loan hit the unique active-loan constraint: a
+        # concurrent borrow gave the next member in line the book
+        raise LoanError(HOLDER_HAS_BOOK)
+
+
+def _return_book(book_id, member_id):
+    with transaction.atomic():
+        returned = BorrowRecord.objects.filter(
+            book_id=book_id,
+            member_id=member_id,
+            return_date__isnull=True
+        ).update(return_date=timezone.now())
+        if not returned:
+            raise LoanError(NO_ACTIVE_RECORD, status_code=404)
+
+        heads = _next_holds(book_id)
+        if not heads:
+            _put_back_copy(Book.objects.filter(id=book_id))
+            _record_events(returns=[(book_id, member_id)])
+            cache.invalidate_books_on_commit([book_id])
+            return None
+
+        [(hold_id, next_member_id)] = heads
+        Hold.objects.filter(id=hold_id).update(status=Hold.FULFILLED, resolved_at=timezone.now())
+        BorrowRecord.objects.create(book_id=book_id, member_id=next_member_id)
+        _record_events(loans=[(book_id, next_member_id)], returns=[(book_id, member_id)])
+        return next_member_id
+
+
+def serve_holds(book_id):
+    """
+    Lend the copies of a book on the shelf to the members waiting for it,
+    oldest hold first. Call it in the transaction that put copies on the
+    shelf while holds may be waiting (e.g. more total copies). Returns the
+    ids of the members served.
+    """
+    available = (
+        Book.objects.select_for_update()
+        .filter(id=book_id)
+        .values_list('available_copies', flat=True)
+        .first()
+    )
+    if not available:
+        return []
+    heads = _next_holds(book_id, available)
+    if not heads:
+        return []
+
+    served = [member_id for _, member_id in heads]
+    Book.objects.filter(id=book_id).update(
+        available_copies=F('available_copies') - len(served),
+        # Right-hand sides see the row before the update
+        is_available=GreaterThan(F('available_copies'), len(served)),
+        updated_at=timezone.now()
+    )
+    Hold.objects.filter(id__in=[hold_id for hold_id, _ in heads]).update(
+        status=Hold.FULFILLED, resolved_at=timezone.now()
+    )
+    BorrowRecord.objects.bulk_create([
+        BorrowRecord(book_id=book_id, member_id=member_id) for member_id in served
+    ])
+    _record_events(loans=[(book_id, member_id) for member_id in served])
+    cache.invalidate_books_on_commit([book_id])
+    return served
+
+
+def place_hold(book_id, member_id):
+    """
+    Put a member in the waiting line for a borrowed book.
+
+    The hold is inserted before the book's availability is read, so a
+    return committing concurrently either sees the hold or is seen as an
+    available book here. Returns the hold and its position in the line
+    (1 = next).
+    """
+    try:
+        with transaction.atomic():
+            hold = Hold.objects.create(book_id=book_id, member_id=member_id)
+            available = Book.objects.filter(id=book_id).values_list('is_available', flat=True).first()
+            if available is None:
+                raise LoanError(BOOK_NOT_FOUND, status_code=404)
+            if available:
+                raise LoanError(BOOK_IS_AVAILABLE)
+            if BorrowRecord.objects.filter(
+                book_id=book_id,
+                member_id=member_id,
+                return_date__isnull=True
+            ).exists():
+                raise LoanError(ALREADY_BORROWED)
+            position = Hold.objects.filter(
+                book_id=book_id,
+                status=Hold.WAITING,
+                id__lte=hold.id
+            ).count()
+    except IntegrityError:
+        # Unknown member (foreign key) or a waiting hold already exists
+        # (unique constraint)
+        if not Member.objects.filter(id=member_id).exists():
+            raise LoanError(MEMBER_NOT_FOUND, status_code=404)
+        raise LoanError(HOLD_EXISTS)
+    return hold, position
+
+
+def cancel_hold(hold_id):
+    """
+    Cancel a waiting hold. The row is kept with status `cancelled`.
+    """
+    cancelled = Hold.objects.filter(
+        id=hold_id,
+        status=Hold.WAITING
+    ).update(status=Hold.CANCELLED, resolved_at=timezone.now())
+    if not cancelled:
+        if not Hold.objects.filter(id=hold_id).exists():
+            raise LoanError(HOLD_NOT_FOUND, status_code=404)
+        raise LoanError(HOLD_NOT_WAITING)
+
+
+def _dedupe(book_ids):
+    """
+    Split requested ids into unique ids (in request order) and per-item
+    errors for repeated ids.
+    """
+    seen = set()
+    unique, errors = [], {}
+    for index, book_id in enumerate(book_ids):
+        if book_id in seen:
+            errors[index] = DUPLICATE_BOOK
+        else:
+            seen.add(book_id)
+            unique.append(book_id)
+    return unique, errors
+
+
+def _results(book_ids, duplicate_errors, item_errors, ok_status, next_borrowers=None):
+    next_borrowers = next_borrowers or {}
+    results = []
+    for index, book_id in enumerate(book_ids):
+        error = duplicate_errors.get(index) or item_errors.get(book_id)
+        if error:
+            results.append({"book": book_id, "status": "failed", "error": error})
+        elif next_borrowers.get(book_id) is not None:
+            results.append({"book": book_id, "status": ok_status, "next_borrower": next_borrowers[book_id]})
+        else:
+            results.append({"book": book_id, "status": ok_status})
+    return results
+
+
+def _fallback(func, book_ids, member_id):
+    """
+    Apply the single-item rule to each book; used when a bulk transaction
+    lost a race and had to be rolled back. Returns the per-book errors and
+    return values.
+    """
+    errors, outcomes = {}, {}
+    for book_id in book_ids:
+        try:
+            outcomes[book_id] = func(book_id, member_id)
+        except LoanError as e:
+            errors[book_id] = e.message
+    return errors, outcomes
+
+
+def bulk_borrow(member_id, book_ids):
+    """
+    Borrow several books for one member.
+
+    Uses one SELECT for all requested books, one UPDATE to take a copy of
+    each available one and one bulk INSERT for the BorrowRecords. Returns a
+    result entry per requested id, in request order.
+    """
+    if not Member.objects.filter(id=member_id).exists():
+        raise LoanError(MEMBER_NOT_FOUND, status_code=404)
+
+    unique_ids, duplicate_errors = _dedupe(book_ids)
+    errors = {}
+    try:
+        with transaction.atomic():
+            availability = {
+                book_id: (available_copies, queued)
+                for book_id, available_copies, queued in (
+                    Book.objects.select_for_update()
+                    .filter(id__in=unique_ids)
+                    .annotate(queued=_queued_for_others(member_id))
+                    .values_list('id', 'available_copies', 'queued')
+                )
+            }
+            to_borrow = []
+            for book_id in unique_ids:
+                if book_id not in availability:
+                    errors[book_id] = BOOK_NOT_FOUND
+                elif not availability[book_id][0]:
+                    errors[book_id] = BOOK_NOT_AVAILABLE
+                elif availability[book_id][1]:
+                    # Copies on the shelf belong to the waiting line:
+                    # borrow_book serves it one book at a time
+                    raise _BatchConflict
+                else:
+                    to_borrow.append(book_id)
+
+            if to_borrow:
+                claimed = _take_copy(Book.objects.filter(id__in=to_borrow))
+                if claimed != len(to_borrow):
+                    raise _BatchConflict
+                BorrowRecord.objects.bulk_create([
+                    BorrowRecord(book_id=book_id, member_id=member_id)
+                    for book_id in to_borrow
+                ])
+                _record_events(loans=[(book_id, member_id) for book_id in to_borrow])
+                Hold.objects.filter(
+                    book_id__in=to_borrow,
+                    member_id=member_id,
+                    status=Hold.WAITING
+                ).update(status=Hold.FULFILLED, resolved_at=timezone.now())
+                cache.invalidate_books_on_commit(to_borrow)
+    except (_BatchConflict, IntegrityError):
+        errors, _ = _fallback(borrow_book, unique_ids, member_id)
+
+    return _results(book_ids, duplicate_errors, errors, "borrowed")
+
+
+def bulk_return(member_id, book_ids):
+    """
+    Return several books for one member.
+
+    Uses one SELECT for the member's active loans on the requested books
+    and one UPDATE to close them. One window query finds the first waiting
+    hold of every returned book; those copies are lent on (one UPDATE for
+    the holds, one bulk INSERT for the loans) and the rest are put back on
+    the shelf with one UPDATE. The circulation rollups (one statement per
+    table) and the change feed (one INSERT) cover the whole batch. Returns
+    a result entry per requested id, in request order.
+    """
+    unique_ids, duplicate_errors = _dedupe(book_ids)
+    errors, next_borrowers = {}, {}
+    try:
+        with transaction.atomic():
+            active = dict(
+                BorrowRecord.objects.select_for_update()
+                .filter(
+                    member_id=member_id,
+                    book_id__in=unique_ids,
+                    return_date__isnull=True
+                )
+                .values_list('book_id', 'id')
+            )
+            for book_id in unique_ids:
+                if book_id not in active:
+                    errors[book_id] = NO_ACTIVE_RECORD
+
+            if active:
+                returned = BorrowRecord.objects.filter(
+                    id__in=active.values(),
+                    return_date__isnull=True
+                ).update(return_date=timezone.now())
+                if returned != len(active):
+                    raise _BatchConflict
+
+                # Holds of members who already have the book are not
+                # served; mark them fulfilled before finding the heads
+                _fulfil_satisfied_holds(active.keys())
+                heads = (
+                    Hold.objects
+                    .filter(book_id__in=active.keys(), status=Hold.WAITING)
+                    .annotate(position=Window(
+                        RowNumber(),
+                        partition_by=[F('book_id')],
+                        order_by=F('id').asc()
+                    ))
+                    .filter(position=1)
+                    .values_list('book_id', 'id', 'member_id')
+                )
+                hold_ids = []
+                for book_id, hold_id, next_member_id in heads:
+                    hold_ids.append(hold_id)
+                    next_borrowers[book_id] = next_member_id
+                if hold_ids:
+                    fulfilled = Hold.objects.filter(
+                        id__in=hold_ids,
+                        status=Hold.WAITING
+                    ).update(status=Hold.FULFILLED, resolved_at=timezone.now())
+                    if fulfilled != len(hold_ids):
+                        raise _BatchConflict
+                    BorrowRecord.objects.bulk_create([
+                        BorrowRecord(book_id=book_id, member_id=next_member_id)
+                        for book_id, next_member_id in next_borrowers.items()
+                    ])
+
+                shelved = [book_id for book_id in active if book_id not in next_borrowers]
+                if shelved:
+                    _put_back_copy(Book.objects.filter(id__in=shelved))
+                    cache.invalidate_books_on_commit(shelved)
+                _record_events(
+                    loans=list(next_borrowers.items()),
+                    returns=[(book_id, member_id) for book_id in active]
+                )
+    except (_BatchConflict, IntegrityError):
+        errors, next_borrowers = _fallback(return_book, unique_ids, member_id)
+
+    return _results(book_ids, duplicate_errors, errors, "returned", next_borrowers)
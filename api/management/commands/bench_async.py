@@ -0,0 +1,299 @@
+"""
+Management command to compare the sync (WSGI) and async (ASGI) API paths
+under many concurrent slow clients
+Usage: python manage.py bench_async --seed --clients 500 --client-delay 0.2
+
+Both applications run in this process. Every client sends its requests one
+after another and needs --client-delay seconds to deliver each request:
+
+- wsgi: the DRF views behind a fixed pool of --wsgi-threads workers, as in
+  a threaded WSGI server; a slow client occupies a worker while it sends
+- asgi: the async views (/api/async/...) called through Django's ASGI
+  handler on one event loop; a slow client only holds a coroutine
+
+Prints per-endpoint latency percentiles, throughput and the peak number of
+threads for each path as JSON. On the ASGI path Django runs the sync parts
+of a request (signals, ORM) in a per-request thread once its body has
+arrived, so peak_threads follows the requests being processed, not the
+open connections. The book response cache is disabled so both
+paths hit the database.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from api.authentication import LibraryTokenObtainPairSerializer
+from api.benchmarking import (
+    BENCH_USERS, InProcessClient, LatencyRecorder, benchmark_ids, seed_dataset,
+)
+from api.models import User
+
+
+SERVERS = ('wsgi', 'asgi')
+WORKLOADS = ('browse', 'loans', 'mixed')
+
+PATHS = {
+    'wsgi': {
+        'list': '/api/books/',
+        'detail': '/api/books/{id}/',
+        'borrow': '/api/borrow/',
+        'return': '/api/return/',
+    },
+    'asgi': {
+        'list': '/api/async/books/',
+        'detail': '/api/async/books/{id}/',
+        'borrow': '/api/async/borrow/',
+        'return': '/api/async/return/',
+    },
+}
+
+
+class ASGIClient:
+    """
+    Calls the ASGI application directly. The request body is delivered
+    after `delay` seconds, like a client on a slow connection.
+    """
+
+    def __init__(self, application, delay):
+        self.application = application
+        self.delay = delay
+
+    async def request(self, method, path, data=None, token=None):
+        url = urlsplit(path)
+        body = json.dumps(data).encode() if data is not None else b''
+        headers = [(b'host', b'localhost'), (b'content-length', str(len(body)).encode())]
+        if data is not None:
+            headers.append((b'content-type', b'application/json'))
+        if token:
+            headers.append((b'authorization', f'Bearer {token}'.encode()))
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': url.path,
+            'raw_path': url.path.encode(),
+            'query_string': url.query.encode(),
+            'root_path': '',
+            'headers': headers,
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        sent = False
+        response = {'status': None, 'body': []}
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                # The handler listens for a disconnect while the view runs
+                await asyncio.Event().wait()
+            sent = True
+            await asyncio.sleep(self.delay)
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+
+        await self.application(scope, receive, send)
+        return response['status'], b''.join(response['body'])
+
+
+class WSGIClient:
+    """
+    Runs the WSGI application on a shared worker pool. The worker sleeps
+    `delay` seconds first, as a threaded server blocks reading a slow client.
+    """
+
+    def __init__(self, pool, delay):
+        self.pool = pool
+        self.delay = delay
+        self.local = threading.local()
+
+    def _request(self, method, path, data, token):
+        time.sleep(self.delay)
+        if not hasattr(self.local, 'client'):
+            self.local.client = InProcessClient()
+        try:
+            return self.local.client.request(method, path, data, token)
+        finally:
+            connections.close_all()
+
+    async def request(self, method, path, data=None, token=None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, self._request, method, path, data, token)
+
+
+class SlowClient:
+    """One simulated client sending `requests` requests one after another."""
+
+    def __init__(self, server, transport, recorder, token, book_ids, member_ids, rng):
+        self.paths = PATHS[server]
+        self.transport = transport
+        self.recorder = recorder
+        self.token = token
+        self.book_ids = book_ids
+        self.member_ids = member_ids
+        self.rng = rng
+        self.pages = max(1, len(book_ids) // 10)
+
+    async def timed(self, name, method, path, data=None, token=None):
+        started = time.perf_counter()
+        try:
+            status, _ = await self.transport.request(method, path, data, token)
+        except Exception:
+            status = 'error'
+        self.recorder.record(f'{method} {self.paths[name]}', status, time.perf_counter() - started)
+        return status
+
+    async def browse(self):
+        if self.rng.random() < 0.5:
+            page = self.rng.randint(1, self.pages)
+            await self.timed('list', 'GET', f"{self.paths['list']}?page={page}")
+        else:
+            book_id = self.rng.choice(self.book_ids)
+            await self.timed('detail', 'GET', self.paths['detail'].format(id=book_id))
+
+    async def loans(self):
+        payload = {
+            'book': self.rng.choice(self.book_ids),
+            'member': self.rng.choice(self.member_ids),
+        }
+        status = await self.timed('borrow', 'POST', self.paths['borrow'], payload, self.token)
+        if status == 200:
+            await self.timed('return', 'POST', self.paths['return'], payload, self.token)
+
+    async def run(self, workload, requests):
+        for _ in range(requests):
+            if workload == 'mixed':
+                step = self.browse if self.rng.random() < 0.8 else self.loans
+            else:
+                step = getattr(self, workload)
+            await step()
+
+
+async def _sample_threads(peak, stop):
+    while not stop.is_set():
+        peak[0] = max(peak[0], threading.active_count())
+        await asyncio.sleep(0.01)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the WSGI and ASGI API paths with many concurrent slow clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='Create the benchmark dataset (books, members, users) in the configured database first'
+        )
+        parser.add_argument('--books', type=int, default=10000, help='Books to seed (default: 10000)')
+        parser.add_argument('--members', type=int, default=1000, help='Members to seed (default: 1000)')
+        parser.add_argument('--clients', type=int, default=200, help='Concurrent clients (default: 200)')
+        parser.add_argument('--requests', type=int, default=5, help='Requests per client (default: 5)')
+        parser.add_argument(
+            '--client-delay',
+            type=float,
+            default=0.1,
+            help='Seconds each client takes to deliver a request (default: 0.1)'
+        )
+        parser.add_argument(
+            '--wsgi-threads',
+            type=int,
+            default=8,
+            help='Worker threads of the simulated WSGI server (default: 8)'
+        )
+        parser.add_argument(
+            '--servers',
+            default=','.join(SERVERS),
+            help=f"Comma-separated paths to run (default: {','.join(SERVERS)})"
+        )
+        parser.add_argument('--workload', choices=WORKLOADS, default='browse', help='Request mix (default: browse)')
+        parser.add_argument('--random-seed', type=int, default=None, help='Seed for reproducible request mixes')
+        parser.add_argument('--output', help='Write the JSON report to this file as well')
+
+    def handle(self, *args, **options):
+        servers = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        unknown = set(servers) - set(SERVERS)
+        if unknown or not servers:
+            raise CommandError(f"--servers takes a list of: {', '.join(SERVERS)}")
+        if options['clients'] < 1 or options['requests'] < 1 or options['wsgi_threads'] < 1:
+            raise CommandError('--clients, --requests and --wsgi-threads must be at least 1')
+
+        if options['seed']:
+            seed_dataset(options['books'], options['members'], stdout=self.stderr)
+        book_ids, member_ids = benchmark_ids()
+        user = User.objects.filter(username=BENCH_USERS['member']).first()
+        if not book_ids or not member_ids or user is None:
+            raise CommandError('No benchmark data found; run with --seed first')
+        token = str(LibraryTokenObtainPairSerializer.get_token(user).access_token)
+        connections.close_all()
+
+        report = {
+            'config': {
+                'clients': options['clients'],
+                'requests_per_client': options['requests'],
+                'client_delay_s': options['client_delay'],
+                'wsgi_threads': options['wsgi_threads'],
+                'workload': options['workload'],
+                'books': len(book_ids),
+                'members': len(member_ids),
+            },
+        }
+        with override_settings(BOOK_CACHE_ENABLED=False):
+            for server in servers:
+                self.stderr.write(f'Running {server}...')
+                report[server] = asyncio.run(
+                    self.run_server(server, token, book_ids, member_ids, options)
+                )
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                out.write(output + '\n')
+        self.stdout.write(output)
+
+    async def run_server(self, server, token, book_ids, member_ids, options):
+        delay = options['client_delay']
+        pool = None
+        if server == 'wsgi':
+            pool = ThreadPoolExecutor(max_workers=options['wsgi_threads'])
+            transport = WSGIClient(pool, delay)
+        else:
+            transport = ASGIClient(get_asgi_application(), delay)
+
+        recorder = LatencyRecorder()
+        master_rng = random.Random(options['random_seed'])
+        clients = [
+            SlowClient(server, transport, recorder, token, book_ids, member_ids,
+                       random.Random(master_rng.random()))
+            for _ in range(options['clients'])
+        ]
+
+        peak_threads = [threading.active_count()]
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(_sample_threads(peak_threads, stop))
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(
+                client.run(options['workload'], options['requests']) for client in clients
+            ))
+        finally:
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await sampler
+            if pool is not None:
+                pool.shutdown()
+        return {**recorder.report(elapsed), 'peak_threads': peak_threads[0]}
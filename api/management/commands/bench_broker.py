@@ -0,0 +1,105 @@
+"""
+Management command to measure what idle availability streams cost and how
+fast the broker fans a change out to them
+Usage: python manage.py bench_broker [--subscribers 1000 10000] [--rounds 20]
+
+For each subscriber count the command opens that many subscriptions on a
+fresh broker (no database or server needed), each with a task waiting for
+events the way an open /api/availability/stream/ does, and reports:
+
+- bytes_per_subscriber: memory held per idle stream (tracemalloc)
+- publish_unfollowed_ms: a change to a book nobody follows
+- fanout_ms: publishing from a worker thread, as a commit does, until
+  every subscriber following the book's category has received the event
+  (best of --rounds)
+
+Half the subscribers follow a single book id and half a category, the way
+display screens subscribe.
+"""
+import asyncio
+import json
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarking import best_of
+from api.broker import Broker
+
+
+async def measure(count, rounds):
+    broker = Broker()
+    received = {'count': 0}
+    done = asyncio.Event()
+    expected = count - count // 2
+
+    async def listen(subscription):
+        while True:
+            await subscription.get(3600)
+            received['count'] += 1
+            if received['count'] == expected:
+                done.set()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscriptions = [
+        broker.subscribe(book_ids=[index]) if index % 2 else broker.subscribe(categories=['fiction'])
+        for index in range(count)
+    ]
+    tasks = [asyncio.create_task(listen(subscription)) for subscription in subscriptions]
+    await asyncio.sleep(0)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    event = {"book": count + 1, "category": "fiction", "available_copies": 0, "is_available": False}
+    unfollowed = dict(event, category="unfollowed")
+    publish_unfollowed = best_of(rounds, lambda: broker.publish([unfollowed]))
+
+    fanout = None
+    for _ in range(rounds):
+        received['count'] = 0
+        done.clear()
+        started = time.perf_counter()
+        # Commits publish from worker threads
+        publisher = threading.Thread(target=broker.publish, args=([event],))
+        publisher.start()
+        await done.wait()
+        elapsed = (time.perf_counter() - started) * 1000
+        publisher.join()
+        fanout = elapsed if fanout is None else min(fanout, elapsed)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for subscription in subscriptions:
+        broker.unsubscribe(subscription)
+    return {
+        'bytes_per_subscriber': round(held / count) if count else None,
+        'publish_unfollowed_ms': publish_unfollowed,
+        'fanout_ms': round(fanout, 3),
+        'receivers': expected,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the availability stream broker: idle cost and fan-out latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--subscribers', type=int, nargs='+', default=[1000, 10000],
+            help='Subscriber counts to measure (default: 1000 10000)'
+        )
+        parser.add_argument('--rounds', type=int, default=20, help='Timed rounds; the best is kept (default: 20)')
+        parser.add_argument('--output', help='Write the JSON report to this file as well')
+
+    def handle(self, *args, **options):
+        report = {
+            count: asyncio.run(measure(count, options['rounds']))
+            for count in options['subscribers']
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                out.write(output + '\n')
+        self.stdout.write(output)
@@ -0,0 +1,115 @@
+"""
+Management command to measure what response compression saves, and what it
+costs, for list pages of different sizes and for the streamed export
+Usage: python manage.py bench_compression [--page-sizes 1 10 100 1000] [--rounds 20]
+
+Pages are rendered with the API's JSON renderer from in-memory model
+instances (no database needed) and compressed with every codec the
+CompressionMiddleware can negotiate (gzip, and br when brotli is installed),
+at the configured API_COMPRESSION_* levels. For each page size it prints
+the raw and compressed sizes, the bytes saved, and the best compression
+time per page in milliseconds. Pages below API_COMPRESSION_MIN_SIZE are
+marked as bypassed, since the middleware sends them uncompressed.
+
+The export entry compresses an NDJSON borrow history stream the way the
+middleware does for streaming responses, and reports how much input the
+compressor holds at most before it emits output.
+"""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import compression, exports
+from api.benchmarking import best_of, build_pages
+from api.renderers import ORJSONRenderer
+
+
+def measure_page(content, codecs, rounds, min_size):
+    result = {'bytes': len(content), 'bypassed': len(content) < min_size}
+    for name, codec in codecs.items():
+        compressed = compression.compress(codec, content)
+        result[name] = {
+            'bytes': len(compressed),
+            'saved_bytes': len(content) - len(compressed),
+            'ratio': round(len(compressed) / len(content), 3),
+            'compress_ms': best_of(rounds, lambda: compression.compress(codec, content)),
+        }
+    return result
+
+
+def measure_stream(lines, codec):
+    """
+    Compress an iterable of str lines as a stream. max_buffered_bytes is
+    the most input consumed between two compressed outputs.
+    """
+    consumed = {'bytes': 0}
+
+    def chunks():
+        for line in lines:
+            chunk = line.encode()
+            consumed['bytes'] += len(chunk)
+            yield chunk
+
+    compressed, outputs, last_output_at, max_buffered = 0, 0, 0, 0
+    for output in compression.compress_sequence(codec, chunks()):
+        max_buffered = max(max_buffered, consumed['bytes'] - last_output_at)
+        last_output_at = consumed['bytes']
+        compressed += len(output)
+        outputs += 1
+    return {
+        'bytes': consumed['bytes'],
+        'compressed_bytes': compressed,
+        'ratio': round(compressed / consumed['bytes'], 3) if consumed['bytes'] else None,
+        'output_chunks': outputs,
+        'max_buffered_bytes': max_buffered,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark response compression by page size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-sizes', type=int, nargs='+', default=[1, 10, 100, 1000],
+            help='Items per page to measure (default: 1 10 100 1000)'
+        )
+        parser.add_argument('--export-rows', type=int, default=5000, help='Rows in the export stream (default: 5000)')
+        parser.add_argument('--rounds', type=int, default=20, help='Timed rounds; the best is kept (default: 20)')
+        parser.add_argument('--output', help='Write the JSON report to this file as well')
+
+    def handle(self, *args, **options):
+        codecs = compression.available_codecs()
+        if 'br' not in codecs:
+            self.stderr.write(self.style.WARNING('brotli is not installed: measuring gzip only'))
+
+        min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+        renderer = ORJSONRenderer()
+        report = {
+            'min_size': min_size,
+            'codecs': {name: getattr(codec, 'level', getattr(codec, 'quality', None)) for name, codec in codecs.items()},
+            'pages': {},
+        }
+        for size in options['page_sizes']:
+            pages = build_pages(size)
+            report['pages'][size] = {
+                name: measure_page(renderer.render(pages[name]), codecs, options['rounds'], min_size)
+                for name in ('books', 'members')
+            }
+
+        rows = [
+            (row['id'], row['borrow_date'], row['return_date'], row['book_id'], row['book__title'],
+             f"isbn-{row['book_id']}", 'category', row['member_id'], f"Member {row['member_id']}",
+             f"member{row['member_id']}@example.com")
+            for row in build_pages(options['export_rows'])['borrow_values']['results']
+        ]
+        report['export'] = {
+            name: measure_stream(exports.ndjson_lines(rows), codec)
+            for name, codec in codecs.items()
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                out.write(output + '\n')
+        self.stdout.write(output)
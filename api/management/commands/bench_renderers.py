@@ -0,0 +1,71 @@
+"""
+Management command to compare the orjson renderer/parser with DRF's default
+JSONRenderer/JSONParser on large response pages
+Usage: python manage.py bench_renderers [--page-size 1000] [--rounds 50]
+
+Pages are built from in-memory model instances, so no database is needed:
+
+- books, members, borrow_records: paginated pages serialized with the API
+  serializers (dates and datetimes already ISO strings)
+- borrow_values: raw rows with date and datetime objects, as returned by
+  .values(), which the renderers have to encode themselves
+
+For each page the command checks that both renderers produce the same
+JSON, then prints the best time per render/parse in milliseconds and the
+speedup.
+"""
+import io
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarking import best_of, build_pages
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the orjson renderer/parser against the default DRF ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=1000, help='Items per page (default: 1000)')
+        parser.add_argument('--rounds', type=int, default=50, help='Timed rounds; the best is kept (default: 50)')
+        parser.add_argument('--output', help='Write the JSON report to this file as well')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write(self.style.WARNING(
+                'orjson is not installed: ORJSONRenderer/ORJSONParser fall back to the stdlib encoder'
+            ))
+
+        rounds = options['rounds']
+        default_renderer, fast_renderer = JSONRenderer(), ORJSONRenderer()
+        default_parser, fast_parser = JSONParser(), ORJSONParser()
+        report = {}
+        for name, data in build_pages(options['page_size']).items():
+            expected = default_renderer.render(data)
+            rendered = fast_renderer.render(data)
+            if json.loads(rendered) != json.loads(expected):
+                raise CommandError(f'{name}: ORJSONRenderer output differs from JSONRenderer')
+            if fast_parser.parse(io.BytesIO(expected)) != default_parser.parse(io.BytesIO(expected)):
+                raise CommandError(f'{name}: ORJSONParser result differs from JSONParser')
+
+            render_default = best_of(rounds, lambda: default_renderer.render(data))
+            render_fast = best_of(rounds, lambda: fast_renderer.render(data))
+            parse_default = best_of(rounds, lambda: default_parser.parse(io.BytesIO(expected)))
+            parse_fast = best_of(rounds, lambda: fast_parser.parse(io.BytesIO(expected)))
+            report[name] = {
+                'bytes': len(expected),
+                'render_ms': {'default': render_default, 'orjson': render_fast},
+                'render_speedup': round(render_default / render_fast, 1) if render_fast else None,
+                'parse_ms': {'default': parse_default, 'orjson': parse_fast},
+                'parse_speedup': round(parse_default / parse_fast, 1) if parse_fast else None,
+            }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                out.write(output + '\n')
+        self.stdout.write(output)
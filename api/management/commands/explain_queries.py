@@ -0,0 +1,132 @@
+"""
+Management command to print the query plan of every hot query the API issues
+Usage: python manage.py explain_queries [--sql]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
+
+from api import loans
+from library import search
+from library.models import (
+    Book, BookLoanStats, BorrowRecord, DailyLoanStats, Hold, Member, MemberLoanStats,
+)
+
+
+def _update_sql(queryset, **values):
+    """SQL and params of the UPDATE that queryset.update(**values) would run."""
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(values)
+    return query.get_compiler(queryset.db).as_sql()
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN QUERY PLAN for the hot queries issued by the API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sql',
+            action='store_true',
+            help='Also print the SQL of each query'
+        )
+
+    def hot_queries(self):
+        """
+        (name, sql, params) for each query on the API's request paths.
+        Sample ids come from existing rows so the plans are realistic.
+        """
+        book = Book.objects.order_by('id').first()
+        book_id = book.id if book else 1
+        category = book.category if book else 'fiction'
+        title = book.title if book else 'M'
+        member_id = Member.objects.order_by('id').values_list('id', flat=True).first() or 1
+        page_size = 10
+
+        querysets = [
+            ('book list: page', Book.objects.all()[:page_size]),
+            ('book list: count', Book.objects.values('id').order_by()),
+            ('book list: cursor by title', Book.objects.filter(title__gt=title).order_by('title', 'id')[:page_size + 1]),
+            ('book detail', Book.objects.filter(pk=book_id)),
+            ('books by category, available', Book.objects.filter(category=category, is_available=True)[:page_size]),
+            ('bulk borrow: load books', Book.objects.filter(id__in=[book_id, book_id + 1])),
+            ('bulk return: active loans', BorrowRecord.objects.filter(
+                member_id=member_id, book_id__in=[book_id, book_id + 1], return_date__isnull=True
+            )),
+            ('member list: page', Member.objects.all()[:page_size]),
+            ('member detail', Member.objects.filter(pk=member_id)),
+            ('member active loans', BorrowRecord.objects.filter(
+                member_id=member_id, return_date__isnull=True
+            ).order_by('-borrow_date')),
+            ('member loan history', BorrowRecord.objects.filter(
+                member_id=member_id
+            ).order_by('-borrow_date')[:page_size]),
+            ('stats: most borrowed', BookLoanStats.objects.order_by('-loans', 'book').values_list(
+                'book_id', 'book__title', 'loans', 'active_loans'
+            )[:page_size]),
+            ('stats: members by active loans', MemberLoanStats.objects.filter(
+                active_loans__gt=0
+            ).order_by('-active_loans', 'member').values_list('member_id', 'member__name')[:page_size]),
+            ('stats: daily', DailyLoanStats.objects.filter(day__gte=timezone.now().date()).order_by('day')),
+        ]
+        for name, queryset in querysets:
+            if name == 'book list: count':
+                sql, params = 'SELECT COUNT(*) FROM library_book', ()
+            else:
+                sql, params = queryset.query.sql_with_params()
+            yield name, sql, params
+
+        yield ('borrow: take copy', *_update_sql(
+            Book.objects.filter(~loans._queued_for_others(member_id), id=book_id, available_copies__gt=0),
+            available_copies=F('available_copies') - 1
+        ))
+        yield ('return: close loan', *_update_sql(
+            BorrowRecord.objects.filter(book_id=book_id, member_id=member_id, return_date__isnull=True),
+            return_date=timezone.now()
+        ))
+        yield ('return: next hold', *Hold.objects.filter(
+            book_id=book_id, status=Hold.WAITING
+        ).order_by('id').annotate(has_book=loans._has_book()).values_list(
+            'id', 'member_id', 'has_book'
+        )[:1].query.sql_with_params())
+        yield ('return: put back copy', *_update_sql(
+            Book.objects.filter(id=book_id), available_copies=F('available_copies') + 1
+        ))
+        if search.index_exists():
+            yield (
+                'book search',
+                f'SELECT rowid FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [search.build_match_query(title.split()[0] + '*'), page_size, 0],
+            )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('explain_queries only supports the sqlite3 database backend')
+
+        full_scans = []
+        with connection.cursor() as cursor:
+            for name, sql, params in self.hot_queries():
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[-1] for row in cursor.fetchall()]
+
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                if options['sql']:
+                    self.stdout.write(f'  {sql}')
+                    self.stdout.write(f'  params: {list(params)}')
+                for detail in plan:
+                    # SCAN without an index means a full pass over the table
+                    if detail.startswith('SCAN') and 'INDEX' not in detail and 'VIRTUAL' not in detail:
+                        full_scans.append(name)
+                        self.stdout.write(self.style.WARNING(f'  {detail}'))
+                    else:
+                        self.stdout.write(f'  {detail}')
+                self.stdout.write('')
+
+        if full_scans:
+            self.stdout.write(self.style.WARNING(
+                'Full table scans: ' + ', '.join(dict.fromkeys(full_scans))
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('No full table scans'))
@@ -0,0 +1,57 @@
+"""
+Management command to export the borrow history as NDJSON or CSV
+Usage: python manage.py export_borrow_history [--format csv] [--since 2026-01-01] [--output history.csv]
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream all borrow records with book and member details to a file or stdout'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=sorted(exports.FORMATTERS),
+            default='ndjson',
+            help='Output format (default: ndjson)'
+        )
+        parser.add_argument('--since', help='Only records borrowed at or after this date/datetime')
+        parser.add_argument('--until', help='Only records borrowed before this datetime, or up to this date')
+        parser.add_argument('--output', help='Output file (default: stdout)')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=exports.DEFAULT_CHUNK_SIZE,
+            help=f'Rows fetched from the database at a time (default: {exports.DEFAULT_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            since = exports.parse_bound(options['since'], 'since')
+            until = exports.parse_bound(options['until'], 'until', end=True)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        rows = exports.borrow_history_rows(since, until, chunk_size=options['chunk_size'])
+        lines = exports.FORMATTERS[options['format']](rows)
+
+        started = time.perf_counter()
+        count = -1 if options['format'] == 'csv' else 0  # CSV header line
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as out:
+                for line in lines:
+                    out.write(line)
+                    count += 1
+            self.stderr.write(
+                self.style.SUCCESS(
+                    f'Exported {count} records to {options["output"]} '
+                    f'in {time.perf_counter() - started:.2f}s'
+                )
+            )
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,223 @@
+"""
+Management command to bulk import the book catalogue from CSV or NDJSON
+Usage: python manage.py import_books books.csv [--batch-size 1000]
+
+Each record needs `title`, `ISBN` (or `isbn`), `category` and `author`
+(the author's name), and may give `copies` (default 1). Books are upserted
+on ISBN: existing books get the new title, category and author, and a given
+`copies` value becomes their total, moving the available copies by the
+same amount. Added copies are lent to members waiting for the book first.
+"""
+import csv
+import io
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.lookups import GreaterThan
+
+from library import stats
+from library.models import Author, Book, ChangeEvent, Hold
+from api import cache, changes, loans
+
+
+REQUIRED_FIELDS = ('title', 'ISBN', 'category', 'author')
+
+
+class InvalidRecord(Exception):
+    pass
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def read_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def normalize(records):
+    """Yield (line_number, record) with trimmed values, or raise InvalidRecord."""
+    for line_number, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise InvalidRecord(f'record {line_number}: expected an object')
+        if 'ISBN' not in record and 'isbn' in record:
+            record['ISBN'] = record['isbn']
+        values = {field: str(record.get(field) or '').strip() for field in REQUIRED_FIELDS}
+        missing = [field for field in REQUIRED_FIELDS if not values[field]]
+        if missing:
+            raise InvalidRecord(f"record {line_number}: missing {', '.join(missing)}")
+        copies = str(record.get('copies') or '').strip()
+        if copies:
+            if not copies.isdigit() or int(copies) < 1:
+                raise InvalidRecord(f'record {line_number}: copies must be a positive integer')
+            values['copies'] = int(copies)
+        else:
+            values['copies'] = None
+        yield line_number, values
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class AuthorResolver:
+    """
+    Resolves author names to ids through an in-memory name -> id map,
+    creating unknown authors in bulk. Memory grows with the number of
+    distinct authors, not with the number of imported books.
+    """
+    def __init__(self):
+        self.ids = {}
+
+    def resolve(self, names):
+        missing = set(names) - self.ids.keys()
+        if not missing:
+            return self.ids
+        existing = (
+            Author.objects.filter(name__in=missing)
+            .order_by('id')
+            .values_list('name', 'id')
+        )
+        for name, author_id in existing:
+            self.ids.setdefault(name, author_id)
+        to_create = [Author(name=name) for name in missing - self.ids.keys()]
+        for author in Author.objects.bulk_create(to_create):
+            self.ids[author.name] = author.id
+        return self.ids
+
+
+class Command(BaseCommand):
+    help = 'Stream books from a CSV or NDJSON file into the catalogue, upserting on ISBN'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help='Input format (default: from the file extension, csv for stdin)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Books written per INSERT and per transaction (default: 1000)'
+        )
+
+    def open_input(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+        try:
+            return open(path, encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+
+    def write_batch(self, rows, authors):
+        # Last record wins when an ISBN repeats within the batch
+        by_isbn = {values['ISBN']: values for _, values in rows}
+        author_ids = authors.resolve({values['author'] for values in by_isbn.values()})
+        books = [
+            Book(
+                title=values['title'],
+                ISBN=isbn,
+                category=values['category'],
+                author_id=author_ids[values['author']],
+                total_copies=values['copies'] or 1,
+                available_copies=values['copies'] or 1,
+            )
+            for isbn, values in by_isbn.items()
+        ]
+        copies = {isbn: values['copies'] for isbn, values in by_isbn.items() if values['copies']}
+        with transaction.atomic():
+            # ISBN -> category of the books already in the catalogue
+            existing = dict(Book.objects.filter(ISBN__in=by_isbn).values_list('ISBN', 'category'))
+            # Copy counts only apply to new rows here; existing rows keep
+            # theirs and are adjusted below
+            Book.objects.bulk_create(
+                books,
+                update_conflicts=True,
+                unique_fields=['ISBN'],
+                update_fields=['title', 'category', 'author', 'updated_at'],
+            )
+            if copies:
+                self.set_copies(copies)
+                # Added copies go to the members waiting for the books first
+                waiting = Hold.objects.filter(
+                    status=Hold.WAITING, book__ISBN__in=copies, book__available_copies__gt=0
+                )
+                for book_id in waiting.values_list('book_id', flat=True).distinct():
+                    loans.serve_holds(book_id)
+            cache.invalidate_books_on_commit(book.pk for book in books if book.pk)
+            # bulk_create skips the post_save handlers that feed /api/changes/
+            # and keep the category statistics (loans and copies) right
+            stats.move_categories(
+                (book.pk, existing[book.ISBN], book.category) for book in books if book.ISBN in existing
+            )
+            stats.count_copies({book.category for book in books} | set(existing.values()))
+            changes.record_book_changes(
+                ChangeEvent.BOOK_CREATED, [book.pk for book in books if book.ISBN not in existing]
+            )
+            changes.record_book_changes(
+                ChangeEvent.BOOK_UPDATED, [book.pk for book in books if book.ISBN in existing]
+            )
+        return len(books)
+
+    def set_copies(self, copies):
+        """
+        Set total_copies per ISBN with one UPDATE, moving available_copies by
+        the same amount (no-op for rows that already have that total).
+        """
+        total = Case(
+            *(When(ISBN=isbn, then=Value(count)) for isbn, count in copies.items()),
+            output_field=IntegerField()
+        )
+        available = F('available_copies') + total - F('total_copies')
+        try:
+            Book.objects.filter(ISBN__in=copies).update(
+                total_copies=total,
+                available_copies=available,
+                is_available=GreaterThan(available, 0),
+            )
+        except IntegrityError:
+            raise InvalidRecord('copies lower than the number of copies on loan')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        input_format = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+        reader = read_ndjson if input_format == 'ndjson' else read_csv
+
+        authors = AuthorResolver()
+        imported = 0
+        started = last_report = time.perf_counter()
+        with self.open_input(path) as stream:
+            try:
+                for rows in batched(normalize(reader(stream)), batch_size):
+                    imported += self.write_batch(rows, authors)
+                    now = time.perf_counter()
+                    if now - last_report >= 5:
+                        last_report = now
+                        self.stdout.write(
+                            f'{imported} books ({imported / (now - started):.0f} rows/s)'
+                        )
+            except (InvalidRecord, ValueError, csv.Error) as e:
+                raise CommandError(f'Import stopped after {imported} books: {e}')
+
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {imported} books in {elapsed:.2f}s ({rate:.0f} rows/s)'
+            )
+        )
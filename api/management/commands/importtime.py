@@ -0,0 +1,139 @@
+"""
+Management command to report what a worker imports at startup, and how long
+it takes, for each app profile (LIBRARY_APP_PROFILE)
+Usage: python manage.py importtime [--profiles full slim] [--top 15]
+
+Each profile boots in a fresh interpreter under `python -X importtime` the
+way a worker does: django.setup(), the WSGI handler with its middleware and
+the URLconf (which imports the views). Prints the boot time, the time spent
+importing, and the packages and modules that cost the most, as measured by
+the interpreter itself.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+PROFILES = ('full', 'slim')
+
+# Runs in the child interpreter
+BOOT_SCRIPT = """
+import django.core.wsgi
+from django.urls import get_resolver
+
+application = django.core.wsgi.get_wsgi_application()
+get_resolver().url_patterns
+"""
+
+# "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output into {module: (self_us, cumulative_us)}.
+    Only modules imported directly by the boot script (depth 0) have a
+    cumulative time that is not already counted in their parent.
+    """
+    modules, top_level = {}, []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        modules[module] = (int(self_us), int(cumulative_us))
+        if len(indent) == 1:
+            top_level.append(module)
+    return modules, top_level
+
+
+def measure(profile):
+    """Boot the app in a child interpreter and return its import report"""
+    env = dict(
+        os.environ,
+        LIBRARY_APP_PROFILE=profile,
+        DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'library_project.settings'),
+    )
+    command = [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT]
+    started = time.perf_counter()
+    result = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise CommandError(f'{profile} profile failed to boot:\n{result.stderr[-2000:]}')
+
+    modules, top_level = parse_importtime(result.stderr)
+    packages = defaultdict(lambda: [0, 0])
+    for module, (self_us, _) in modules.items():
+        package = packages[module.split('.')[0]]
+        package[0] += self_us
+        package[1] += 1
+    return {
+        'boot_ms': round(elapsed * 1000, 1),
+        'imported': sorted(modules),
+        'import_ms': round(sum(modules[m][1] for m in top_level) / 1000, 1),
+        'modules': len(modules),
+        'packages': {
+            name: {'self_ms': round(self_us / 1000, 1), 'modules': count}
+            for name, (self_us, count) in sorted(packages.items(), key=lambda item: -item[1][0])
+        },
+        'slowest_modules': [
+            {'module': module, 'self_ms': round(self_us / 1000, 1)}
+            for module, (self_us, _) in sorted(modules.items(), key=lambda item: -item[1][0])
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Report startup import times for the full and slim app profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+', choices=PROFILES, default=list(PROFILES),
+            help='App profiles to measure (default: full slim)'
+        )
+        parser.add_argument('--top', type=int, default=15, help='Packages and modules to list (default: 15)')
+        parser.add_argument('--runs', type=int, default=3, help='Boots per profile; the fastest is kept (default: 3)')
+        parser.add_argument('--output', help='Write the full JSON report to this file')
+
+    def handle(self, *args, **options):
+        top = options['top']
+        report = {}
+        for profile in options['profiles']:
+            runs = [measure(profile) for _ in range(max(1, options['runs']))]
+            report[profile] = result = min(runs, key=lambda run: run['import_ms'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{profile}: boot {result['boot_ms']} ms, imports {result['import_ms']} ms "
+                f"({result['modules']} modules)"
+            ))
+            self.stdout.write('  Packages (self time):')
+            for name, package in list(result['packages'].items())[:top]:
+                self.stdout.write(f"    {name:<28} {package['self_ms']:>8} ms  {package['modules']:>5} modules")
+            self.stdout.write('  Modules (self time):')
+            for entry in result['slowest_modules'][:top]:
+                self.stdout.write(f"    {entry['module']:<48} {entry['self_ms']:>8} ms")
+            self.stdout.write('')
+
+        if 'full' in report and 'slim' in report:
+            full, slim = report['full'], report['slim']
+            saved = round(full['import_ms'] - slim['import_ms'], 1)
+            dropped = defaultdict(int)
+            for module in set(full['imported']) - set(slim['imported']):
+                dropped[module.split('.')[0]] += 1
+            self.stdout.write(self.style.SUCCESS(
+                f"slim saves {saved} ms of imports and {full['modules'] - slim['modules']} modules"
+            ))
+            if dropped:
+                listed = ', '.join(f'{name} ({count})' for name, count in sorted(dropped.items()))
+                self.stdout.write(f"  Not imported by slim: {listed}")
+
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                out.write(json.dumps(report, indent=2) + '\n')
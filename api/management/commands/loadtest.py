@@ -0,0 +1,200 @@
+"""
+Management command to load-test the API with a concurrent mixed workload
+Usage: python manage.py loadtest --seed --books 10000 --concurrency 8 --duration 10
+
+Runs the WSGI application in-process (default) or drives a running server
+(--mode http --url http://localhost:8000) and prints throughput and
+p50/p95/p99 latencies per endpoint as JSON.
+"""
+import json
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.benchmarking import (
+    BENCH_PASSWORD, BENCH_USERS, HTTPClient, InProcessClient, LatencyRecorder,
+    benchmark_ids, seed_dataset, timed,
+)
+
+
+WORKLOADS = ('browse', 'auth', 'loans', 'members')
+DEFAULT_MIX = 'browse=60,auth=5,loans=20,members=15'
+
+
+def parse_mix(value):
+    weights = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in WORKLOADS:
+            raise CommandError(f"Unknown workload '{name}'. Choose from: {', '.join(WORKLOADS)}")
+        try:
+            weights[name] = float(weight)
+        except ValueError:
+            raise CommandError(f"Invalid weight for '{name}': {weight!r}")
+    if not any(weights.values()):
+        raise CommandError('--mix needs at least one positive weight')
+    return weights
+
+
+class Worker:
+    """One simulated client looping over the weighted workload mix."""
+
+    def __init__(self, client, recorder, book_ids, member_ids, hot_book_ids, rng):
+        self.client = client
+        self.recorder = recorder
+        self.book_ids = book_ids
+        self.member_ids = member_ids
+        self.hot_book_ids = hot_book_ids
+        self.rng = rng
+        self.token = None
+        self.pages = max(1, len(book_ids) // 10)
+        self.member_pages = max(1, len(member_ids) // 10)
+
+    def authenticate(self):
+        status, body = timed(
+            self.recorder, 'POST /api/auth/jwt/create/', self.client.request,
+            'POST', '/api/auth/jwt/create/',
+            {'username': BENCH_USERS['member'], 'password': BENCH_PASSWORD},
+        )
+        if status == 200:
+            self.token = json.loads(body)['access']
+        return status
+
+    def authenticated(self, endpoint, method, path, data=None):
+        if self.token is None:
+            self.authenticate()
+        status, body = timed(
+            self.recorder, endpoint, self.client.request, method, path, data, self.token
+        )
+        if status == 401:
+            # Access tokens are short-lived; get a new one on the next call
+            self.token = None
+        return status, body
+
+    def browse(self):
+        if self.rng.random() < 0.5:
+            page = self.rng.randint(1, self.pages)
+            timed(self.recorder, 'GET /api/books/', self.client.request, 'GET', f'/api/books/?page={page}')
+        else:
+            book_id = self.rng.choice(self.book_ids)
+            timed(self.recorder, 'GET /api/books/{id}/', self.client.request, 'GET', f'/api/books/{book_id}/')
+
+    def auth(self):
+        self.authenticate()
+
+    def loans(self):
+        payload = {
+            'book': self.rng.choice(self.hot_book_ids),
+            'member': self.rng.choice(self.member_ids),
+        }
+        status, _ = self.authenticated('POST /api/borrow/', 'POST', '/api/borrow/', payload)
+        if status == 200:
+            self.authenticated('POST /api/return/', 'POST', '/api/return/', payload)
+
+    def members(self):
+        page = self.rng.randint(1, self.member_pages)
+        self.authenticated('GET /api/members/', 'GET', f'/api/members/?page={page}')
+
+    def run(self, mix, deadline):
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        while time.perf_counter() < deadline:
+            getattr(self, self.rng.choices(names, weights)[0])()
+
+
+class Command(BaseCommand):
+    help = 'Run a concurrent mixed workload against the API and report latency percentiles as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=['inprocess', 'http'],
+            default='inprocess',
+            help='Run the WSGI app in this process, or drive a running server over HTTP'
+        )
+        parser.add_argument('--url', default='http://localhost:8000', help='Server URL for --mode http')
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='Create the benchmark dataset (books, members, users) in the configured database first'
+        )
+        parser.add_argument('--books', type=int, default=10000, help='Books to seed (default: 10000)')
+        parser.add_argument('--members', type=int, default=1000, help='Members to seed (default: 1000)')
+        parser.add_argument(
+            '--hot-books',
+            type=int,
+            default=5,
+            help='Number of titles all borrow/return traffic contends on (default: 5)'
+        )
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients (default: 8)')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to run (default: 10)')
+        parser.add_argument(
+            '--mix',
+            default=DEFAULT_MIX,
+            help=f'Workload weights (default: {DEFAULT_MIX})'
+        )
+        parser.add_argument('--random-seed', type=int, default=None, help='Seed for reproducible request mixes')
+        parser.add_argument('--output', help='Write the JSON report to this file as well')
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be at least 1')
+
+        if options['seed']:
+            seed_dataset(options['books'], options['members'], stdout=self.stderr)
+        book_ids, member_ids = benchmark_ids()
+        if not book_ids or not member_ids:
+            raise CommandError('No benchmark data found; run with --seed first')
+        hot_book_ids = book_ids[:max(1, options['hot_books'])]
+
+        if options['mode'] == 'http':
+            make_client = lambda: HTTPClient(options['url'])  # noqa: E731
+        else:
+            make_client = InProcessClient
+
+        recorder = LatencyRecorder()
+        master_rng = random.Random(options['random_seed'])
+        workers = [
+            Worker(make_client(), recorder, book_ids, member_ids, hot_book_ids,
+                   random.Random(master_rng.random()))
+            for _ in range(options['concurrency'])
+        ]
+
+        def run(worker, deadline):
+            try:
+                worker.run(mix, deadline)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        deadline = started + options['duration']
+        threads = [threading.Thread(target=run, args=(worker, deadline)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        report = {
+            'config': {
+                'mode': options['mode'],
+                'url': options['url'] if options['mode'] == 'http' else None,
+                'concurrency': options['concurrency'],
+                'duration_s': options['duration'],
+                'mix': mix,
+                'books': len(book_ids),
+                'members': len(member_ids),
+                'hot_books': len(hot_book_ids),
+            },
+            **recorder.report(elapsed),
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                out.write(output + '\n')
+        self.stdout.write(output)
@@ -0,0 +1,150 @@
+"""
+Middleware for the library API
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from . import compression
+from .instrumentation import QueryCollector, metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Opt-in per-request SQL and timing instrumentation.
+
+    Enabled with the API_INSTRUMENTATION_ENABLED setting. For every request
+    it counts queries and SQL time on all database connections, adds a
+    `Server-Timing` header (db, app and total durations), flags requests
+    that run the same statement API_INSTRUMENTATION_REPEAT_THRESHOLD times
+    or more (likely N+1) with `X-Query-Repeats` and a warning log, and feeds
+    the per-view aggregates served at /api/metrics/requests/.
+
+    Queries run while a streaming response is consumed are not counted.
+    The middleware is sync-only, so while it is enabled the async views in
+    async_views.py run in a thread under ASGI.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.repeat_threshold = getattr(settings, 'API_INSTRUMENTATION_REPEAT_THRESHOLD', 5)
+        metrics.window = getattr(settings, 'API_INSTRUMENTATION_WINDOW', metrics.window)
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(collector))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        repeated_sql, repeats = collector.most_repeated()
+        flagged = repeats >= self.repeat_threshold
+        view = self.view_name(request)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={collector.duration * 1000:.2f};desc="{collector.count} queries"',
+            f'app;dur={(duration - collector.duration) * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+        ])
+        if flagged:
+            response['X-Query-Repeats'] = str(repeats)
+            logger.warning(
+                'Possible N+1 in %s: same query ran %d times: %s',
+                view, repeats, repeated_sql
+            )
+
+        metrics.record(
+            view, duration, collector.count, collector.duration,
+            repeated_sql, repeats, flagged
+        )
+        return response
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return f'{request.method} <unresolved>'
+        return f'{request.method} {match.view_name}'
+
+
+class CompressionMiddleware:
+    """
+    Content-negotiated response compression: brotli when the client accepts
+    it and the brotli package is installed, gzip otherwise.
+
+    Enabled with API_COMPRESSION_ENABLED. Only text-like content types are
+    compressed (see compression.COMPRESSIBLE_TYPES; not HTML, because of
+    BREACH). Responses smaller than
+    API_COMPRESSION_MIN_SIZE bytes are sent as is, as are compressed bodies
+    that come out no smaller. Streaming responses (the borrow history
+    export) are compressed chunk by chunk as they are produced. A strong
+    ETag becomes weak, since the body is no longer byte-identical.
+
+    Works in both sync and async mode, so the async views keep running on
+    the event loop under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_COMPRESSION_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+        self.codecs = compression.available_codecs()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not compression.is_compressible(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codec = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), self.codecs)
+        if codec is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compression.acompress_sequence(codec, response.streaming_content)
+            else:
+                response.streaming_content = compression.compress_sequence(codec, response.streaming_content)
+            # The length is not known until the stream is consumed
+            del response['Content-Length']
+        else:
+            compressed = compression.compress(codec, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = codec.name
+        return response
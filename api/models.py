@@ -2,7 +2,24 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 
 
-class User(AbstractUser):
+class LibraryRoleMixin:
+    """
+    Role helpers shared by User and the stateless token user
+    (api.authentication.LibraryTokenUser). Requires `role` and `is_staff`.
+    """
+
+    @property
+    def is_librarian(self):
+        """Check if user is a librarian"""
+        return self.role == 'librarian' or self.is_staff
+
+    @property
+    def is_member(self):
+        """Check if user is a member"""
+        return self.role == 'member'
+
+
+class User(LibraryRoleMixin, AbstractUser):
     """
     Custom User model with role-based access control.
     
@@ -29,16 +46,6 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
     
-    @property
-    def is_librarian(self):
-        """Check if user is a librarian"""
-        return self.role == 'librarian' or self.is_staff
-    
-    @property
-    def is_member(self):
-        """Check if user is a member"""
-        return self.role == 'member'
-    
     def save(self, *args, **kwargs):
         """
         Auto-set is_staff based on role
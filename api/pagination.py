@@ -0,0 +1,63 @@
+"""
+Pagination classes for the library API
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination with opaque cursors and no COUNT(*) query.
+
+    Every page is a range scan on an indexed key, so page 50,000 costs the
+    same as page 1. The sort key is chosen with ?ordering=<key> from the
+    view's `cursor_orderings` mapping; the first entry is the default.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering_query_param = 'ordering'
+
+    def get_ordering(self, request, queryset, view):
+        orderings = getattr(view, 'cursor_orderings', None) or {'id': ('id',)}
+        key = request.query_params.get(self.ordering_query_param)
+        if key is None:
+            return next(iter(orderings.values()))
+        if key not in orderings:
+            raise ValidationError({
+                self.ordering_query_param: f"Choose one of: {', '.join(orderings)}."
+            })
+        return orderings[key]
+
+
+class PaginationModeMixin:
+    """
+    Viewset mixin that serves either page-number or keyset pages.
+
+    `pagination_mode` sets the viewset default ('page' or 'cursor');
+    clients can override it per request with ?pagination=page|cursor.
+    """
+    pagination_mode = 'page'
+    pagination_mode_param = 'pagination'
+    cursor_pagination_class = KeysetPagination
+    cursor_orderings = {'id': ('id',)}
+
+    def get_pagination_class(self):
+        mode = self.pagination_mode
+        request = getattr(self, 'request', None)
+        if request is not None:
+            mode = request.query_params.get(self.pagination_mode_param, mode)
+
+        if mode == 'page':
+            return self.pagination_class
+        if mode == 'cursor':
+            return self.cursor_pagination_class
+        raise ValidationError({
+            self.pagination_mode_param: "Choose one of: page, cursor."
+        })
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.get_pagination_class()
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
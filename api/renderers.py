@@ -0,0 +1,71 @@
+"""
+Renderers for the library API
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    # Same output as JSONRenderer: aware UTC datetimes end in "Z" and
+    # non-string dict keys become strings
+    ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    """
+    Compact UTF-8 JSON bytes of data, with orjson when it is installed.
+    Types neither encoder knows (Decimal, lazy strings, querysets, ...) go
+    through DRF's JSONEncoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson, which renders large pages several times
+    faster than the stdlib encoder (`python manage.py bench_renderers`).
+
+    The output is the same as JSONRenderer's. Indented output (the browsable
+    API, `; indent=` in Accept), UNICODE_JSON/COMPACT_JSON turned off, and
+    installs without orjson use JSONRenderer itself.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+
+
+class _ExportRenderer(BaseRenderer):
+    """
+    Negotiates an export format. Successful exports are streamed by the view;
+    this renderer only renders error responses, as JSON.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
+
+
+class NDJSONRenderer(_ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
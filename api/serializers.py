@@ -1,25 +1,233 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.lookups import GreaterThan
 from rest_framework import serializers
-from library.models import Author, Book, Member, BorrowRecord
+from rest_framework.permissions import SAFE_METHODS
+from library import stats
+from library.models import Author, Book, Member, BorrowRecord, Hold
+from . import loans
 
-class AuthorSerializer(serializers.ModelSerializer):
+
+def _requested_names(request, param):
+    """Comma-separated names from a query parameter, or None if absent."""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin for sparse and expanded read responses.
+
+    - ?fields=id,title returns only the listed fields
+    - ?expand=author replaces the related id with the nested object, for
+      the names in `expandable_fields` (name -> serializer class)
+
+    Both only apply to reads; writes always use the full field set.
+    Use `validate_requested_names` to reject unknown names and
+    `optimize_queryset` to load exactly what the response needs.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+
+        for name in self.get_expanded_fields(request):
+            self.fields[name] = self.expandable_fields[name](read_only=True)
+
+        fields = _requested_names(request, 'fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def get_expanded_fields(cls, request):
+        expand = _requested_names(request, 'expand') or []
+        fields = _requested_names(request, 'fields')
+        return [
+            name for name in dict.fromkeys(expand)
+            if name in cls.expandable_fields and (fields is None or name in fields)
+        ]
+
+    @classmethod
+    def validate_requested_names(cls, request):
+        """Reject (400) ?fields=/?expand= names that this serializer does not have."""
+        fields = _requested_names(request, 'fields')
+        if fields is not None:
+            valid = list(cls().fields)
+            unknown = [name for name in fields if name not in valid]
+            if unknown:
+                raise serializers.ValidationError({
+                    'fields': f"Unknown field: {', '.join(unknown)}. Choose from: {', '.join(valid)}."
+                })
+        expand = _requested_names(request, 'expand') or []
+        unknown = [name for name in expand if name not in cls.expandable_fields]
+        if unknown:
+            choices = ', '.join(cls.expandable_fields) or 'none'
+            raise serializers.ValidationError({
+                'expand': f"Cannot expand: {', '.join(unknown)}. Choose from: {choices}."
+            })
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        """
+        Join expanded relations with select_related (one query for a whole
+        page) and restrict columns with only() for sparse field sets.
+        """
+        expanded = cls.get_expanded_fields(request)
+        if expanded:
+            queryset = queryset.select_related(*expanded)
+
+        fields = _requested_names(request, 'fields')
+        if fields is not None:
+            concrete = {field.name for field in queryset.model._meta.concrete_fields}
+            columns = [name for name in fields if name in concrete]
+            if columns:
+                queryset = queryset.only(*columns)
+        return queryset
+
+
+class AuthorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Author
         fields = '__all__'
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """
+    Copies are managed through `total_copies`: new books start with all
+    copies available, and changing the total moves `available_copies` by
+    the same amount. `available_copies` and `is_available` are read-only;
+    borrow/return keep them up to date. Added copies are lent to members
+    waiting for the book (holds) first.
+    """
+    expandable_fields = {
+        'author': AuthorSerializer,
+    }
+
     class Meta:
         model = Book
         fields = '__all__'
+        read_only_fields = ('is_available', 'available_copies')
+        extra_kwargs = {'total_copies': {'min_value': 1}}
+
+    def create(self, validated_data):
+        total = validated_data.get('total_copies', 1)
+        validated_data['available_copies'] = total
+        # Atomic, so the change feed event (api/signals.py) commits with the book
+        with transaction.atomic():
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        total = validated_data.pop('total_copies', None)
+        with transaction.atomic():
+            if total is not None:
+                # Both counts move by the same amount, computed from the
+                # current row; refused if more copies are on loan than the
+                # new total.
+                changed = Book.objects.filter(
+                    pk=instance.pk,
+                    available_copies__gte=F('total_copies') - total
+                ).update(
+                    available_copies=F('available_copies') + total - F('total_copies'),
+                    is_available=GreaterThan(F('available_copies') + total - F('total_copies'), 0),
+                    total_copies=total
+                )
+                if not changed:
+                    raise serializers.ValidationError({
+                        'total_copies': "Cannot be lower than the number of copies on loan."
+                    })
+                # Added copies go to the members waiting for the book first
+                loans.serve_holds(instance.pk)
+                # A queryset update: the post_save rollup handler does not see it
+                stats.count_copies([instance.category])
+                instance.refresh_from_db(fields=['total_copies', 'available_copies', 'is_available'])
 
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            # Save only the edited fields, so a concurrent borrow/return of
+            # this book is not overwritten with stale copy counts
+            instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
-class MemberSerializer(serializers.ModelSerializer):
+
+class MemberSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Member
         fields = '__all__'
 
 
-class BorrowRecordSerializer(serializers.ModelSerializer):
+class BorrowRecordSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'book': BookSerializer,
+        'member': MemberSerializer,
+    }
+
     class Meta:
         model = BorrowRecord
         fields = '__all__'
+
+
+class HoldSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'book': BookSerializer,
+        'member': MemberSerializer,
+    }
+
+    class Meta:
+        model = Hold
+        fields = '__all__'
+        read_only_fields = ('status', 'created_at', 'resolved_at')
+
+
+class DynamicFieldsViewMixin:
+    """
+    Viewset mixin that matches the queryset to the ?fields=/?expand=
+    parameters handled by the serializer, after rejecting unknown names.
+    """
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, DynamicFieldsMixin):
+            serializer_class.validate_requested_names(self.request)
+            queryset = serializer_class.optimize_queryset(queryset, self.request)
+        return queryset
+
+
+class BulkLoanSerializer(serializers.Serializer):
+    """
+    Request body for the bulk borrow/return endpoints
+    """
+    member = serializers.IntegerField()
+    books = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=50
+    )
+
+
+class BatchIdsSerializer(serializers.Serializer):
+    """
+    Ids for the batch multi-get (?ids=1,2,3 or POST {"ids": [...]}), at
+    most API_BATCH_MAX_IDS of them
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+    def validate_ids(self, value):
+        max_ids = getattr(settings, 'API_BATCH_MAX_IDS', 100)
+        if len(value) > max_ids:
+            raise serializers.ValidationError(f"Ensure this field has no more than {max_ids} elements.")
+        return value
+
+
+class HoldRequestSerializer(serializers.Serializer):
+    """
+    Request body for placing a hold
+    """
+    book = serializers.IntegerField()
+    member = serializers.IntegerField()
@@ -0,0 +1,59 @@
+"""
+Signal handlers that keep API-side caches, the change feed and the live
+availability stream in sync with the library models
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from library.models import Author, Book, ChangeEvent
+from . import broker, cache, changes
+from .authentication import invalidate_cached_user
+from .models import User
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book(sender, instance, **kwargs):
+    cache.invalidate_books_on_commit([instance.pk])
+
+
+# Written in the transaction of the save/delete when there is one: the
+# API's book writes, the admin and Model.delete() are atomic
+@receiver(post_save, sender=Book)
+def record_book_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    kind = ChangeEvent.BOOK_CREATED if created else ChangeEvent.BOOK_UPDATED
+    changes.record_book_changes(kind, [instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def publish_book_availability(sender, instance, raw=False, **kwargs):
+    # Copy counts can change on save (e.g. total_copies edited)
+    if not raw:
+        broker.publish_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def record_book_deleted(sender, instance, **kwargs):
+    changes.record_book_changes(ChangeEvent.BOOK_DELETED, [instance.pk])
+
+
+@receiver(post_save, sender=Author)
+def invalidate_author_books(sender, instance, created, **kwargs):
+    if created:
+        return
+    books = Book.objects.filter(author_id=instance.pk)
+    # Books embed their author with ?expand=author, so their ETag/Last-Modified
+    # validators must change too.
+    books.update(updated_at=timezone.now())
+    book_ids = list(books.values_list('id', flat=True))
+    cache.invalidate_books_on_commit(book_ids)
+    changes.record_book_changes(ChangeEvent.BOOK_UPDATED, book_ids)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
@@ -1,3 +1,733 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from library.models import Author, Book, BorrowRecord, ChangeEvent, Hold, Member
+from . import cache, loans
+from .models import User
+
+
+def create_book(title='Dune', isbn='9780441013593', copies=1, category='Fiction', author=None):
+    author = author or Author.objects.create(name='Frank Herbert')
+    return Book.objects.create(
+        title=title, ISBN=isbn, category=category, author=author,
+        total_copies=copies, available_copies=copies
+    )
+
+
+def create_member(name='Ada'):
+    return Member.objects.create(name=name, email=f'{name.lower()}@example.com')
+
+
+def api_client(role='member', username=None):
+    """An APIClient authenticated with an access token for a new user of `role`."""
+    user = User.objects.create_user(username or role, password='Passw0rd!23', role=role)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+class BorrowBookTests(TestCase):
+    """Borrow/return through the loan service: one conditional UPDATE per copy"""
+
+    def setUp(self):
+        self.book = create_book()
+        self.ada = create_member('Ada')
+        self.bob = create_member('Bob')
+
+    def test_borrowing_the_last_copy(self):
+        loans.borrow_book(self.book.id, self.ada.id)
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertFalse(self.book.is_available)
+
+        with self.assertRaises(loans.LoanError) as raised:
+            loans.borrow_book(self.book.id, self.bob.id)
+        self.assertEqual(raised.exception.message, loans.BOOK_NOT_AVAILABLE)
+        self.assertEqual(BorrowRecord.objects.filter(book=self.book, return_date__isnull=True).count(), 1)
+
+    def test_double_borrow_is_rejected_and_rolled_back(self):
+        book = create_book(title='Emma', isbn='9780141439587', copies=2, author=self.book.author)
+        loans.borrow_book(book.id, self.ada.id)
+
+        with self.assertRaises(loans.LoanError) as raised:
+            loans.borrow_book(book.id, self.ada.id)
+        self.assertEqual(raised.exception.message, loans.ALREADY_BORROWED)
+
+        # The copy taken before the unique constraint fired is put back
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 1)
+        self.assertTrue(book.is_available)
+        self.assertEqual(BorrowRecord.objects.filter(book=book).count(), 1)
+
+    def test_returning_a_book_that_was_never_borrowed(self):
+        with self.assertRaises(loans.LoanError) as raised:
+            loans.return_book(self.book.id, self.ada.id)
+        self.assertEqual(raised.exception.message, loans.NO_ACTIVE_RECORD)
+        self.assertEqual(raised.exception.status_code, 404)
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_return_puts_the_copy_back(self):
+        loans.borrow_book(self.book.id, self.ada.id)
+        self.assertIsNone(loans.return_book(self.book.id, self.ada.id))
+
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+        self.assertTrue(self.book.is_available)
+        with self.assertRaises(loans.LoanError):
+            loans.return_book(self.book.id, self.ada.id)
+
+    def test_borrow_endpoint_errors(self):
+        client = api_client()
+        response = client.post('/api/borrow/', {'book': self.book.id, 'member': self.ada.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = client.post('/api/borrow/', {'book': self.book.id, 'member': self.bob.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": loans.BOOK_NOT_AVAILABLE})
+
+        response = client.post('/api/return/', {'book': self.book.id, 'member': self.bob.id}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {"error": loans.NO_ACTIVE_RECORD})
+
+
+class BulkLoanTests(TestCase):
+    """Bulk borrow/return: one result per requested id, in request order"""
+
+    def setUp(self):
+        self.author = Author.objects.create(name='Jane Austen')
+        self.emma = create_book('Emma', '9780141439587', copies=2, author=self.author)
+        self.persuasion = create_book('Persuasion', '9780141439686', copies=1, author=self.author)
+        self.sanditon = create_book('Sanditon', '9780140431988', copies=1, author=self.author)
+        self.ada = create_member('Ada')
+        self.bob = create_member('Bob')
+
+    def test_bulk_borrow_reports_each_item(self):
+        loans.borrow_book(self.sanditon.id, self.bob.id)
+
+        results = loans.bulk_borrow(
+            self.ada.id, [self.emma.id, self.sanditon.id, 999, self.emma.id, self.persuasion.id]
+        )
+        self.assertEqual(results, [
+            {"book": self.emma.id, "status": "borrowed"},
+            {"book": self.sanditon.id, "status": "failed", "error": loans.BOOK_NOT_AVAILABLE},
+            {"book": 999, "status": "failed", "error": loans.BOOK_NOT_FOUND},
+            {"book": self.emma.id, "status": "failed", "error": loans.DUPLICATE_BOOK},
+            {"book": self.persuasion.id, "status": "borrowed"},
+        ])
+        self.emma.refresh_from_db()
+        self.persuasion.refresh_from_db()
+        self.assertEqual(self.emma.available_copies, 1)
+        self.assertEqual(self.persuasion.available_copies, 0)
+        self.assertFalse(self.persuasion.is_available)
+
+    def test_bulk_borrow_falls_back_per_item_on_integrity_error(self):
+        loans.borrow_book(self.emma.id, self.ada.id)
+
+        # Emma is still available, so the batch UPDATE takes a copy and the
+        # bulk INSERT hits the unique active-loan constraint
+        results = loans.bulk_borrow(self.ada.id, [self.persuasion.id, self.emma.id])
+        self.assertEqual(results, [
+            {"book": self.persuasion.id, "status": "borrowed"},
+            {"book": self.emma.id, "status": "failed", "error": loans.ALREADY_BORROWED},
+        ])
+        self.emma.refresh_from_db()
+        self.assertEqual(self.emma.available_copies, 1)
+
+    def test_bulk_return_reports_each_item(self):
+        loans.bulk_borrow(self.ada.id, [self.emma.id, self.persuasion.id])
+
+        results = loans.bulk_return(self.ada.id, [self.persuasion.id, self.sanditon.id, self.persuasion.id])
+        self.assertEqual(results, [
+            {"book": self.persuasion.id, "status": "returned"},
+            {"book": self.sanditon.id, "status": "failed", "error": loans.NO_ACTIVE_RECORD},
+            {"book": self.persuasion.id, "status": "failed", "error": loans.DUPLICATE_BOOK},
+        ])
+        self.persuasion.refresh_from_db()
+        self.assertEqual(self.persuasion.available_copies, 1)
+        self.assertTrue(self.persuasion.is_available)
+
+    def test_bulk_return_skips_holders_who_already_have_the_book(self):
+        loans.bulk_borrow(self.ada.id, [self.emma.id, self.persuasion.id])
+        hold, _ = loans.place_hold(self.persuasion.id, self.bob.id)
+        # Bob got a copy some other way while his hold was waiting
+        BorrowRecord.objects.create(book=self.persuasion, member=self.bob)
+
+        results = loans.bulk_return(self.ada.id, [self.emma.id, self.persuasion.id])
+        self.assertEqual(results, [
+            {"book": self.emma.id, "status": "returned"},
+            {"book": self.persuasion.id, "status": "returned"},
+        ])
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, Hold.FULFILLED)
+        self.persuasion.refresh_from_db()
+        self.assertEqual(self.persuasion.available_copies, 1)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Iain M. Banks')
+        titles = ['Excession', 'Matter', 'Matter', 'Matter', 'Surface Detail', 'Use of Weapons', 'Excession']
+        self.books = [
+            create_book(title, f'97800000000{index:02d}', author=author) for index, title in enumerate(titles)
+        ]
+        self.client = APIClient()
+
+    def walk(self, **params):
+        """Follow the `next` links from the first page; returns the ids in order and the SQL run."""
+        ids, url = [], '/api/books/'
+        params = {'pagination': 'cursor', 'page_size': 2, **params}
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                page = response.json()
+                self.assertNotIn('count', page)
+                ids += [book['id'] for book in page['results']]
+                url, params = page['next'], None
+        return ids, [query['sql'] for query in queries]
+
+    def test_pages_by_id(self):
+        ids, queries = self.walk()
+        self.assertEqual(ids, sorted(book.id for book in self.books))
+        self.assertEqual(len(queries), 4)
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql.upper()])
+
+    def test_pages_by_title_with_duplicate_titles(self):
+        ids, queries = self.walk(ordering='title')
+        self.assertEqual(ids, [book.id for book in sorted(self.books, key=lambda book: (book.title, book.id))])
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql.upper()])
+
+    def test_previous_link_walks_back(self):
+        first = self.client.get('/api/books/', {'pagination': 'cursor', 'ordering': 'title', 'page_size': 3}).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+    def test_invalid_parameters(self):
+        for params in ({'ordering': 'isbn'}, {'pagination': 'offset'}):
+            response = self.client.get('/api/books/', {'pagination': 'cursor', **params})
+            self.assertEqual(response.status_code, 400, params)
+        response = self.client.get('/api/books/', {'pagination': 'cursor', 'ordering': 'isbn'})
+        self.assertEqual(response.json(), {"ordering": "Choose one of: id, title."})
+
+
+class DynamicFieldsTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Ursula K. Le Guin')
+        self.books = [
+            create_book('The Dispossessed', '9780061054884', author=author),
+            create_book('The Lathe of Heaven', '9781416556961', author=Author.objects.create(name='U. K. Le Guin')),
+            create_book('The Left Hand of Darkness', '9780441478125', author=author),
+        ]
+        self.client = APIClient()
+
+    def get(self, url, params, queries):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(captured), queries, [query['sql'] for query in captured])
+        return response.json(), [query['sql'] for query in captured]
+
+    def test_expanded_list_stays_at_one_page_query(self):
+        # COUNT(*) and one page query joining the authors
+        page, _ = self.get('/api/books/', {'expand': 'author'}, 2)
+        self.assertEqual(
+            [book['author']['name'] for book in page['results']],
+            [book.author.name for book in self.books]
+        )
+        page, _ = self.get('/api/books/', {'expand': 'author', 'pagination': 'cursor'}, 1)
+        self.assertEqual(len(page['results']), 3)
+
+    def test_expanded_detail(self):
+        # The conditional GET timestamp lookup, then the joined row
+        book, _ = self.get(f'/api/books/{self.books[0].id}/', {'expand': 'author'}, 2)
+        self.assertEqual(book['author']['name'], 'Ursula K. Le Guin')
+
+    def test_sparse_fields_load_only_their_columns(self):
+        page, queries = self.get('/api/books/', {'fields': 'id,title'}, 2)
+        self.assertEqual(page['results'][0], {'id': self.books[0].id, 'title': 'The Dispossessed'})
+        self.assertNotIn('"ISBN"', queries[-1])
+
+        book, queries = self.get(f'/api/books/{self.books[0].id}/', {'fields': 'title,author', 'expand': 'author'}, 2)
+        self.assertEqual(set(book), {'title', 'author'})
+        self.assertEqual(book['author']['name'], 'Ursula K. Le Guin')
+        self.assertNotIn('"ISBN"', queries[-1])
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/books/', {'fields': 'id,nonexistent'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unknown field: nonexistent. Choose from: id, ', response.json()['fields'])
+        self.assertIn('title', response.json()['fields'])
+
+        response = self.client.get(f'/api/books/{self.books[0].id}/', {'expand': 'publisher'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"expand": "Cannot expand: publisher. Choose from: author."})
+
+
+class BatchRetrieveTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Jane Austen')
+        self.emma = create_book('Emma', '9780141439587', author=author)
+        self.persuasion = create_book('Persuasion', '9780141439686', author=author)
+        self.client = APIClient()
+
+    def test_results_follow_the_requested_order(self):
+        ids = f'{self.persuasion.id},{self.emma.id},999,{self.persuasion.id}'
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/books/', {'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        results = [book['id'] for book in response.json()['results']]
+        self.assertEqual(results, [self.persuasion.id, self.emma.id])
+        self.assertEqual(response.json()['missing'], [999])
+
+        response = self.client.post(
+            '/api/books/batch/', {'ids': [self.emma.id, 999, self.emma.id, 998]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([book['id'] for book in response.json()['results']], [self.emma.id])
+        self.assertEqual(response.json()['missing'], [999, 998])
+
+    @override_settings(API_BATCH_MAX_IDS=2)
+    def test_invalid_ids_are_rejected(self):
+        for ids in ('1,2,3', '1,abc', ','):
+            self.assertEqual(self.client.get('/api/books/', {'ids': ids}).status_code, 400, ids)
+        for body in ({'ids': [1, 2, 3]}, {'ids': []}, {'ids': 'all'}, {}):
+            response = self.client.post('/api/books/batch/', body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_field_selection(self):
+        response = self.client.get('/api/books/', {'ids': self.emma.id, 'fields': 'id,title'})
+        self.assertEqual(response.json()['results'], [{'id': self.emma.id, 'title': 'Emma'}])
+
+        response = self.client.post(
+            '/api/books/batch/?fields=id,title', {'ids': [self.emma.id]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"fields": "Only supported on GET ?ids=."})
+
+    def test_batch_post_is_a_read(self):
+        # Public for books, although POST /api/books/ is for librarians
+        response = self.client.post('/api/books/batch/', {'ids': [self.emma.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/api/books/', {'title': 'Sanditon'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+        member = create_member()
+        response = self.client.post('/api/members/batch/', {'ids': [member.id]}, format='json')
+        self.assertEqual(response.status_code, 401)
+        response = api_client('member').post('/api/members/batch/', {'ids': [member.id]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['name'], 'Ada')
+
+
+class BookSearchTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Ursula K. Le Guin')
+        create_book('The Dispossessed', '9780061054884', author=author)
+        create_book('The Left Hand of Darkness', '9780441478125', author=author)
+        self.client = APIClient()
+
+    def test_next_link_only_when_more_results_exist(self):
+        response = self.client.get('/api/books/search/', {'q': 'guin', 'limit': 1})
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertIsNotNone(response.json()['next'])
+
+        response = self.client.get('/api/books/search/', {'q': 'guin', 'limit': 1, 'offset': 1})
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertIsNone(response.json()['next'])
+
+        response = self.client.get('/api/books/search/', {'q': 'guin', 'limit': 2})
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNone(response.json()['next'])
+
+
+class BookResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.book = create_book()
+        self.client = APIClient()
+
+    @override_settings(BOOK_CACHE_ENABLED=False)
+    def test_disabled_cache_is_bypassed(self):
+        response = self.client.get(f'/api/books/{self.book.id}/')
+        self.assertNotIn('X-Cache', response)
+
+    @override_settings(BOOK_CACHE_ENABLED=True)
+    def test_borrow_invalidates_the_cached_book(self):
+        url = f'/api/books/{self.book.id}/'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            loans.borrow_book(self.book.id, create_member().id)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['available_copies'], 0)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.book = create_book()
+        self.client = api_client()
+
+    def test_malformed_ids_are_not_found(self):
+        for url in ('/api/books/abc/', '/api/members/abc/'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_matching_etag_gives_not_modified(self):
+        url = f'/api/books/{self.book.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_list_validators_come_from_the_page_rows(self):
+        client = APIClient()
+        # COUNT(*) and the page; keyset pages have no count
+        with self.assertNumQueries(2):
+            response = client.get('/api/books/')
+        with self.assertNumQueries(1):
+            client.get('/api/books/', {'pagination': 'cursor'})
+        with self.assertNumQueries(1):
+            client.get('/api/books/', {'pagination': 'cursor', 'ordering': 'title', 'fields': 'id'})
+
+        self.assertEqual(client.get('/api/books/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.book.title = 'Dune Messiah'
+        self.book.save()
+        self.assertEqual(client.get('/api/books/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class TokenRefreshTests(TestCase):
+    def test_refresh_reissues_the_current_role(self):
+        user = User.objects.create_user('head', password='Passw0rd!23', role='librarian')
+        client = APIClient()
+        tokens = client.post(
+            '/api/auth/jwt/create/', {'username': 'head', 'password': 'Passw0rd!23'}, format='json'
+        ).json()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(client.get('/api/stats/').status_code, 200)
+
+        user.role = 'member'
+        user.save()
+        access = client.post('/api/auth/jwt/refresh/', {'refresh': tokens['refresh']}, format='json').json()['access']
+
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(client.get('/api/stats/').status_code, 403)
+
+
+class HoldQueueTests(TestCase):
+    """Holds are served first come, first served when a copy comes back"""
+
+    def setUp(self):
+        self.book = create_book()
+        self.ada, self.bob, self.cy, self.dee = (create_member(name) for name in ('Ada', 'Bob', 'Cy', 'Dee'))
+        loans.borrow_book(self.book.id, self.ada.id)
+
+    def test_positions_follow_arrival_order(self):
+        positions = [loans.place_hold(self.book.id, member.id)[1] for member in (self.bob, self.cy, self.dee)]
+        self.assertEqual(positions, [1, 2, 3])
+
+    def test_returned_copy_goes_to_the_oldest_waiting_hold(self):
+        bob_hold, _ = loans.place_hold(self.book.id, self.bob.id)
+        cy_hold, _ = loans.place_hold(self.book.id, self.cy.id)
+        loans.place_hold(self.book.id, self.dee.id)
+        loans.cancel_hold(bob_hold.id)
+
+        self.assertEqual(loans.return_book(self.book.id, self.ada.id), self.cy.id)
+
+        cy_hold.refresh_from_db()
+        self.assertEqual(cy_hold.status, Hold.FULFILLED)
+        self.assertTrue(BorrowRecord.objects.filter(book=self.book, member=self.cy, return_date__isnull=True).exists())
+        # The copy changed hands without going back on the shelf
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+        self.assertEqual(loans.return_book(self.book.id, self.cy.id), self.dee.id)
+        self.assertIsNone(loans.return_book(self.book.id, self.dee.id))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_bulk_return_hands_each_copy_to_the_oldest_hold(self):
+        other = create_book('Emma', '9780141439587', author=self.book.author)
+        loans.borrow_book(other.id, self.ada.id)
+        loans.place_hold(self.book.id, self.bob.id)
+        loans.place_hold(self.book.id, self.cy.id)
+        loans.place_hold(other.id, self.dee.id)
+        loans.place_hold(other.id, self.bob.id)
+
+        results = loans.bulk_return(self.ada.id, [self.book.id, other.id])
+        self.assertEqual(results, [
+            {"book": self.book.id, "status": "returned", "next_borrower": self.bob.id},
+            {"book": other.id, "status": "returned", "next_borrower": self.dee.id},
+        ])
+        self.assertEqual(
+            list(Hold.objects.filter(status=Hold.WAITING).order_by('id').values_list('book_id', 'member_id')),
+            [(self.book.id, self.cy.id), (other.id, self.bob.id)]
+        )
+
+    def has_book(self, member):
+        return BorrowRecord.objects.filter(book=self.book, member=member, return_date__isnull=True).exists()
+
+    def free_copies(self, total, available):
+        """Copies put on the shelf outside the loan service, e.g. by an earlier release"""
+        Book.objects.filter(id=self.book.id).update(
+            total_copies=total, available_copies=available, is_available=available > 0
+        )
+
+    def test_added_copies_go_to_the_waiting_line(self):
+        bob_hold, _ = loans.place_hold(self.book.id, self.bob.id)
+        loans.place_hold(self.book.id, self.cy.id)
+
+        client = api_client('librarian')
+        response = client.patch(f'/api/books/{self.book.id}/', {'total_copies': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['available_copies'], response.json()['is_available']), (0, False))
+        self.assertTrue(self.has_book(self.bob))
+        bob_hold.refresh_from_db()
+        self.assertEqual(bob_hold.status, Hold.FULFILLED)
+
+        response = client.patch(f'/api/books/{self.book.id}/', {'total_copies': 4}, format='json')
+        self.assertEqual(response.json()['available_copies'], 1)
+        self.assertTrue(self.has_book(self.cy))
+        self.assertFalse(Hold.objects.filter(status=Hold.WAITING).exists())
+
+    def test_copies_added_by_import_books_go_to_the_waiting_line(self):
+        loans.place_hold(self.book.id, self.bob.id)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('title,ISBN,category,author,copies\n')
+            csv_file.write(f'Dune,{self.book.ISBN},Fiction,Frank Herbert,3\n')
+        try:
+            call_command('import_books', csv_file.name, stdout=io.StringIO())
+        finally:
+            os.unlink(csv_file.name)
+
+        self.assertTrue(self.has_book(self.bob))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_return_skips_holders_who_already_have_the_book(self):
+        bob_hold, _ = loans.place_hold(self.book.id, self.bob.id)
+        loans.place_hold(self.book.id, self.cy.id)
+        # Bob got a second copy while his hold was waiting
+        self.free_copies(total=2, available=1)
+        BorrowRecord.objects.create(book=self.book, member=self.bob)
+        self.free_copies(total=2, available=0)
+
+        self.assertEqual(loans.return_book(self.book.id, self.ada.id), self.cy.id)
+        bob_hold.refresh_from_db()
+        self.assertEqual(bob_hold.status, Hold.FULFILLED)
+        self.assertTrue(self.has_book(self.cy))
+
+        # Nobody left waiting: the next copy goes back on the shelf
+        self.assertIsNone(loans.return_book(self.book.id, self.bob.id))
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_borrowing_cannot_jump_the_line(self):
+        loans.place_hold(self.book.id, self.bob.id)
+        loans.place_hold(self.book.id, self.cy.id)
+        self.free_copies(total=2, available=1)
+
+        with self.assertRaises(loans.LoanError) as raised:
+            loans.borrow_book(self.book.id, self.dee.id)
+        self.assertEqual(raised.exception.message, loans.BOOK_NOT_AVAILABLE)
+        # The free copy went to the head of the line instead
+        self.assertTrue(self.has_book(self.bob))
+        self.assertFalse(self.has_book(self.dee))
+
+        self.free_copies(total=3, available=1)
+        self.assertEqual(
+            loans.bulk_borrow(self.dee.id, [self.book.id]),
+            [{"book": self.book.id, "status": "failed", "error": loans.BOOK_NOT_AVAILABLE}]
+        )
+        self.assertTrue(self.has_book(self.cy))
+
+        # With nobody waiting, a free copy can be borrowed again
+        self.free_copies(total=4, available=1)
+        loans.borrow_book(self.book.id, self.dee.id)
+        self.assertTrue(self.has_book(self.dee))
+
+    def test_holder_in_line_gets_the_free_copy_by_borrowing(self):
+        loans.place_hold(self.book.id, self.bob.id)
+        loans.place_hold(self.book.id, self.cy.id)
+        self.free_copies(total=2, available=1)
+
+        loans.borrow_book(self.book.id, self.bob.id)
+        self.assertTrue(self.has_book(self.bob))
+        with self.assertRaises(loans.LoanError):
+            loans.borrow_book(self.book.id, self.cy.id)
+
+    def test_holds_cannot_be_duplicated(self):
+        loans.place_hold(self.book.id, self.bob.id)
+        with self.assertRaises(loans.LoanError) as raised:
+            loans.place_hold(self.book.id, self.bob.id)
+        self.assertEqual(raised.exception.message, loans.HOLD_EXISTS)
+        self.assertEqual(Hold.objects.filter(book=self.book, member=self.bob).count(), 1)
+
+    def test_borrower_cannot_hold_their_own_book(self):
+        with self.assertRaises(loans.LoanError) as raised:
+            loans.place_hold(self.book.id, self.ada.id)
+        self.assertEqual(raised.exception.message, loans.ALREADY_BORROWED)
+        self.assertFalse(Hold.objects.exists())
+
+    def test_available_books_cannot_be_held(self):
+        loans.return_book(self.book.id, self.ada.id)
+        with self.assertRaises(loans.LoanError) as raised:
+            loans.place_hold(self.book.id, self.bob.id)
+        self.assertEqual(raised.exception.message, loans.BOOK_IS_AVAILABLE)
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name='Terry Pratchett')
+        for index in range(10):
+            create_book(f'Discworld {index}', f'97800000000{index:02d}', author=author)
+        self.client = APIClient()
+
+    def test_json_is_compressed(self):
+        response = self.client.get('/api/books/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_browsable_api_html_is_not_compressed(self):
+        response = self.client.get('/api/books/', HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class CirculationStatsTests(TestCase):
+    def test_query_parameters_are_validated(self):
+        client = api_client('librarian')
+        self.assertEqual(client.get('/api/stats/', {'top': 5, 'days': 7}).status_code, 200)
+        response = client.get('/api/stats/', {'top': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"top": "Must be at least 1."})
+        self.assertEqual(client.get('/api/stats/', {'days': 'week'}).status_code, 400)
+
+    def test_utilization_reads_only_the_rollups(self):
+        client = api_client('librarian')
+        book = create_book(copies=2)
+        loans.borrow_book(book.id, create_member().id)
+        response = client.patch(f'/api/books/{book.id}/', {'total_copies': 4}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        # Categories, most borrowed, members and daily: one query each
+        with self.assertNumQueries(4):
+            response = client.get('/api/stats/')
+        self.assertEqual(response.json()['categories'], [
+            {"category": "Fiction", "loans": 1, "active_loans": 1, "copies": 4, "utilization": 0.25}
+        ])
+
+
+class ChangeFeedTests(TestCase):
+    """/api/changes/ replays committed changes in order from any cursor"""
+
+    def setUp(self):
+        self.client = api_client('librarian')
+        self.author = Author.objects.create(name='Octavia E. Butler')
+        self.ada = create_member('Ada')
+
+    def feed(self, **params):
+        response = self.client.get('/api/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_events_in_commit_order(self):
+        book = create_book('Kindred', '9780807083697', author=self.author)
+        loans.borrow_book(book.id, self.ada.id)
+        loans.return_book(book.id, self.ada.id)
+        book.title = 'Kindred (25th anniversary)'
+        book.save()
+        book_id = book.id
+        book.delete()
+
+        events = self.feed()['events']
+        self.assertEqual(
+            [(event['kind'], event['book'], event['member']) for event in events],
+            [
+                (ChangeEvent.BOOK_CREATED, book_id, None),
+                (ChangeEvent.BORROWED, book_id, self.ada.id),
+                (ChangeEvent.RETURNED, book_id, self.ada.id),
+                (ChangeEvent.BOOK_UPDATED, book_id, None),
+                (ChangeEvent.BOOK_DELETED, book_id, None),
+            ]
+        )
+        seqs = [event['seq'] for event in events]
+        self.assertEqual(seqs, sorted(seqs))
+
+    def test_failed_changes_record_nothing(self):
+        book = create_book('Kindred', '9780807083697', author=self.author)
+        loans.borrow_book(book.id, self.ada.id)
+        count = ChangeEvent.objects.count()
+        with self.assertRaises(loans.LoanError):
+            loans.borrow_book(book.id, self.ada.id)
+        self.assertEqual(ChangeEvent.objects.count(), count)
+
+    def test_resuming_from_the_cursor(self):
+        for index in range(5):
+            create_book(f'Parable {index}', f'978000000010{index}', author=self.author)
+
+        page = self.feed(limit=2)
+        self.assertEqual(len(page['events']), 2)
+        self.assertTrue(page['has_more'])
+        seen = [event['seq'] for event in page['events']]
+        while page['has_more']:
+            page = self.feed(since=page['next'], limit=2)
+            seen += [event['seq'] for event in page['events']]
+
+        self.assertEqual(seen, list(ChangeEvent.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(self.feed(since=page['next']), {"events": [], "next": page['next'], "has_more": False})
+        self.assertEqual(self.feed(since='latest')['next'], page['next'])
+
+    def test_import_books_records_created_and_updated_books(self):
+        existing = create_book('Kindred', '9780807083697', author=self.author)
+        since = ChangeEvent.objects.order_by('-id').values_list('id', flat=True).first()
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('title,ISBN,category,author,copies\n')
+            csv_file.write('Kindred,9780807083697,Classics,Octavia E. Butler,2\n')
+            csv_file.write('Dawn,9780446603775,Science Fiction,Octavia E. Butler,1\n')
+        try:
+            call_command('import_books', csv_file.name, stdout=io.StringIO())
+        finally:
+            os.unlink(csv_file.name)
+
+        dawn = Book.objects.get(ISBN='9780446603775')
+        events = self.feed(since=since)['events']
+        self.assertEqual(
+            sorted((event['kind'], event['book']) for event in events),
+            sorted([(ChangeEvent.BOOK_UPDATED, existing.id), (ChangeEvent.BOOK_CREATED, dawn.id)])
+        )
+
+    def test_invalid_parameters_and_permissions(self):
+        for params in ({'since': -1}, {'limit': 0}, {'limit': 'all'}, {'wait': 3600}):
+            self.assertEqual(self.client.get('/api/changes/', params).status_code, 400, params)
+        self.assertEqual(api_client('member').get('/api/changes/').status_code, 403)
+
+
+class AvailabilityStreamTests(TestCase):
+    def test_refused_under_wsgi(self):
+        response = self.client.get('/api/availability/stream/')
+        self.assertEqual(response.status_code, 501)
+        self.assertIn('error', response.json())
+
+    async def test_streams_current_availability_under_asgi(self):
+        book = await sync_to_async(create_book)('Kindred', '9780807083697', copies=1)
+        response = await AsyncClient().get('/api/availability/stream/', {'books': book.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = aiter(response.streaming_content)
+        try:
+            first = await anext(stream)
+        finally:
+            await stream.aclose()
+        self.assertIn(b'"book":%d' % book.id, first.replace(b' ', b''))
@@ -1,18 +1,41 @@
+from django.apps import apps
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BookViewSet, MemberViewSet, borrow_book, return_book
+from .views import (
+    BookViewSet, HoldViewSet, MemberViewSet, borrow_book, return_book,
+    bulk_borrow_books, bulk_return_books, cache_stats, circulation_stats, export_borrow_history,
+    request_metrics,
+)
+from . import async_views
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
-from djoser.views import UserViewSet
 
 router = DefaultRouter()
 router.register('books', BookViewSet)
 router.register('members', MemberViewSet)
-router.register('users', UserViewSet, basename='user')
+router.register('holds', HoldViewSet)
+
+# Left out of the slim app profile (LIBRARY_APP_PROFILE=slim)
+if apps.is_installed('djoser'):
+    from .user_views import LibraryUserViewSet
+
+    router.register('users', LibraryUserViewSet, basename='user')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('borrow/', borrow_book),
     path('return/', return_book),
+    path('borrow/bulk/', bulk_borrow_books),
+    path('return/bulk/', bulk_return_books),
+    path('cache/stats/', cache_stats),
+    path('stats/', circulation_stats),
+    path('exports/borrow-history/', export_borrow_history),
+    path('metrics/requests/', request_metrics),
+    path('async/books/', async_views.book_list),
+    path('async/books/<int:pk>/', async_views.book_detail),
+    path('async/borrow/', async_views.borrow_book),
+    path('async/return/', async_views.return_book),
+    path('changes/', async_views.changes),
+    path('availability/stream/', async_views.availability_stream),
     path('auth/jwt/create/', TokenObtainPairView.as_view(), name='token-obtain-pair'),
     path('auth/jwt/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     path('auth/jwt/verify/', TokenVerifyView.as_view(), name='token-verify'),
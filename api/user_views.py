@@ -0,0 +1,16 @@
+"""
+Djoser user endpoints. Kept apart from api.views so djoser is only
+imported when it is installed (it is left out of the slim app profile).
+"""
+from djoser.views import UserViewSet
+
+from .authentication import CachedJWTAuthentication
+
+
+class LibraryUserViewSet(UserViewSet):
+    """
+    Djoser user endpoints (/api/users/). These work with the User model
+    instance, so they authenticate through the short-TTL user cache instead
+    of the stateless token user used elsewhere.
+    """
+    authentication_classes = [CachedJWTAuthentication]
@@ -1,15 +1,34 @@
-from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, permission_classes
+from datetime import timedelta
+
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 
-from library.models import Book, Member, BorrowRecord
-from .serializers import BookSerializer, MemberSerializer
-from .permissions import IsLibrarianOrReadOnly, CanBorrowReturnBooks
-
-
-class BookViewSet(viewsets.ModelViewSet):
+from library import search
+from library.models import (
+    Book, BookLoanStats, CategoryLoanStats, DailyLoanStats, Hold, Member, MemberLoanStats,
+)
+from . import cache, exports, loans
+from .batch import BatchRetrieveMixin
+from .instrumentation import metrics
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .pagination import PaginationModeMixin
+from .renderers import CSVRenderer, NDJSONRenderer
+from .serializers import (
+    BookSerializer, MemberSerializer, BulkLoanSerializer, DynamicFieldsViewMixin,
+    HoldRequestSerializer, HoldSerializer,
+)
+from .permissions import IsLibrarian, IsLibrarianOrReadOnly, IsMemberOrLibrarian, CanBorrowReturnBooks
+
+
+class BookViewSet(BatchRetrieveMixin, CachedResponseMixin, ConditionalGetMixin, DynamicFieldsViewMixin,
+                  PaginationModeMixin, viewsets.ModelViewSet):
     """
     BookViewSet - Manage Library Books
 
@@ -30,17 +49,126 @@ class BookViewSet(viewsets.ModelViewSet):
     - PUT /api/books/{id}/ - Update a book (Librarians only)
     - PATCH /api/books/{id}/ - Partial update a book (Librarians only)
     - DELETE /api/books/{id}/ - Delete a book (Librarians only)
+    - GET /api/books/search/?q= - Full-text search (title, category, author)
+    - GET /api/books/?ids=1,2,3 - Several books by id, in one query
+    - POST /api/books/batch/ - Same, with the ids in the body (public)
+
+    **Copies:**
+    Each book is one title with `total_copies` (writable, at least 1) and
+    `available_copies` (read-only). `is_available` is true while at least
+    one copy is on the shelf. Changing `total_copies` moves
+    `available_copies` by the same amount; it cannot go below the number of
+    copies on loan. Added copies are lent to members waiting for the book
+    (see /api/holds/) first.
+
+    **Field Selection (GET):**
+    - ?expand=author: embed the author object instead of its id
+    - ?fields=id,title,is_available: return only these fields
+    Both are resolved in the same query (select_related / only). Unknown
+    names are a 400 Bad Request listing the valid ones.
+
+    **Pagination:**
+    - Default: page numbers (?page=N)
+    - ?pagination=cursor: keyset pages with opaque `next`/`previous` cursors
+      and no total count; sort with ?ordering=id (default) or ?ordering=title
 
     **Response Format:**
     - Success: 200 OK (GET), 201 Created (POST), 204 No Content (DELETE)
     - Error: 400 Bad Request, 401 Unauthorized, 403 Forbidden, 404 Not Found
+
+    **Batch Get:**
+    `?ids=` and `batch/` take at most API_BATCH_MAX_IDS ids and return
+    {"results": [<book>, ...], "missing": [<id>, ...]}, results in the
+    requested order. They are not paginated or cached.
+
+    **Caching:**
+    When BOOK_CACHE_ENABLED (by default only with the shared cache,
+    LIBRARY_CACHE_DIR), list and retrieve responses are served from the
+    response cache (`X-Cache: HIT|MISS`) and invalidated when books, authors
+    or book availability change.
+
+    **Conditional Requests:**
+    GET responses carry `ETag` and `Last-Modified` (from `updated_at`; for
+    lists, the newest `updated_at` on the page). Send them back as
+    `If-None-Match` / `If-Modified-Since` to get 304 Not Modified without
+    the body.
     """
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsLibrarianOrReadOnly]
+    batch_permission_classes = [AllowAny]
+    cached_response_headers = ('ETag', 'Last-Modified')
+    cursor_orderings = {
+        'id': ('id',),
+        'title': ('title', 'id'),
+    }
+    search_default_limit = 10
+    search_max_limit = 100
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Search Books - Public
+
+        Full-text search over book title, category and author name, best
+        match first (BM25 ranking, title weighted highest).
+
+        **Query Parameters:**
+        - q: search text; all words must match, `word*` matches a prefix
+        - limit: results per request (default 10, max 100)
+        - offset: number of results to skip (default 0)
+
+        **Response:**
+        ```json
+        {
+            "query": "ancillary jus*",
+            "results": [<book>, ...],
+            "next": "<url of the next results or null>"
+        }
+        ```
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            raise ValidationError({"q": "This query parameter is required."})
+        limit = _int_param(
+            request, 'limit', self.search_default_limit, 1, self.search_max_limit
+        )
+        offset = _int_param(request, 'offset', 0, 0)
+
+        if search.is_supported():
+            # One extra id tells whether there is a next page
+            ids = search.search_book_ids(text, limit + 1, offset)
+            has_more = len(ids) > limit
+            ids = ids[:limit]
+            books_by_id = self.get_queryset().in_bulk(ids)
+            books = [books_by_id[book_id] for book_id in ids if book_id in books_by_id]
+        else:
+            words = text.replace('*', ' ').split()
+            queryset = self.get_queryset().order_by('title', 'id')
+            for word in words:
+                queryset = queryset.filter(
+                    Q(title__icontains=word)
+                    | Q(category__icontains=word)
+                    | Q(author__name__icontains=word)
+                )
+            books = list(queryset[offset:offset + limit + 1])
+            has_more = len(books) > limit
+            books = books[:limit]
+
+        next_url = None
+        if has_more:
+            next_url = request.build_absolute_uri(
+                f"{request.path}?{_replace_query(request, offset=offset + limit)}"
+            )
+        return Response({
+            "query": text,
+            "results": self.get_serializer(books, many=True).data,
+            "next": next_url,
+        })
 
 
-class MemberViewSet(viewsets.ModelViewSet):
+class MemberViewSet(BatchRetrieveMixin, ConditionalGetMixin, DynamicFieldsViewMixin,
+                    PaginationModeMixin, viewsets.ModelViewSet):
     """
     MemberViewSet - Manage Library Members
 
@@ -61,6 +189,21 @@ class MemberViewSet(viewsets.ModelViewSet):
     - PUT /api/members/{id}/ - Update member info (Librarians only)
     - PATCH /api/members/{id}/ - Partial update member (Librarians only)
     - DELETE /api/members/{id}/ - Delete a member (Librarians only)
+    - GET /api/members/?ids=1,2,3 - Several members by id, in one query
+    - POST /api/members/batch/ - Same, with the ids in the body (authenticated)
+
+    **Field Selection (GET):**
+    - ?fields=id,name: return only these fields (unknown names: 400)
+
+    **Pagination:**
+    - Default: page numbers (?page=N)
+    - ?pagination=cursor: keyset pages ordered by id, with opaque
+      `next`/`previous` cursors and no total count
+
+    **Batch Get:**
+    `?ids=` and `batch/` take at most API_BATCH_MAX_IDS ids and return
+    {"results": [<member>, ...], "missing": [<id>, ...]}, results in the
+    requested order. They are not paginated.
 
     **Response Format:**
     - Success: 200 OK (GET), 201 Created (POST), 204 No Content (DELETE)
@@ -72,6 +215,7 @@ class MemberViewSet(viewsets.ModelViewSet):
     queryset = Member.objects.all()
     serializer_class = MemberSerializer
     permission_classes = [IsAuthenticated]
+    batch_permission_classes = [IsAuthenticated]
     
     def get_permissions(self):
         """
@@ -85,6 +229,146 @@ class MemberViewSet(viewsets.ModelViewSet):
         return [IsAuthenticated()]
 
 
+class HoldViewSet(DynamicFieldsViewMixin, PaginationModeMixin, mixins.ListModelMixin,
+                  mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    HoldViewSet - Waiting Line for Borrowed Books
+
+    Instead of retrying `/api/borrow/` until a book comes back, a member
+    places a hold once. When the book is returned, or copies are added, it
+    is lent straight to the first waiting member (first come, first served).
+
+    **Permissions:**
+    - All endpoints: Authenticated users (members and librarians)
+
+    **Available Endpoints:**
+    - GET /api/holds/ - List holds, oldest first
+    - POST /api/holds/ - Place a hold on a borrowed book
+    - GET /api/holds/{id}/ - Retrieve a hold
+    - POST /api/holds/{id}/cancel/ - Cancel a waiting hold
+
+    **Filters (GET /api/holds/):**
+    - ?book=<id>, ?member=<id>
+    - ?status=waiting|fulfilled|cancelled
+
+    **Field Selection (GET):**
+    - ?expand=book,member: embed the book/member objects
+    - ?fields=id,book,status: return only these fields
+    Unknown names are a 400 Bad Request listing the valid ones.
+
+    **Place a Hold (POST /api/holds/):**
+    ```json
+    {
+        "book": <integer: book_id>,
+        "member": <integer: member_id>
+    }
+    ```
+    - Success (201 Created): the hold plus `"position"` in the line (1 = next)
+    - Error (400 Bad Request): "Book is available; borrow it instead",
+      "Member already has this book", "Member already has a hold on this book"
+    - Error (404 Not Found): "Book not found", "Member not found"
+
+    **Response Format:**
+    - Success: 200 OK (GET, cancel), 201 Created (POST)
+    - Error: 400 Bad Request, 401 Unauthorized, 404 Not Found
+
+    **Business Logic:**
+    - A member can have one waiting hold per book
+    - Cancelled holds are kept with status `cancelled`
+    - Fulfilled holds get status `fulfilled` and a BorrowRecord for the member
+    - A waiting hold of a member who already has the book is marked
+      `fulfilled` and skipped
+    - Copies on the shelf go to the waiting line; /api/borrow/ cannot jump it
+    """
+    queryset = Hold.objects.order_by('id')
+    serializer_class = HoldSerializer
+    permission_classes = [IsMemberOrLibrarian]
+    filter_params = ('book', 'member', 'status')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'swagger_fake_view', False):
+            # Schema generation (generate_schema) has no request
+            return queryset
+        for name in self.filter_params:
+            value = self.request.query_params.get(name)
+            if value is None:
+                continue
+            if name == 'status' and value not in dict(Hold.STATUS_CHOICES):
+                raise ValidationError({name: "Choose one of: waiting, fulfilled, cancelled."})
+            if name != 'status' and not value.isdigit():
+                raise ValidationError({name: "A valid integer is required."})
+            queryset = queryset.filter(**{name: value})
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = HoldRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            hold, position = loans.place_hold(
+                serializer.validated_data['book'],
+                serializer.validated_data['member']
+            )
+        except loans.LoanError as e:
+            return Response(
+                {"error": e.message},
+                status=e.status_code
+            )
+        return Response(
+            {**self.get_serializer(hold).data, "position": position},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """
+        Cancel a Hold - Authenticated Users Only
+
+        Takes a waiting hold out of the line. The hold is kept with status
+        `cancelled`.
+
+        **Response:**
+        - Success (200 OK): the cancelled hold
+        - Error (400 Bad Request): "Hold is no longer waiting"
+        - Error (404 Not Found): "Hold not found"
+        """
+        try:
+            loans.cancel_hold(pk)
+        except loans.LoanError as e:
+            return Response(
+                {"error": e.message},
+                status=e.status_code
+            )
+        except ValueError:
+            return Response(
+                {"error": loans.HOLD_NOT_FOUND},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(self.get_serializer(self.get_object()).data, status=status.HTTP_200_OK)
+
+
+def _int_param(request, name, default, minimum, maximum=None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: "A valid integer is required."})
+    if value < minimum:
+        raise ValidationError({name: f"Must be at least {minimum}."})
+    if maximum is not None and value > maximum:
+        raise ValidationError({name: f"Must be at most {maximum}."})
+    return value
+
+
+def _replace_query(request, **params):
+    query = request.query_params.copy()
+    for key, value in params.items():
+        query[key] = value
+    return query.urlencode()
+
+
 @api_view(['POST'])
 @permission_classes([CanBorrowReturnBooks])
 def borrow_book(request):
@@ -118,6 +402,12 @@ def borrow_book(request):
             "error": "Book not available"
         }
         ```
+        or, if the member already has a copy of the book,
+        ```json
+        {
+            "error": "Member already has this book"
+        }
+        ```
     - Error (404 Not Found):
         ```json
         {
@@ -135,39 +425,32 @@ def borrow_book(request):
     Include JWT token in Authorization header: Bearer <token>
 
     **Business Logic:**
-    1. Validates that the book exists
-    2. Validates that the member exists
-    3. Checks if the book is available
-    4. Creates a BorrowRecord
-    5. Marks the book as unavailable
+    1. Takes one copy (available_copies - 1) with a single conditional
+       UPDATE that only matches while a copy is left
+    2. Creates a BorrowRecord in the same transaction
+    3. If no row was updated, reports whether the book is missing or has no copy left
+    4. If the insert is rejected (unknown member, or the member already has
+       an active loan for the book), the transaction is rolled back
+
+    A member can have one active BorrowRecord per book; this is enforced by
+    the `unique_active_borrow_per_member` database constraint.
+
+    When the book is not available, place a hold (POST /api/holds/) instead
+    of retrying: the book is lent to waiting members in order on return.
+    While members wait, a copy on the shelf is lent to them first, so the
+    borrow only succeeds through the member's own place in the line.
     """
     try:
-        book = Book.objects.get(id=request.data['book'])
-        member = Member.objects.get(id=request.data['member'])
-
-        if not book.is_available:
-            return Response(
-                {"error": "Book not available"}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        BorrowRecord.objects.create(book=book, member=member)
-        book.is_available = False
-        book.save()
+        loans.borrow_book(request.data['book'], request.data['member'])
 
         return Response(
             {"message": "Book borrowed successfully"},
             status=status.HTTP_200_OK
         )
-    except Book.DoesNotExist:
-        return Response(
-            {"error": "Book not found"},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    except Member.DoesNotExist:
+    except loans.LoanError as e:
         return Response(
-            {"error": "Member not found"},
-            status=status.HTTP_404_NOT_FOUND
+            {"error": e.message},
+            status=e.status_code
         )
     except Exception as e:
         return Response(
@@ -203,6 +486,8 @@ def return_book(request):
             "message": "Book returned successfully"
         }
         ```
+        If a member was waiting for the book (see /api/holds/), the
+        response also has `"next_borrower": <integer: member_id>`.
     - Error (404 Not Found):
         ```json
         {
@@ -220,39 +505,335 @@ def return_book(request):
     Include JWT token in Authorization header: Bearer <token>
 
     **Business Logic:**
-    1. Finds the active borrow record (return_date is null)
-    2. Sets the return_date to current timestamp
-    3. Marks the book as available again
-    4. Saves the updated records
+    1. Sets the return_date on the active borrow record (return_date is null)
+    2. If members hold the book, lends the copy to the first of them who
+       does not already have it (the hold is marked fulfilled and a new
+       BorrowRecord is created); otherwise puts the copy back
+       (available_copies + 1)
+    3. All of this runs in one transaction
 
     **Note:**
     A borrow record is considered "active" if it has no return_date.
     Only active records can be returned.
     """
     try:
-        record = BorrowRecord.objects.get(
-            book_id=request.data['book'],
-            member_id=request.data['member'],
-            return_date__isnull=True
-        )
+        next_borrower = loans.return_book(request.data['book'], request.data['member'])
 
-        record.return_date = timezone.now()
-        record.save()
+        data = {"message": "Book returned successfully"}
+        if next_borrower is not None:
+            data["next_borrower"] = next_borrower
+        return Response(data, status=status.HTTP_200_OK)
+    except loans.LoanError as e:
+        return Response(
+            {"error": e.message},
+            status=e.status_code
+        )
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-        record.book.is_available = True
-        record.book.save()
 
+def _bulk_loan_response(request, operation):
+    serializer = BulkLoanSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    member_id = serializer.validated_data['member']
+    try:
+        results = operation(member_id, serializer.validated_data['books'])
+    except loans.LoanError as e:
         return Response(
-            {"message": "Book returned successfully"},
-            status=status.HTTP_200_OK
+            {"error": e.message},
+            status=e.status_code
         )
-    except BorrowRecord.DoesNotExist:
-        return Response(
-            {"error": "No active borrow record found"},
-            status=status.HTTP_404_NOT_FOUND
+
+    succeeded = sum(1 for result in results if result['status'] != 'failed')
+    return Response(
+        {
+            "member": member_id,
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results,
+        },
+        status=status.HTTP_200_OK
+    )
+
+
+@api_view(['POST'])
+@permission_classes([CanBorrowReturnBooks])
+def bulk_borrow_books(request):
+    """
+    Borrow Several Books - Authenticated Users Only
+
+    Checkout-desk endpoint: borrows a batch of books for one member in a
+    single request, applying the same rules as `/api/borrow/` to each book.
+
+    **Request Body (JSON):**
+    ```json
+    {
+        "member": <integer: member_id>,
+        "books": [<integer: book_id>, ...]
+    }
+    ```
+
+    **Response:**
+    - Success (200 OK), one result per requested book, in request order:
+        ```json
+        {
+            "member": 1,
+            "succeeded": 1,
+            "failed": 1,
+            "results": [
+                {"book": 3, "status": "borrowed"},
+                {"book": 4, "status": "failed", "error": "Book not available"}
+            ]
+        }
+        ```
+    - Error (400 Bad Request): invalid request body
+    - Error (404 Not Found):
+        ```json
+        {
+            "error": "Member not found"
+        }
+        ```
+
+    **Business Logic:**
+    1. Loads all requested books with one query
+    2. Takes a copy of each available one with one UPDATE
+    3. Creates their BorrowRecords with one bulk INSERT
+    """
+    return _bulk_loan_response(request, loans.bulk_borrow)
+
+
+@api_view(['POST'])
+@permission_classes([CanBorrowReturnBooks])
+def bulk_return_books(request):
+    """
+    Return Several Books - Authenticated Users Only
+
+    Checkout-desk endpoint: returns a batch of books for one member in a
+    single request, applying the same rules as `/api/return/` to each book.
+
+    **Request Body (JSON):**
+    ```json
+    {
+        "member": <integer: member_id>,
+        "books": [<integer: book_id>, ...]
+    }
+    ```
+
+    **Response:**
+    - Success (200 OK), one result per requested book, in request order:
+        ```json
+        {
+            "member": 1,
+            "succeeded": 1,
+            "failed": 1,
+            "results": [
+                {"book": 3, "status": "returned"},
+                {"book": 4, "status": "failed", "error": "No active borrow record found"}
+            ]
+        }
+        ```
+    - Error (400 Bad Request): invalid request body
+
+    **Business Logic:**
+    1. Loads the member's active borrow records for the books with one query
+    2. Sets their return_date with one UPDATE
+    3. Finds the first waiting hold of every book with one window query
+       and lends those books on (result entries get `next_borrower`)
+    4. Puts the other copies back with one UPDATE
+    """
+    return _bulk_loan_response(request, loans.bulk_return)
+
+
+@api_view(['GET'])
+@permission_classes([IsLibrarian])
+def cache_stats(request):
+    """
+    Response Cache Statistics - Librarians Only
+
+    Hit/miss counters of the book response cache for this worker process.
+
+    **Response:**
+    ```json
+    {
+        "list": {"hits": 120, "misses": 8, "hit_ratio": 0.9375},
+        "detail": {"hits": 40, "misses": 10, "hit_ratio": 0.8},
+        "invalidations": {"lists": 6, "books": 6}
+    }
+    ```
+    """
+    return Response(cache.stats.snapshot(), status=status.HTTP_200_OK)
+
+
+STATS_MAX_TOP = 100
+STATS_MAX_DAYS = 366
+
+
+@api_view(['GET'])
+@permission_classes([IsLibrarian])
+def circulation_stats(request):
+    """
+    Circulation Statistics - Librarians Only
+
+    Most borrowed titles, loans and utilization by category, members with
+    the most books out and daily activity. Everything is read from rollup
+    tables that borrow/return and catalogue writes update in their own
+    transactions, so the cost grows with neither the loan history nor the
+    catalogue.
+
+    **Query Parameters:**
+    - top: entries in `most_borrowed` and `members` (default 10, max 100)
+    - days: days of `daily` activity up to today, UTC (default 30, max 366)
+
+    **Response:**
+    ```json
+    {
+        "totals": {"loans": 1520, "active_loans": 87},
+        "most_borrowed": [
+            {"book": 12, "title": "Dune", "loans": 41, "active_loans": 3}
+        ],
+        "categories": [
+            {"category": "science fiction", "loans": 300, "active_loans": 20,
+             "copies": 80, "utilization": 0.25}
+        ],
+        "members": [
+            {"member": 7, "name": "Jane Doe", "active_loans": 5, "loans": 33}
+        ],
+        "daily": [{"day": "2026-10-17", "borrows": 14, "returns": 9}]
+    }
+    ```
+    `utilization` is active loans / copies. Categories without loans are
+    listed too, with 0.
+
+    **Errors:**
+    - 400 Bad Request: `{"top": "Must be at most 100."}`
+    """
+    top = _int_param(request, 'top', 10, 1, STATS_MAX_TOP)
+    days = _int_param(request, 'days', 30, 1, STATS_MAX_DAYS)
+
+    categories = []
+    totals = {"loans": 0, "active_loans": 0}
+    for row in CategoryLoanStats.objects.order_by('-loans', 'category'):
+        categories.append({
+            "category": row.category,
+            "loans": row.loans,
+            "active_loans": row.active_loans,
+            "copies": row.copies,
+            "utilization": round(row.active_loans / row.copies, 4) if row.copies else None,
+        })
+        totals["loans"] += row.loans
+        totals["active_loans"] += row.active_loans
+
+    most_borrowed = [
+        {"book": book_id, "title": title, "loans": loans, "active_loans": active_loans}
+        for book_id, title, loans, active_loans in (
+            BookLoanStats.objects.order_by('-loans', 'book')
+            .values_list('book_id', 'book__title', 'loans', 'active_loans')[:top]
         )
-    except Exception as e:
+    ]
+    members = [
+        {"member": member_id, "name": name, "active_loans": active_loans, "loans": loans}
+        for member_id, name, active_loans, loans in (
+            MemberLoanStats.objects.filter(active_loans__gt=0).order_by('-active_loans', 'member')
+            .values_list('member_id', 'member__name', 'active_loans', 'loans')[:top]
+        )
+    ]
+    first_day = timezone.now().date() - timedelta(days=days - 1)
+    daily = [
+        {"day": day, "borrows": borrows, "returns": returns}
+        for day, borrows, returns in (
+            DailyLoanStats.objects.filter(day__gte=first_day).order_by('day')
+            .values_list('day', 'borrows', 'returns')
+        )
+    ]
+    return Response({
+        "totals": totals,
+        "most_borrowed": most_borrowed,
+        "categories": categories,
+        "members": members,
+        "daily": daily,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsLibrarian])
+@renderer_classes([NDJSONRenderer, CSVRenderer])
+def export_borrow_history(request):
+    """
+    Export Borrow History - Librarians Only
+
+    Streams every BorrowRecord with its book and member details, oldest
+    first. Rows are read from the database in chunks and sent as they are
+    produced, so the first bytes go out immediately and memory stays bounded
+    regardless of the size of the history.
+
+    **Query Parameters:**
+    - format: `ndjson` (default) or `csv`; the Accept header
+      (application/x-ndjson, text/csv) works too
+    - since: only records borrowed at or after this date/datetime (ISO 8601)
+    - until: only records borrowed before this datetime, or up to and
+      including this date
+
+    **Columns:**
+    id, borrow_date, return_date, book_id, book_title, book_isbn,
+    book_category, member_id, member_name, member_email
+
+    **Response:**
+    - Success (200 OK): streamed NDJSON or CSV attachment
+    - Error (400 Bad Request):
+        ```json
+        {
+            "error": "since: expected YYYY-MM-DD or an ISO 8601 datetime"
+        }
+        ```
+    """
+    try:
+        since = exports.parse_bound(request.query_params.get('since'), 'since')
+        until = exports.parse_bound(request.query_params.get('until'), 'until', end=True)
+    except ValueError as e:
         return Response(
             {"error": str(e)},
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    renderer = request.accepted_renderer
+    lines = exports.FORMATTERS[renderer.format](exports.borrow_history_rows(since, until))
+    response = StreamingHttpResponse(
+        lines,
+        content_type=f'{renderer.media_type}; charset={renderer.charset}'
+    )
+    response['Content-Disposition'] = f'attachment; filename="borrow-history.{renderer.format}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsLibrarian])
+def request_metrics(request):
+    """
+    Request Metrics - Librarians Only
+
+    Rolling per-view aggregates collected by the instrumentation middleware
+    (enable with LIBRARY_INSTRUMENTATION=1) over the last requests of each
+    view, for this worker process.
+
+    **Response:**
+    ```json
+    {
+        "window": 500,
+        "views": {
+            "GET book-list": {
+                "requests": 120,
+                "mean_ms": 14.2,
+                "p95_ms": 31.0,
+                "mean_queries": 2.0,
+                "max_queries": 2,
+                "mean_sql_ms": 1.3,
+                "n_plus_one_requests": 0
+            }
+        }
+    }
+    ```
+    """
+    return Response(metrics.snapshot(), status=status.HTTP_200_OK)
@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import Author, Book, Member, BorrowRecord
+from .models import Author, Book, Member, BorrowRecord, Hold
 
 admin.site.register(Author)
 admin.site.register(Book)
 admin.site.register(Member)
 admin.site.register(BorrowRecord)
+admin.site.register(Hold)
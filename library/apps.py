@@ -1,6 +1,58 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_delete, pre_migrate, pre_save,
+)
+
+
+def _search_connection(using):
+    from django.db import connections
+    from . import search
+
+    connection = connections[using]
+    if search.is_supported(connection) and search.index_exists(connection):
+        return connection
+    return None
+
+
+def drop_search_triggers(sender, using, **kwargs):
+    """
+    SQLite cannot rename a table that another table's trigger refers to, so
+    the FTS sync triggers must be out of the way while migrations rebuild
+    library_book or library_author.
+    """
+    from . import search
+
+    connection = _search_connection(using)
+    if connection is not None:
+        search.drop_triggers(connection)
+
+
+def install_search_triggers(sender, using, **kwargs):
+    from . import search
+
+    connection = _search_connection(using)
+    if connection is not None:
+        search.install_triggers(connection)
 
 
 class LibraryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'library'
+
+    def ready(self):
+        from . import stats
+        from .db import apply_sqlite_pragmas
+        from .models import Book, Member
+
+        connection_created.connect(apply_sqlite_pragmas)
+        pre_migrate.connect(drop_search_triggers, sender=self)
+        post_migrate.connect(install_search_triggers, sender=self)
+
+        # Keep the circulation rollups right when books are added, change
+        # category or copies, or books/members are deleted with their loans
+        pre_save.connect(stats.remember_stored_book, sender=Book)
+        post_save.connect(stats.update_saved_book, sender=Book)
+        pre_delete.connect(stats.forget_deleted_book, sender=Book)
+        post_delete.connect(stats.count_deleted_book, sender=Book)
+        pre_delete.connect(stats.forget_deleted_member, sender=Member)
@@ -0,0 +1,17 @@
+"""
+Database connection setup for the library project.
+"""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    `connection_created` receiver applying the SQLITE_PRAGMAS setting to
+    every new SQLite connection (journal mode, page cache, busy timeout...).
+    """
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='borrowrecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('return_date__isnull', True)), fields=('book',), name='unique_active_borrow_per_book'),
+        ),
+    ]
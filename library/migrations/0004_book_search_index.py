@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from library import search
+
+
+# The sync triggers are installed by the post_migrate handler in
+# library.apps, once all migrations of the run have been applied.
+def create_search_index(apps, schema_editor):
+    if not search.is_supported(schema_editor.connection):
+        return
+    search.create_index(schema_editor.connection)
+    search.rebuild_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    if not search.is_supported(schema_editor.connection):
+        return
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_book_title_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
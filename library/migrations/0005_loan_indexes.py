@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category', 'is_available'], name='book_category_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(condition=models.Q(('return_date__isnull', True)), fields=['member', '-borrow_date'], name='borrow_member_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['member', '-borrow_date'], name='borrow_member_history_idx'),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:47
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from library import search
+
+
+def collapse_duplicate_titles(apps, schema_editor):
+    """
+    Merge books stored once per copy (same title, author and category) into
+    one row with total_copies = number of rows, moving their loans and holds
+    to the lowest id. A group is left alone if merging would give a member
+    two active loans, two waiting holds, or a loan and a hold on the title.
+    """
+    db = schema_editor.connection.alias
+    Book = apps.get_model('library', 'Book')
+    BorrowRecord = apps.get_model('library', 'BorrowRecord')
+    Hold = apps.get_model('library', 'Hold')
+
+    groups = (
+        Book.objects.using(db)
+        .values('title', 'author_id', 'category')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        ids = list(
+            Book.objects.using(db)
+            .filter(title=group['title'], author_id=group['author_id'], category=group['category'])
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        keep, duplicates = ids[0], ids[1:]
+        borrowers = list(
+            BorrowRecord.objects.using(db)
+            .filter(book_id__in=ids, return_date__isnull=True)
+            .values_list('member_id', flat=True)
+        )
+        waiting = list(
+            Hold.objects.using(db)
+            .filter(book_id__in=ids, status='waiting')
+            .values_list('member_id', flat=True)
+        )
+        members = borrowers + waiting
+        if len(set(members)) != len(members):
+            continue
+
+        BorrowRecord.objects.using(db).filter(book_id__in=duplicates).update(book_id=keep)
+        Hold.objects.using(db).filter(book_id__in=duplicates).update(book_id=keep)
+        Book.objects.using(db).filter(id__in=duplicates).delete()
+        Book.objects.using(db).filter(id=keep).update(total_copies=len(ids))
+
+    active_loans = (
+        BorrowRecord.objects.using(db)
+        .filter(book=OuterRef('pk'), return_date__isnull=True)
+        .order_by()
+        .values('book')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    Book.objects.using(db).update(
+        available_copies=F('total_copies') - Coalesce(Subquery(active_loans), 0)
+    )
+    Book.objects.using(db).filter(available_copies__gt=0).update(is_available=True)
+    Book.objects.using(db).filter(available_copies=0).update(is_available=False)
+
+    # The search sync triggers are not installed during migrate
+    if search.is_supported(schema_editor.connection) and search.index_exists(schema_editor.connection):
+        search.rebuild_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_hold'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='borrowrecord',
+            name='unique_active_borrow_per_book',
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='available_copies',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='total_copies',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddConstraint(
+            model_name='borrowrecord',
+            constraint=models.UniqueConstraint(condition=models.Q(('return_date__isnull', True)), fields=('book', 'member'), name='unique_active_borrow_per_member'),
+        ),
+        migrations.RunPython(collapse_duplicate_titles, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('available_copies__gte', 0)), name='book_available_copies_gte_0'),
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(('available_copies__lte', models.F('total_copies'))), name='book_available_copies_lte_total'),
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('available_copies__gt', 0), ('is_available', True)), models.Q(('available_copies', 0), ('is_available', False)), _connector='OR'), name='book_is_available_matches_copies'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_book_copies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryLoanStats',
+            fields=[
+                ('category', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('loans', models.IntegerField(default=0)),
+                ('active_loans', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyLoanStats',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('borrows', models.IntegerField(default=0)),
+                ('returns', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookLoanStats',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='loan_stats', serialize=False, to='library.book')),
+                ('loans', models.IntegerField(default=0)),
+                ('active_loans', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-loans', 'book'], name='book_stats_loans_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MemberLoanStats',
+            fields=[
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='loan_stats', serialize=False, to='library.member')),
+                ('loans', models.IntegerField(default=0)),
+                ('active_loans', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-active_loans', 'member'], name='member_stats_active_idx')],
+            },
+        ),
+    ]
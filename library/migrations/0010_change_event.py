@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_loan_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('book_created', 'Book created'), ('book_updated', 'Book updated'), ('book_deleted', 'Book deleted'), ('borrowed', 'Borrowed'), ('returned', 'Returned')], max_length=20)),
+                ('book_id', models.BigIntegerField()),
+                ('member_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
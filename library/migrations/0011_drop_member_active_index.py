@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_change_event'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='borrowrecord',
+            name='borrow_member_active_idx',
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:36
+
+from django.db import migrations, models
+
+from library import stats
+
+
+def build_stats(apps, schema_editor):
+    stats.rebuild(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_drop_member_active_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoryloanstats',
+            name='copies',
+            field=models.IntegerField(db_default=0, default=0),
+        ),
+        # Fill the rollups here rather than in 0009: rebuild() writes copies too
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
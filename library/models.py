@@ -12,8 +12,35 @@ class Book(models.Model):
     title = models.CharField(max_length=200)
     ISBN = models.CharField(max_length=20, unique=True)
     category = models.CharField(max_length=100)
+    # Denormalized `available_copies > 0`, kept for filtering and clients
     is_available = models.BooleanField(default=True)
+    total_copies = models.PositiveIntegerField(default=1)
+    available_copies = models.PositiveIntegerField(default=1)
     author = models.ForeignKey(Author, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(available_copies__gte=0),
+                name='book_available_copies_gte_0',
+            ),
+            models.CheckConstraint(
+                condition=models.Q(available_copies__lte=models.F('total_copies')),
+                name='book_available_copies_lte_total',
+            ),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(is_available=True, available_copies__gt=0)
+                    | models.Q(is_available=False, available_copies=0)
+                ),
+                name='book_is_available_matches_copies',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+            models.Index(fields=['category', 'is_available'], name='book_category_avail_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -23,6 +50,7 @@ class Member(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     membership_date = models.DateField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -33,3 +61,143 @@ class BorrowRecord(models.Model):
     member = models.ForeignKey(Member, on_delete=models.CASCADE)
     borrow_date = models.DateTimeField(auto_now_add=True)
     return_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # One copy of a title per member at a time. Its partial index
+            # also serves the active-loan lookup in return_book.
+            models.UniqueConstraint(
+                fields=['book', 'member'],
+                condition=models.Q(return_date__isnull=True),
+                name='unique_active_borrow_per_member',
+            ),
+        ]
+        indexes = [
+            # Loans of a member, newest first: the full history, and the
+            # active loans (few per member) by filtering the same range
+            models.Index(fields=['member', '-borrow_date'], name='borrow_member_history_idx'),
+        ]
+
+
+class Hold(models.Model):
+    """
+    A member's place in the waiting line for a borrowed book. Holds are
+    served first come, first served (by id) when the book is returned.
+    """
+    WAITING = 'waiting'
+    FULFILLED = 'fulfilled'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (WAITING, 'Waiting'),
+        (FULFILLED, 'Fulfilled'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    member = models.ForeignKey(Member, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=WAITING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['book', 'member'],
+                condition=models.Q(status='waiting'),
+                name='unique_waiting_hold_per_member',
+            ),
+        ]
+        indexes = [
+            # Waiting line of a book: the head is the first entry
+            models.Index(
+                fields=['book', 'id'],
+                condition=models.Q(status='waiting'),
+                name='hold_book_queue_idx',
+            ),
+            models.Index(fields=['member', '-created_at'], name='hold_member_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.member} waiting for {self.book} ({self.status})"
+
+
+# Circulation rollups. Kept up to date by the loan service inside the
+# borrow/return transactions (see library.stats), so statistics never scan
+# the BorrowRecord history. `python manage.py rebuild_stats` recomputes them.
+
+class BookLoanStats(models.Model):
+    book = models.OneToOneField(
+        Book, on_delete=models.CASCADE, primary_key=True, related_name='loan_stats'
+    )
+    loans = models.IntegerField(default=0)
+    active_loans = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Most borrowed titles
+            models.Index(fields=['-loans', 'book'], name='book_stats_loans_idx'),
+        ]
+
+
+class MemberLoanStats(models.Model):
+    member = models.OneToOneField(
+        Member, on_delete=models.CASCADE, primary_key=True, related_name='loan_stats'
+    )
+    loans = models.IntegerField(default=0)
+    active_loans = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Members with the most books out
+            models.Index(fields=['-active_loans', 'member'], name='member_stats_active_idx'),
+        ]
+
+
+class CategoryLoanStats(models.Model):
+    """
+    Loans and copies per category. Loans count under the book's current
+    category (a re-categorized book takes its loans along) and `copies` is
+    the sum of total_copies of the category's books.
+    """
+    category = models.CharField(max_length=100, primary_key=True)
+    loans = models.IntegerField(default=0)
+    active_loans = models.IntegerField(default=0)
+    # db_default: the loan rollup statements insert rows without it
+    copies = models.IntegerField(default=0, db_default=0)
+
+
+class DailyLoanStats(models.Model):
+    """Borrows and returns per day (UTC)."""
+    day = models.DateField(primary_key=True)
+    borrows = models.IntegerField(default=0)
+    returns = models.IntegerField(default=0)
+
+
+class ChangeEvent(models.Model):
+    """
+    Ordered outbox of catalogue and circulation changes, served at
+    /api/changes/. Each event is written in the transaction of the change
+    it describes; its id is the sequence number consumers poll from.
+
+    Ids are not foreign keys, so events outlive deleted books and members.
+    """
+    BOOK_CREATED = 'book_created'
+    BOOK_UPDATED = 'book_updated'
+    BOOK_DELETED = 'book_deleted'
+    BORROWED = 'borrowed'
+    RETURNED = 'returned'
+    KIND_CHOICES = [
+        (BOOK_CREATED, 'Book created'),
+        (BOOK_UPDATED, 'Book updated'),
+        (BOOK_DELETED, 'Book deleted'),
+        (BORROWED, 'Borrowed'),
+        (RETURNED, 'Returned'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    book_id = models.BigIntegerField()
+    member_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} book {self.book_id}"
@@ -0,0 +1,175 @@
+"""
+Full-text catalogue search backed by an SQLite FTS5 index.
+
+The `library_book_fts` virtual table holds one row per book (rowid = book id)
+with the book title, category and author name. Triggers on library_book and
+library_author keep it in sync on every write path, including bulk inserts
+and queryset updates that bypass model signals.
+
+The triggers are dropped before and re-installed after every `migrate`
+(see LibraryConfig): SQLite refuses to rename a table while another table's
+trigger refers to it, which breaks the table rebuilds Django uses for many
+schema changes. Data migrations that write books must therefore call
+rebuild_index() themselves.
+"""
+import re
+
+from django.db import connection
+
+
+FTS_TABLE = 'library_book_fts'
+
+# Column weights for bm25(): title, category, author
+RANK_FUNCTION = 'bm25(10.0, 2.0, 5.0)'
+
+CREATE_TABLE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, category, author,
+    prefix='2 3',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_book_insert
+    AFTER INSERT ON library_book BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, category, author)
+        VALUES (
+            new.id, new.title, new.category,
+            (SELECT name FROM library_author WHERE id = new.author_id)
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_book_delete
+    AFTER DELETE ON library_book BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    # Only indexed columns: availability flips on borrow/return must not
+    # rewrite the index row.
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_book_update
+    AFTER UPDATE OF title, category, author_id ON library_book BEGIN
+        UPDATE {FTS_TABLE}
+        SET title = new.title,
+            category = new.category,
+            author = (SELECT name FROM library_author WHERE id = new.author_id)
+        WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_author_update
+    AFTER UPDATE OF name ON library_author BEGIN
+        UPDATE {FTS_TABLE}
+        SET author = new.name
+        WHERE rowid IN (SELECT id FROM library_book WHERE author_id = new.id);
+    END
+    """,
+]
+
+TRIGGER_NAMES = [
+    f'{FTS_TABLE}_book_insert',
+    f'{FTS_TABLE}_book_delete',
+    f'{FTS_TABLE}_book_update',
+    f'{FTS_TABLE}_author_update',
+]
+
+_TOKEN_RE = re.compile(r'\w+\*?')
+
+
+def is_supported(conn=connection):
+    """FTS5 search is only available on the sqlite3 backend."""
+    return conn.vendor == 'sqlite'
+
+
+def create_index(conn):
+    """Create the FTS table and its ranking config."""
+    with conn.cursor() as cursor:
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', %s)",
+            [RANK_FUNCTION]
+        )
+
+
+def install_triggers(conn):
+    """(Re)create the sync triggers. Idempotent."""
+    with conn.cursor() as cursor:
+        for sql in TRIGGERS_SQL:
+            cursor.execute(sql)
+
+
+def drop_triggers(conn):
+    with conn.cursor() as cursor:
+        for name in TRIGGER_NAMES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def drop_index(conn):
+    drop_triggers(conn)
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def index_exists(conn=connection):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def rebuild_index(conn=connection):
+    """
+    Repopulate the index from library_book/library_author and merge its
+    b-trees. Returns the number of indexed books.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f"""
+            INSERT INTO {FTS_TABLE}(rowid, title, category, author)
+            SELECT b.id, b.title, b.category, a.name
+            FROM library_book b
+            JOIN library_author a ON a.id = b.author_id
+        """)
+        count = cursor.rowcount
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def build_match_query(text):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Every word is quoted (so FTS5 operators in user input are treated as
+    text) and all words must match. A trailing `*` keeps prefix matching:
+    `anc* just` -> `"anc"* "just"`.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text):
+        word = token.rstrip('*')
+        terms.append(f'"{word}"*' if token.endswith('*') else f'"{word}"')
+    return ' '.join(terms)
+
+
+def search_book_ids(text, limit, offset=0, conn=connection):
+    """
+    Return the ids of books matching `text`, best match first.
+    """
+    match = build_match_query(text)
+    if not match:
+        return []
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT rowid FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH %s
+            ORDER BY rank
+            LIMIT %s OFFSET %s
+            """,
+            [match, limit, offset]
+        )
+        return [row[0] for row in cursor.fetchall()]
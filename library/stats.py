@@ -0,0 +1,312 @@
+"""
+Incrementally maintained circulation statistics.
+
+The rollup tables (BookLoanStats, MemberLoanStats, CategoryLoanStats,
+DailyLoanStats) hold running loan counts per book, member, category and UTC
+day. The loan service calls record() inside its borrow/return transactions,
+so the rollups commit or roll back together with the BorrowRecords, and
+reading statistics never touches the loan history.
+
+Each rollup is updated with one `INSERT ... ON CONFLICT DO UPDATE` (SQLite
+3.24+, PostgreSQL) that adds the deltas of the whole batch. rebuild()
+recomputes everything from library_borrowrecord; run it through
+`python manage.py rebuild_stats` after writing loans outside the loan
+service (imports, the admin, raw SQL).
+
+Category totals follow a book's current category, and deleting a book or a
+member deletes its loans. CategoryLoanStats also counts the copies of each
+category, for utilization; count_copies() recounts them from the books of
+the categories a catalogue write touched. The handlers at the bottom
+(connected in LibraryConfig.ready) keep the rollups equal to rebuild() on
+these paths; writes that bypass signals (queryset updates of total_copies,
+import_books) call move_categories() and count_copies() themselves.
+"""
+from collections import defaultdict
+
+from django.db import connection, connections
+from django.utils import timezone
+
+
+BOOK_TABLE = 'library_bookloanstats'
+MEMBER_TABLE = 'library_memberloanstats'
+CATEGORY_TABLE = 'library_categoryloanstats'
+DAILY_TABLE = 'library_dailyloanstats'
+
+
+def _values(rows):
+    """VALUES list placeholders and flat params for rows of equal length."""
+    row = '(' + ', '.join(['%s'] * len(rows[0])) + ')'
+    return ', '.join([row] * len(rows)), [value for values in rows for value in values]
+
+
+def _on_conflict(table, key, columns):
+    updates = ', '.join(f'{column} = {table}.{column} + excluded.{column}' for column in columns)
+    return f'ON CONFLICT ({key}) DO UPDATE SET {updates}'
+
+
+def _upsert(cursor, table, key, columns, rows):
+    """Add each row's values to the row with the same key, creating it if needed."""
+    values, params = _values(rows)
+    cursor.execute(
+        f'INSERT INTO {table} ({key}, {", ".join(columns)}) VALUES {values} '
+        + _on_conflict(table, key, columns),
+        params
+    )
+
+
+def _drop_empty(cursor, table, key, keys, columns=('loans',)):
+    """Delete the rows of `keys` whose `columns` all dropped to 0, as rebuild() has none."""
+    keys = list(keys)
+    placeholders = ', '.join(['%s'] * len(keys))
+    empty = ' AND '.join(f'{column} = 0' for column in columns)
+    cursor.execute(f'DELETE FROM {table} WHERE {key} IN ({placeholders}) AND {empty}', keys)
+
+
+def record(loans=(), returns=(), conn=connection):
+    """
+    Add a batch of loan events to the rollups; call it in the transaction
+    that writes them. `loans` are the (book_id, member_id) pairs of loans
+    opened and `returns` those of loans closed. Runs at most four
+    statements, whatever the batch size.
+    """
+    if not loans and not returns:
+        return
+    books = defaultdict(lambda: [0, 0])
+    members = defaultdict(lambda: [0, 0])
+    for book_id, member_id in loans:
+        for totals in (books[book_id], members[member_id]):
+            totals[0] += 1
+            totals[1] += 1
+    for book_id, member_id in returns:
+        books[book_id][1] -= 1
+        members[member_id][1] -= 1
+
+    book_rows = [(book_id, *totals) for book_id, totals in books.items()]
+    member_rows = [(member_id, *totals) for member_id, totals in members.items()]
+    columns = ('loans', 'active_loans')
+    with conn.cursor() as cursor:
+        _upsert(cursor, BOOK_TABLE, 'book_id', columns, book_rows)
+        _upsert(cursor, MEMBER_TABLE, 'member_id', columns, member_rows)
+
+        # Grouped by the books' current category; WHERE true keeps SQLite
+        # from parsing ON CONFLICT as part of the SELECT's join
+        values, params = _values(book_rows)
+        cursor.execute(
+            f"""
+            WITH delta(book_id, loans, active_loans) AS (VALUES {values})
+            INSERT INTO {CATEGORY_TABLE} (category, loans, active_loans)
+            SELECT b.category, SUM(delta.loans), SUM(delta.active_loans)
+            FROM delta JOIN library_book b ON b.id = delta.book_id
+            WHERE true
+            GROUP BY b.category
+            """ + _on_conflict(CATEGORY_TABLE, 'category', columns),
+            params
+        )
+
+        _upsert(
+            cursor, DAILY_TABLE, 'day', ('borrows', 'returns'),
+            [(timezone.now().date(), len(loans), len(returns))]
+        )
+
+
+def rebuild(conn=connection):
+    """
+    Recompute every rollup from library_borrowrecord. Scans the whole loan
+    history; returns the number of loans counted.
+    """
+    borrow_day, borrow_params = conn.ops.datetime_cast_date_sql('borrow_date', (), 'UTC')
+    return_day, return_params = conn.ops.datetime_cast_date_sql('return_date', (), 'UTC')
+    with conn.cursor() as cursor:
+        for table in (BOOK_TABLE, MEMBER_TABLE, CATEGORY_TABLE, DAILY_TABLE):
+            cursor.execute(f'DELETE FROM {table}')
+        for table, key in ((BOOK_TABLE, 'book_id'), (MEMBER_TABLE, 'member_id')):
+            cursor.execute(f"""
+                INSERT INTO {table} ({key}, loans, active_loans)
+                SELECT {key}, COUNT(*), COUNT(*) - COUNT(return_date)
+                FROM library_borrowrecord
+                GROUP BY {key}
+            """)
+        cursor.execute(f"""
+            INSERT INTO {CATEGORY_TABLE} (category, loans, active_loans, copies)
+            SELECT b.category, COALESCE(SUM(s.loans), 0), COALESCE(SUM(s.active_loans), 0),
+                   SUM(b.total_copies)
+            FROM library_book b LEFT JOIN {BOOK_TABLE} s ON s.book_id = b.id
+            GROUP BY b.category
+        """)
+        cursor.execute(f"""
+            INSERT INTO {DAILY_TABLE} (day, borrows, returns)
+            SELECT day, SUM(borrows), SUM(returns) FROM (
+                SELECT {borrow_day} AS day, 1 AS borrows, 0 AS returns
+                FROM library_borrowrecord
+                UNION ALL
+                SELECT {return_day}, 0, 1
+                FROM library_borrowrecord
+                WHERE return_date IS NOT NULL
+            ) events
+            GROUP BY day
+        """, [*borrow_params, *return_params])
+        cursor.execute(f'SELECT COALESCE(SUM(loans), 0) FROM {BOOK_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def move_categories(moves, conn=connection):
+    """
+    Move the loan counts of books that changed category from their old
+    category to the new one. `moves` are (book_id, old_category,
+    new_category) triples; call it in the transaction that changes them.
+    """
+    moves = [move for move in moves if move[1] != move[2]]
+    if not moves:
+        return
+    # The copies move along too
+    count_copies({category for _, old, new in moves for category in (old, new)}, conn)
+    book_ids = [book_id for book_id, _, _ in moves]
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f'SELECT book_id, loans, active_loans FROM {BOOK_TABLE} '
+            f'WHERE book_id IN ({", ".join(["%s"] * len(book_ids))})',
+            book_ids
+        )
+        counts = {book_id: (loans, active_loans) for book_id, loans, active_loans in cursor.fetchall()}
+        categories = defaultdict(lambda: [0, 0])
+        for book_id, old, new in moves:
+            if book_id not in counts:
+                continue
+            loans, active_loans = counts[book_id]
+            categories[old][0] -= loans
+            categories[old][1] -= active_loans
+            categories[new][0] += loans
+            categories[new][1] += active_loans
+        if categories:
+            rows = [(category, *totals) for category, totals in categories.items()]
+            _upsert(cursor, CATEGORY_TABLE, 'category', ('loans', 'active_loans'), rows)
+            _drop_empty(cursor, CATEGORY_TABLE, 'category', categories, ('loans', 'copies'))
+
+
+def count_copies(categories, conn=connection):
+    """
+    Set the copies of each of `categories` to the total_copies of its books,
+    dropping categories left without books or loans. Call it in the
+    transaction that adds, deletes or re-categorizes books or changes their
+    total_copies; it only reads the books of these categories.
+    """
+    categories = list(dict.fromkeys(categories))
+    if not categories:
+        return
+    values, params = _values([(category,) for category in categories])
+    with conn.cursor() as cursor:
+        # WHERE true: see record()
+        cursor.execute(
+            f"""
+            WITH changed(category) AS (VALUES {values})
+            INSERT INTO {CATEGORY_TABLE} (category, loans, active_loans, copies)
+            SELECT changed.category, 0, 0, COALESCE(SUM(b.total_copies), 0)
+            FROM changed LEFT JOIN library_book b ON b.category = changed.category
+            WHERE true
+            GROUP BY changed.category
+            ON CONFLICT (category) DO UPDATE SET copies = excluded.copies
+            """,
+            params
+        )
+        _drop_empty(cursor, CATEGORY_TABLE, 'category', categories, ('loans', 'copies'))
+
+
+def forget(book_id=None, member_id=None, conn=connection):
+    """
+    Take every loan of a book, or of a member, out of the rollups. Call it
+    in the transaction that deletes the book or member, before the delete
+    (its BorrowRecords cascade). The book's or member's own rollup row is
+    left for the cascade too.
+    """
+    column, value = ('book_id', book_id) if member_id is None else ('member_id', member_id)
+    borrow_day, borrow_params = conn.ops.datetime_cast_date_sql('r.borrow_date', (), 'UTC')
+    return_day, return_params = conn.ops.datetime_cast_date_sql('r.return_date', (), 'UTC')
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT r.book_id, r.member_id, b.category, {borrow_day}, {return_day}
+            FROM library_borrowrecord r JOIN library_book b ON b.id = r.book_id
+            WHERE r.{column} = %s
+        """, [*borrow_params, *return_params, value])
+        rows = cursor.fetchall()
+        if not rows:
+            return
+
+        books = defaultdict(lambda: [0, 0])
+        members = defaultdict(lambda: [0, 0])
+        categories = defaultdict(lambda: [0, 0])
+        days = defaultdict(lambda: [0, 0])
+        for loan_book_id, loan_member_id, category, borrowed_on, returned_on in rows:
+            for totals in (books[loan_book_id], members[loan_member_id], categories[category]):
+                totals[0] -= 1
+                totals[1] -= returned_on is None
+            days[borrowed_on][0] -= 1
+            if returned_on is not None:
+                days[returned_on][1] -= 1
+
+        columns = ('loans', 'active_loans')
+        for table, key, deltas, counted in (
+            (BOOK_TABLE, 'book_id', books, ('loans',)),
+            (MEMBER_TABLE, 'member_id', members, ('loans',)),
+            (CATEGORY_TABLE, 'category', categories, ('loans', 'copies')),
+        ):
+            rows = [(row_key, *totals) for row_key, totals in deltas.items()]
+            _upsert(cursor, table, key, columns, rows)
+            _drop_empty(cursor, table, key, deltas, counted)
+        _upsert(
+            cursor, DAILY_TABLE, 'day', ('borrows', 'returns'),
+            [(day, *totals) for day, totals in days.items()]
+        )
+        placeholders = ', '.join(['%s'] * len(days))
+        cursor.execute(
+            f'DELETE FROM {DAILY_TABLE} WHERE day IN ({placeholders}) AND borrows = 0 AND returns = 0',
+            list(days)
+        )
+
+
+# Signal handlers for changes made outside the loan service
+
+def remember_stored_book(sender, instance, raw=False, update_fields=None, using=None, **kwargs):
+    """pre_save of Book: note the stored category and copies, for update_saved_book."""
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {'category', 'total_copies'} & set(update_fields):
+        return
+    instance._stats_stored = (
+        sender._base_manager.using(using).filter(pk=instance.pk)
+        .values_list('category', 'total_copies').first()
+    )
+
+
+def update_saved_book(sender, instance, created=False, raw=False, update_fields=None, using=None,
+                      **kwargs):
+    """post_save of Book"""
+    stored = instance.__dict__.pop('_stats_stored', None)
+    if raw:
+        return
+    conn = connections[using]
+    if stored is None:
+        if created:
+            count_copies([instance.category], conn)
+        return
+    old_category, old_copies = stored
+    saved = update_fields is None or 'category' in update_fields
+    category = instance.category if saved else old_category
+    if category != old_category:
+        move_categories([(instance.pk, old_category, category)], conn)
+    elif instance.total_copies != old_copies:
+        count_copies([category], conn)
+
+
+def forget_deleted_book(sender, instance, using=None, **kwargs):
+    """pre_delete of Book"""
+    forget(book_id=instance.pk, conn=connections[using])
+
+
+def count_deleted_book(sender, instance, using=None, **kwargs):
+    """post_delete of Book"""
+    count_copies([instance.category], connections[using])
+
+
+def forget_deleted_member(sender, instance, using=None, **kwargs):
+    """pre_delete of Member"""
+    forget(member_id=instance.pk, conn=connections[using])
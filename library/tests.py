@@ -1,3 +1,163 @@
+import io
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.test import TestCase
+from django.utils import timezone
+
+from . import stats
+from .models import (
+    Author, Book, BookLoanStats, BorrowRecord, CategoryLoanStats, DailyLoanStats, Member, MemberLoanStats,
+)
+
+
+class BookCopyConstraintTests(TestCase):
+    """The database rejects copy counts that disagree with each other"""
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Dune', ISBN='9780441013593', category='Fiction',
+            author=Author.objects.create(name='Frank Herbert'),
+            total_copies=2, available_copies=2
+        )
+
+    def assertRejected(self, **values):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.filter(id=self.book.id).update(**values)
+
+    def test_available_copies_cannot_exceed_total(self):
+        self.assertRejected(available_copies=3)
+        self.assertRejected(total_copies=1)
+
+    def test_copy_counts_cannot_go_negative(self):
+        self.assertRejected(available_copies=F('available_copies') - 3)
+        self.assertRejected(total_copies=-1, available_copies=0, is_available=False)
+
+    def test_is_available_matches_available_copies(self):
+        self.assertRejected(is_available=False)
+        self.assertRejected(available_copies=0)
+        self.assertRejected(available_copies=0, is_available=True)
+
+        Book.objects.filter(id=self.book.id).update(available_copies=0, is_available=False)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.available_copies, self.book.is_available), (0, False))
+
+    def test_new_books_must_be_consistent(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.create(
+                title='Emma', ISBN='9780141439587', category='Fiction', author=self.book.author,
+                total_copies=1, available_copies=2
+            )
+
+
+def rollups():
+    return {
+        'books': set(BookLoanStats.objects.values_list('book_id', 'loans', 'active_loans')),
+        'members': set(MemberLoanStats.objects.values_list('member_id', 'loans', 'active_loans')),
+        'categories': set(CategoryLoanStats.objects.values_list('category', 'loans', 'active_loans', 'copies')),
+        'days': set(DailyLoanStats.objects.values_list('day', 'borrows', 'returns')),
+    }
+
+
+class LoanStatsTests(TestCase):
+    """The incrementally kept rollups always equal a rebuild from the loan history"""
+
+    def setUp(self):
+        self.author = Author.objects.create(name='Iain M. Banks')
+        self.other_author = Author.objects.create(name='Ann Leckie')
+        self.phlebas = self.create_book('Consider Phlebas', '9780316005388', 'Science Fiction', self.author)
+        self.crow = self.create_book('The Crow Road', '9780349107998', 'Fiction', self.author)
+        self.justice = self.create_book('Ancillary Justice', '9780316246620', 'Science Fiction', self.other_author)
+        self.ada = Member.objects.create(name='Ada', email='ada@example.com')
+        self.bob = Member.objects.create(name='Bob', email='bob@example.com')
+
+        self.lend(self.phlebas, self.ada, returned=True)
+        self.lend(self.phlebas, self.bob)
+        self.lend(self.crow, self.ada)
+        self.lend(self.justice, self.ada, returned=True)
+        self.lend(self.justice, self.bob)
+
+    @staticmethod
+    def create_book(title, isbn, category, author):
+        return Book.objects.create(
+            title=title, ISBN=isbn, category=category, author=author, total_copies=3, available_copies=3
+        )
+
+    @staticmethod
+    def lend(book, member, returned=False):
+        """Write a loan the way the loan service does"""
+        record = BorrowRecord.objects.create(book=book, member=member)
+        stats.record(loans=[(book.id, member.id)])
+        if returned:
+            BorrowRecord.objects.filter(id=record.id).update(return_date=timezone.now())
+            stats.record(returns=[(book.id, member.id)])
+
+    def assertMatchesRebuild(self):
+        kept = rollups()
+        with transaction.atomic():
+            stats.rebuild()
+            rebuilt = rollups()
+            transaction.set_rollback(True)
+        self.assertEqual(kept, rebuilt)
+
+    def test_recorded_loans_match_rebuild(self):
+        self.assertMatchesRebuild()
+        self.assertIn(('Science Fiction', 4, 2, 6), rollups()['categories'])
+
+    def test_category_change_during_a_loan(self):
+        self.crow.category = 'Science Fiction'
+        self.crow.save()
+
+        self.assertMatchesRebuild()
+        categories = rollups()['categories']
+        self.assertIn(('Science Fiction', 5, 3, 9), categories)
+        self.assertNotIn('Fiction', {category for category, *_ in categories})
+
+    def test_saves_that_keep_the_category(self):
+        self.crow.title = 'The Crow Road (reissue)'
+        self.crow.save(update_fields=['title'])
+        self.phlebas.save()
+        self.assertMatchesRebuild()
+
+    def test_category_change_through_import_books(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('title,ISBN,category,author,copies\n')
+            csv_file.write('Consider Phlebas,9780316005388,Space Opera,Iain M. Banks,3\n')
+        try:
+            call_command('import_books', csv_file.name, stdout=io.StringIO())
+        finally:
+            os.unlink(csv_file.name)
+
+        self.assertMatchesRebuild()
+        self.assertIn(('Space Opera', 2, 1, 3), rollups()['categories'])
+
+    def test_copies_follow_the_catalogue(self):
+        poems = self.create_book('Poems', '9780141182803', 'Poetry', self.other_author)
+        self.assertMatchesRebuild()
+        self.assertIn(('Poetry', 0, 0, 3), rollups()['categories'])
+
+        poems.total_copies = 5
+        poems.save(update_fields=['total_copies'])
+        self.assertIn(('Poetry', 0, 0, 5), rollups()['categories'])
+        self.assertMatchesRebuild()
+
+        poems.delete()
+        self.assertNotIn('Poetry', {category for category, *_ in rollups()['categories']})
+        self.assertMatchesRebuild()
+
+    def test_deleting_a_book(self):
+        self.phlebas.delete()
+        self.assertMatchesRebuild()
+        self.assertIn((self.bob.id, 1, 1), rollups()['members'])
+
+    def test_deleting_a_member(self):
+        self.ada.delete()
+        self.assertMatchesRebuild()
+        self.assertNotIn(self.crow.id, {book_id for book_id, _, _ in rollups()['books']})
 
-# Create your tests here.
+    def test_deleting_an_author_with_books_on_loan(self):
+        self.author.delete()
+        self.assertMatchesRebuild()
@@ -0,0 +1,146 @@
+"""
+OpenAPI schema of the library API.
+
+Generating the schema introspects every view and serializer, which takes
+hundreds of milliseconds, so it is generated once at deploy time with
+`python manage.py generate_schema` into OPENAPI_SCHEMA_DIR. cached_schema
+serves those files with Cache-Control, ETag and Last-Modified headers.
+Without generated files the schema is only generated live when DEBUG is on.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+from drf_yasg import openapi
+from drf_yasg.app_settings import swagger_settings
+from drf_yasg.renderers import SwaggerJSONRenderer, SwaggerYAMLRenderer
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+from api.conditional import not_modified_response
+
+
+api_info = openapi.Info(
+    title="Library REST API",
+    default_version='v1',
+    description="""
+    A comprehensive REST API for managing a library system with authentication and role-based permissions.
+
+    **Features:**
+    - User authentication with JWT tokens
+    - Role-based access control (Librarians and Members)
+    - Book management (CRUD operations)
+    - Member management
+    - Book borrowing and returning system
+
+    **Authentication:**
+    Use the JWT endpoints to get access and refresh tokens. Include the access token in the Authorization header as: Bearer <token>
+    """,
+    contact=openapi.Contact(email="library@example.com"),
+    license=openapi.License(name="BSD License"),
+)
+
+# Swagger/ReDoc Schema View
+schema_view = get_schema_view(
+    api_info,
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+)
+
+SCHEMA_RENDERERS = {
+    'json': SwaggerJSONRenderer,
+    'yaml': SwaggerYAMLRenderer,
+}
+
+_live_schema_view = schema_view.without_ui(cache_timeout=0)
+
+
+def schema_path(schema_format):
+    directory = getattr(settings, 'OPENAPI_SCHEMA_DIR', settings.BASE_DIR / 'openapi')
+    return Path(directory) / f'swagger.{schema_format}'
+
+
+def write_schema_files():
+    """
+    Generate the schema and write it in every format. Files are replaced
+    atomically, so running servers never read a partial file. Returns the
+    written paths.
+    """
+    generator = swagger_settings.DEFAULT_GENERATOR_CLASS(api_info)
+    schema = generator.get_schema(request=None, public=True)
+    paths = []
+    for schema_format, renderer_class in SCHEMA_RENDERERS.items():
+        path = schema_path(schema_format)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'.{path.name}.tmp')
+        tmp_path.write_bytes(renderer_class().render(schema))
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+class SchemaFiles:
+    """
+    Per-process cache of the generated schema files with their validators,
+    reloaded when a file's modification time changes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, schema_format):
+        """(content, etag, last_modified) of the file; raises FileNotFoundError."""
+        path = schema_path(schema_format)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime:
+                return entry[1:]
+        content = path.read_bytes()
+        entry = (
+            mtime,
+            content,
+            f'"{hashlib.md5(content).hexdigest()}"',
+            http_date(mtime // 1_000_000_000),
+        )
+        with self._lock:
+            self._entries[path] = entry
+        return entry[1:]
+
+
+schema_files = SchemaFiles()
+
+
+@require_GET
+def cached_schema(request, schema_format):
+    """
+    Serve the pre-generated OpenAPI schema (swagger.json / swagger.yaml).
+
+    Answers If-None-Match/If-Modified-Since with 304. If the schema has not
+    been generated, it is generated live in DEBUG and 503 is returned
+    otherwise.
+    """
+    try:
+        content, etag, last_modified = schema_files.get(schema_format)
+    except FileNotFoundError:
+        if settings.DEBUG:
+            return _live_schema_view(request, format=schema_format)
+        return JsonResponse(
+            {"error": "OpenAPI schema has not been generated; run `manage.py generate_schema`."},
+            status=503
+        )
+
+    response = not_modified_response(request, etag, last_modified)
+    if response is None:
+        renderer = SCHEMA_RENDERERS[schema_format]
+        response = HttpResponse(content, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'OPENAPI_SCHEMA_MAX_AGE', 3600))
+    return response
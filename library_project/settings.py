@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -18,6 +19,11 @@ ALLOWED_HOSTS = []
 
 
 # Application definition
+# App profile: LIBRARY_APP_PROFILE=slim is for API-only workers. It leaves
+# out the admin, the OpenAPI docs (drf_yasg) and the djoser user endpoints,
+# together with their routes, so workers start faster. Measure with
+# `python manage.py importtime`.
+APP_PROFILE = os.environ.get('LIBRARY_APP_PROFILE', 'full')
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -34,6 +40,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.QueryInstrumentationMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,6 +51,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+if APP_PROFILE == 'slim':
+    # contrib.messages is only used by the admin
+    SLIM_EXCLUDED_APPS = ('django.contrib.admin', 'django.contrib.messages', 'drf_yasg', 'djoser')
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in SLIM_EXCLUDED_APPS]
+    MIDDLEWARE.remove('django.contrib.messages.middleware.MessageMiddleware')
+
 ROOT_URLCONF = 'library_project.urls'
 
 TEMPLATES = [
@@ -73,6 +87,110 @@ DATABASES = {
     }
 }
 
+# Database profile: set LIBRARY_DB_PROFILE=production for a served
+# deployment. SQLITE_PRAGMAS are applied to every new SQLite connection
+# (see library.db).
+DB_PROFILE = os.environ.get('LIBRARY_DB_PROFILE', 'development')
+
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        # Keep connections open between requests (per worker thread)
+        'CONN_MAX_AGE': int(os.environ.get('LIBRARY_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock at BEGIN, so a read-then-write transaction
+            # waits for busy_timeout instead of failing with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+    SQLITE_PRAGMAS = {
+        # Readers no longer block on writers, and vice versa
+        'journal_mode': 'WAL',
+        # Safe with WAL: a power loss can only lose the last commits
+        'synchronous': 'NORMAL',
+        # Page cache in KiB when negative (64 MiB)
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; set LIBRARY_CACHE_DIR to share a file-based
+# cache between worker processes.
+
+if os.environ.get('LIBRARY_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['LIBRARY_CACHE_DIR'],
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'library-api',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Most ids per batch multi-get (?ids= / batch/ on books and members)
+API_BATCH_MAX_IDS = 100
+
+# Response cache for GET /api/books/ and /api/books/{id}/ (see api/cache.py).
+# Invalidation only reaches the cache it runs against, so the response cache
+# is on by default only with the shared cache (LIBRARY_CACHE_DIR): with
+# per-process local memory, other workers would serve stale availability
+# until BOOK_CACHE_TIMEOUT. LIBRARY_BOOK_CACHE=1/0 overrides the default,
+# e.g. for a single-process deployment.
+BOOK_CACHE_ENABLED = os.environ.get(
+    'LIBRARY_BOOK_CACHE', '1' if os.environ.get('LIBRARY_CACHE_DIR') else '0'
+) == '1'
+BOOK_CACHE_ALIAS = 'default'
+BOOK_CACHE_TIMEOUT = 300
+
+
+# Per-request SQL/timing instrumentation (see api/middleware.py).
+# Off unless LIBRARY_INSTRUMENTATION=1.
+
+API_INSTRUMENTATION_ENABLED = os.environ.get('LIBRARY_INSTRUMENTATION') == '1'
+API_INSTRUMENTATION_WINDOW = 500
+API_INSTRUMENTATION_REPEAT_THRESHOLD = 5
+
+
+# Response compression (see api/middleware.py): gzip, and brotli when the
+# brotli package is installed. Set LIBRARY_COMPRESSION=0 when a reverse
+# proxy compresses responses instead.
+
+API_COMPRESSION_ENABLED = os.environ.get('LIBRARY_COMPRESSION', '1') == '1'
+# Smaller responses are sent uncompressed
+API_COMPRESSION_MIN_SIZE = 1024
+API_COMPRESSION_GZIP_LEVEL = 6
+API_COMPRESSION_BROTLI_QUALITY = 5
+
+
+# Change feed at /api/changes/ (see api/changes.py)
+
+CHANGES_PAGE_SIZE = 100
+CHANGES_MAX_PAGE_SIZE = 1000
+# Longest ?wait= long-poll, in seconds, and how often it re-checks
+CHANGES_MAX_WAIT = 30
+CHANGES_POLL_INTERVAL = 0.5
+
+
+# Live availability stream at /api/availability/stream/ (see api/broker.py).
+# Needs the ASGI server; streams only see changes made in their own process.
+
+# Seconds between keepalive comments on an idle stream
+AVAILABILITY_STREAM_HEARTBEAT = 15
+AVAILABILITY_STREAM_MAX_BOOKS = 100
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -117,7 +235,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds the request user from the token claims (no user query);
+        # see api/authentication.py
+        'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
+    ),
+    # orjson-backed JSON, with a stdlib fallback; see api/renderers.py
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',  # Allow any access, permissions handled at view level
@@ -132,9 +262,18 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ALGORITHM': 'HS256',
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.LibraryTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.LibraryTokenRefreshSerializer',
+    'TOKEN_USER_CLASS': 'api.authentication.LibraryTokenUser',
 }
 
+# Seconds a User row stays cached for views that need the full user
+JWT_USER_CACHE_TIMEOUT = 60
+
 SWAGGER_SETTINGS = {
+    'DEFAULT_INFO': 'library_project.schema.api_info',
+    # The UIs fetch the cached, pre-generated schema (library_project/schema.py)
+    'SPEC_URL': 'schema-json',
     'SECURITY_DEFINITIONS': {
         'Bearer': {
             'type': 'apiKey',
@@ -152,3 +291,11 @@ SWAGGER_SETTINGS = {
     'DISPLAY_OPERATION_ID': False,
     'DOC_EXPANSION': 'list',
 }
+
+REDOC_SETTINGS = {
+    'SPEC_URL': 'schema-json',
+}
+
+# Pre-generated OpenAPI schema (`python manage.py generate_schema`)
+OPENAPI_SCHEMA_DIR = os.environ.get('LIBRARY_OPENAPI_DIR', BASE_DIR / 'openapi')
+OPENAPI_SCHEMA_MAX_AGE = 3600
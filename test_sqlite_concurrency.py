@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""
+Script to test catalogue reads under concurrent borrow/return writes with
+the development and production SQLite profiles (LIBRARY_DB_PROFILE)
+Run: python test_sqlite_concurrency.py [--duration 5] [--readers 4] [--writers 2]
+
+Each profile runs against a fresh database in a temporary directory:
+writer threads borrow and return books through the loan service while
+reader threads page through the catalogue. After every operation the
+thread releases its connection the way a finished request does, so
+CONN_MAX_AGE applies. Read latencies, stalled reads and lock errors are
+compared between the two profiles. The script exits with status 1 unless
+the production profile has no lock errors, no stalled reads and a lower
+p99 read latency than the development profile.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# A catalogue read slower than this counts as stalled
+STALL_THRESHOLD_MS = 50
+
+PROFILES = ('development', 'production')
+
+
+class Colors:
+    """ANSI color codes"""
+    GREEN = '\033[92m'
+    RED = '\033[91m'
+    YELLOW = '\033[93m'
+    BLUE = '\033[94m'
+    RESET = '\033[0m'
+    BOLD = '\033[1m'
+
+
+def print_header(text):
+    """Print a formatted header"""
+    print(f"\n{Colors.BOLD}{Colors.BLUE}{'='*60}")
+    print(f"{text}")
+    print(f"{'='*60}{Colors.RESET}\n")
+
+
+def print_success(text):
+    """Print success message"""
+    print(f"{Colors.GREEN}✓ {text}{Colors.RESET}")
+
+
+def print_error(text):
+    """Print error message"""
+    print(f"{Colors.RED}✗ {text}{Colors.RESET}")
+
+
+def print_test(text):
+    """Print test description"""
+    print(f"{Colors.BOLD}{text}{Colors.RESET}")
+
+
+def run_profile(args):
+    """
+    Run the workload for the profile in LIBRARY_DB_PROFILE (child process)
+    and print the results as JSON.
+    """
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library_project.settings')
+    import django
+    from django.conf import settings
+
+    django.setup()
+    tmpdir = tempfile.mkdtemp(prefix='library-concurrency-')
+    settings.DATABASES['default']['NAME'] = os.path.join(tmpdir, 'db.sqlite3')
+
+    from django.core.management import call_command
+    from django.db import OperationalError, close_old_connections, connection
+    from api import loans
+    from api.benchmarking import summarize
+    from library.models import Author, Book, Member
+
+    call_command('migrate', verbosity=0)
+    author = Author.objects.create(name='Concurrency Author')
+    Book.objects.bulk_create(
+        Book(title=f'Book {i}', ISBN=f'concurrency-{i}', category=f'category {i % 10}', author=author)
+        for i in range(args.books)
+    )
+    Member.objects.bulk_create(
+        Member(name=f'Member {i}', email=f'member{i}@concurrency.example')
+        for i in range(args.members)
+    )
+    book_ids = list(Book.objects.values_list('id', flat=True))
+    member_ids = list(Member.objects.values_list('id', flat=True))
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        journal_mode = cursor.fetchone()[0]
+    connection.close()
+
+    lock = threading.Lock()
+    read_latencies = []
+    counts = {'writes': 0, 'write_errors': 0, 'read_errors': 0}
+    deadline = time.perf_counter() + args.duration
+
+    def count(name):
+        with lock:
+            counts[name] += 1
+
+    def writer(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            book_id, member_id = rng.choice(book_ids), rng.choice(member_ids)
+            try:
+                loans.borrow_book(book_id, member_id)
+                loans.return_book(book_id, member_id)
+                count('writes')
+            except loans.LoanError:
+                pass
+            except OperationalError:
+                count('write_errors')
+            finally:
+                close_old_connections()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        pages = max(1, len(book_ids) // 10)
+        while time.perf_counter() < deadline:
+            offset = rng.randrange(pages) * 10
+            started = time.perf_counter()
+            try:
+                Book.objects.count()
+                list(Book.objects.order_by('id')[offset:offset + 10])
+            except OperationalError:
+                count('read_errors')
+            else:
+                with lock:
+                    read_latencies.append(time.perf_counter() - started)
+            finally:
+                close_old_connections()
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(100 + i,)) for i in range(args.readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(json.dumps({
+        'journal_mode': journal_mode,
+        'reads': summarize(read_latencies, elapsed),
+        'stalled_reads': sum(1 for value in read_latencies if value * 1000 >= STALL_THRESHOLD_MS),
+        **counts,
+    }))
+
+
+def measure(profile, args):
+    """Run one profile in a child process so settings are loaded fresh"""
+    env = dict(os.environ, LIBRARY_DB_PROFILE=profile)
+    command = [
+        sys.executable, os.path.abspath(__file__), '--run-profile',
+        '--duration', str(args.duration), '--readers', str(args.readers),
+        '--writers', str(args.writers), '--books', str(args.books),
+        '--members', str(args.members),
+    ]
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_results(profile, results):
+    reads = results['reads']
+    print_test(f"Profile: {profile} (journal_mode={results['journal_mode']})")
+    print(f"  Reads:  {reads['requests']} ({reads['throughput_rps']}/s), "
+          f"p50 {reads['p50_ms']} ms, p99 {reads['p99_ms']} ms, max {reads['max_ms']} ms")
+    print(f"  Stalled reads (>= {STALL_THRESHOLD_MS} ms): {results['stalled_reads']}")
+    print(f"  Borrow/return cycles: {results['writes']}")
+    print(f"  Lock errors: {results['read_errors']} reads, {results['write_errors']} writes\n")
+
+
+def main():
+    """Compare the development and production profiles"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--members', type=int, default=100)
+    parser.add_argument('--run-profile', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_profile:
+        run_profile(args)
+        return
+
+    print(f"\n{Colors.BOLD}{'='*60}")
+    print("LIBRARY API - SQLITE CONCURRENCY TEST")
+    print(f"{'='*60}{Colors.RESET}")
+    print(f"{args.readers} readers, {args.writers} writers, {args.duration}s per profile")
+    print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    try:
+        print_header("RUNNING PROFILES")
+        results = {}
+        for profile in PROFILES:
+            results[profile] = measure(profile, args)
+            print_results(profile, results[profile])
+
+        print_header("RESULTS")
+        dev, prod = results['development'], results['production']
+        passed = True
+        if prod['read_errors'] == 0 and prod['write_errors'] == 0:
+            print_success("Production profile: no 'database is locked' errors")
+        else:
+            print_error("Production profile: lock errors under concurrent writes")
+            passed = False
+        # A strict improvement: equal numbers mean WAL made no difference
+        if prod['stalled_reads'] == 0 and prod['reads']['p99_ms'] < dev['reads']['p99_ms']:
+            print_success(
+                f"Reads no longer stall behind writes "
+                f"(p99 {dev['reads']['p99_ms']} -> {prod['reads']['p99_ms']} ms, "
+                f"stalled {dev['stalled_reads']} -> {prod['stalled_reads']})"
+            )
+        else:
+            print_error(
+                f"Production profile reads still stall or are not faster under write load "
+                f"(p99 {dev['reads']['p99_ms']} -> {prod['reads']['p99_ms']} ms, "
+                f"stalled {dev['stalled_reads']} -> {prod['stalled_reads']})"
+            )
+            passed = False
+
+    except KeyboardInterrupt:
+        print("\n" + Colors.YELLOW + "Tests interrupted by user" + Colors.RESET)
+        sys.exit(130)
+    except subprocess.CalledProcessError as e:
+        print_error(f"Profile run failed:\n{e.stderr}")
+        sys.exit(1)
+
+    if not passed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()